@@ -0,0 +1,47 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+
+from backend.config.settings import get_settings
+from backend.core import profiler
+from backend.core.dependencies import get_admin_user
+from backend.db.models import User
+
+router = APIRouter()
+
+settings = get_settings()
+
+
+def _require_profiling() -> None:
+    # Hide the endpoint entirely unless an operator opted in.
+    if not settings.profiling_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+
+@router.get("/profile", dependencies=[Depends(_require_profiling)])
+async def profile(
+    seconds: float = Query(default=5.0, gt=0),
+    interval_ms: float = Query(default=10.0, ge=1, le=1000),
+    allocations: int = Query(default=0, ge=0, le=200),
+    format: Literal["json", "collapsed"] = Query(default="json"),
+    current_user: User = Depends(get_admin_user),
+):
+    """Sample this worker's threads for ``seconds`` and return where they spent their time.
+
+    ``format=collapsed`` returns folded stacks ready for ``flamegraph.pl`` or speedscope.
+    """
+    if seconds > settings.profiling_max_seconds:
+        raise HTTPException(
+            status_code=422,
+            detail=f"seconds must not exceed {settings.profiling_max_seconds:g}",
+        )
+    try:
+        # Sample from a pool thread so the event loop itself shows up in the stacks.
+        report = await run_in_threadpool(profiler.profile, seconds, interval_ms / 1000, allocations)
+    except profiler.ProfilerBusy as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+    if format == "collapsed":
+        return PlainTextResponse(report.collapsed())
+    return report.to_dict()
@@ -1,14 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr
 from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
 
 from backend.core.dependencies import get_current_user
+from backend.core.password_pool import PasswordHasherBusy, hash_password_async, verify_password_async
 from backend.core.security import (
     create_access_token,
     create_refresh_token,
     decode_token,
-    hash_password,
-    verify_password,
 )
 from backend.db import crud
 from backend.db.models import User
@@ -51,25 +51,48 @@ def _issue_tokens(user: User) -> TokenResponse:
     )
 
 
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/signup", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
-def signup(request: SignupRequest, db: Session = Depends(get_session)):
-    existing = crud.get_user_by_email(db, request.email.lower())
+async def signup(request: SignupRequest, db: Session = Depends(get_session)):
+    email = request.email.lower()
+    existing = await run_in_threadpool(crud.get_user_by_email, db, email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
-    user = crud.create_user(
+    try:
+        hashed_password = await hash_password_async(request.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    user = await run_in_threadpool(
+        crud.create_user,
         db,
-        email=request.email.lower(),
+        email=email,
         full_name=request.full_name,
-        hashed_password=hash_password(request.password),
+        hashed_password=hashed_password,
     )
     return _issue_tokens(user)
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(request: LoginRequest, db: Session = Depends(get_session)):
-    user = crud.get_user_by_email(db, request.email.lower())
-    if not user or not verify_password(request.password, user.hashed_password):
+async def login(request: LoginRequest, db: Session = Depends(get_session)):
+    user = await run_in_threadpool(crud.get_user_by_email, db, request.email.lower())
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    try:
+        valid, new_hash = await verify_password_async(request.password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Cost factor changed since this hash was stored; upgrade it transparently.
+        user = await run_in_threadpool(crud.update_password_hash, db, user, new_hash)
     return _issue_tokens(user)
 
 
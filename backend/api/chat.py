@@ -1,25 +1,36 @@
+import asyncio
 import json
 import logging
+import threading
+from contextlib import closing
 from datetime import datetime
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from opentelemetry import context as otel_context
+from opentelemetry import trace
 from pydantic import BaseModel, Field
 from sqlmodel import Session
 
-from backend.core.llm_handler import generate_reply, stream_reply
-from backend.core.moderation import ModerationError, enforce_safe_prompt
+from backend.config.settings import get_settings
+from backend.core.admission import AdmissionRejected, Priority, chat_admission
+from backend.core.inference import detect_language, generate_reply, stream_reply, translate_text
+from backend.core.moderation import ModerationError, StreamModerator, enforce_safe_prompt, enforce_safe_reply
 from backend.core.dependencies import get_current_user
+from backend.core.observability import iterate_in_context
+from backend.core.sse import HEARTBEAT, EventStreamResponse, FlushPolicy, batches, format_event
 from backend.db import crud
 from backend.db.session import get_session
-from backend.utils.language_tools import detect_language, translate_text
 from backend.db.models import User
 
 logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
 
 router = APIRouter()
 
+_DISCONNECT_POLL_SECONDS = 0.5
+
 class Message(BaseModel):
     role: str
     content: str
@@ -57,33 +68,30 @@ class ChatSessionDetail(BaseModel):
     messages: List[ChatMessageResponse]
 
 @router.post("/", response_model=ChatResponse)
-def chat(
+async def chat(
     request: ChatRequest,
     http_request: Request,
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
     try:
-        enforce_safe_prompt(request.message)
-        detected_lang = detect_language(request.message)
-        input_text = (
-            translate_text(request.message, from_lang=detected_lang, to_lang="en")
-            if detected_lang != "en"
-            else request.message
-        )
-
-        history = _load_history(db, request.session_id, current_user.id) if request.session_id else (request.history or [])
-        session_entry = crud.upsert_session(db, request.session_id, request.message[:60], current_user.id)
-        crud.record_message(db, session_entry, "user", request.message)
-
-        reply_en = generate_reply(input_text, history)
-        final_reply = (
-            translate_text(reply_en, from_lang="en", to_lang=detected_lang)
-            if detected_lang != "en"
-            else reply_en
-        )
+        detected_lang, input_text, history = await run_in_threadpool(_prepare, request, db, current_user)
+        async with chat_admission.async_slot(Priority.STANDARD):
+            if await http_request.is_disconnected():
+                raise _client_gone()
+            session_entry = await run_in_threadpool(
+                crud.upsert_session, db, request.session_id, request.message[:60], current_user.id
+            )
+            await run_in_threadpool(crud.record_message, db, session_entry, "user", request.message)
+            reply_en, cancelled = await _generate_until_disconnect(http_request, input_text, history)
+        if cancelled:
+            await run_in_threadpool(_save_partial_reply, db, session_entry, reply_en, detected_lang)
+            raise _client_gone()
+        with tracer.start_as_current_span("chat.moderate_output"):
+            await run_in_threadpool(enforce_safe_reply, reply_en)
+        final_reply = await run_in_threadpool(_translate_reply, reply_en, detected_lang)
 
-        crud.record_message(db, session_entry, "assistant", final_reply.strip())
+        await run_in_threadpool(crud.record_message, db, session_entry, "assistant", final_reply.strip())
 
         return ChatResponse(
             response=final_reply.strip(),
@@ -91,13 +99,12 @@ def chat(
             session_id=session_entry.id,
         )
 
+    except HTTPException:
+        raise
     except ModerationError as exc:
-        raise HTTPException(status_code=400, detail={
-            "code": "prompt_rejected",
-            "message": str(exc),
-            "category": exc.category,
-            "request_id": getattr(http_request.state, "request_id", None),
-        }) from exc
+        raise _rejected(exc, http_request) from exc
+    except AdmissionRejected as exc:
+        raise _overloaded(exc, http_request) from exc
     except Exception as exc:  # pragma: no cover - surfaced via detailed HTTP response
         logger.exception("Chat endpoint failed", extra={"session_id": request.session_id})
         raise HTTPException(status_code=500, detail={
@@ -115,34 +122,71 @@ def chat_stream(
     current_user: User = Depends(get_current_user),
 ):
     try:
-        enforce_safe_prompt(request.message)
-        detected_lang = detect_language(request.message)
-        input_text = (
-            translate_text(request.message, from_lang=detected_lang, to_lang="en")
-            if detected_lang != "en"
-            else request.message
-        )
-        history = _load_history(db, request.session_id, current_user.id) if request.session_id else (request.history or [])
-        session_entry = crud.upsert_session(db, request.session_id, request.message[:60], current_user.id)
-        crud.record_message(db, session_entry, "user", request.message)
+        detected_lang, input_text, history = _prepare(request, db, current_user)
+        slot = chat_admission.acquire(Priority.INTERACTIVE)
+        try:
+            session_entry = crud.upsert_session(db, request.session_id, request.message[:60], current_user.id)
+            crud.record_message(db, session_entry, "user", request.message)
+        except Exception:
+            slot.release()
+            raise
         accumulated: List[str] = []
+        sent: List[str] = []
+        rejected: List[str] = []
+        cancel_event = threading.Event()
+        # Claimed by whichever comes first: the stream reaching its end, or close_stream.
+        finished = threading.Lock()
+        moderator = StreamModerator()
+        request_context = otel_context.get_current()
+        flush_policy = FlushPolicy.from_settings(get_settings())
+
+        def moderated(chunks):
+            try:
+                for chunk in chunks:
+                    verdict = moderator.feed(chunk)
+                    if not verdict.allowed:
+                        rejected.append(verdict.category)
+                        return
+                    accumulated.append(chunk)
+                    yield chunk
+            finally:
+                chunks.close()
 
         def sse_events():
+            generation = tracer.start_span("chat.generate", attributes={"chat.stream": True})
             try:
                 # stream English reply first
-                for chunk in stream_reply(input_text, history):
-                    accumulated.append(chunk)
-                    yield f"event: message\ndata: {chunk}\n\n"
-            except Exception:
-                yield "event: error\ndata: {\"message\": \"stream_failed\"}\n\n"
+                chunks = iterate_in_context(
+                    stream_reply(input_text, history, cancel_event=cancel_event),
+                    trace.set_span_in_context(generation),
+                )
+                with closing(batches(moderated(chunks), flush_policy)) as texts:
+                    for text in texts:
+                        if text is None:
+                            yield HEARTBEAT
+                            continue
+                        yield format_event("message", text)
+                        # Starlette only steps the body again once the previous event was sent.
+                        sent.append(text)
+                if rejected:
+                    finished.acquire(blocking=False)
+                    payload = json.dumps({"message": "output_rejected", "category": rejected[0]})
+                    yield format_event("error", payload)
+                    return
+            except Exception as exc:
+                finished.acquire(blocking=False)
+                generation.record_exception(exc)
+                yield format_event("error", json.dumps({"message": "stream_failed"}))
                 return
+            finally:
+                slot.release()
+                generation.set_attribute("chat.chunks", len(accumulated))
+                generation.end()
 
+            if not finished.acquire(blocking=False):
+                return
             final_text_en = "".join(accumulated).strip()
-            final_reply = (
-                translate_text(final_text_en, from_lang="en", to_lang=detected_lang)
-                if detected_lang != "en"
-                else final_text_en
-            )
+            final_reply = _translate_reply(final_text_en, detected_lang)
             if final_reply:
                 crud.record_message(db, session_entry, "assistant", final_reply)
             payload = json.dumps({
@@ -150,17 +194,26 @@ def chat_stream(
                 "detected_lang": detected_lang,
                 "final_text": final_reply,
             })
-            yield f"event: done\ndata: {payload}\n\n"
-
-        return StreamingResponse(sse_events(), media_type="text/event-stream")
+            yield format_event("done", payload)
+
+        def close_stream():
+            # Stop the model and free the slot at once if the client left mid-stream
+            # (or before the body was iterated), keeping what it had already been sent.
+            cancel_event.set()
+            slot.release()
+            if finished.acquire(blocking=False):
+                _save_partial_reply(db, session_entry, "".join(sent), detected_lang)
+
+        return EventStreamResponse(
+            # Starlette steps the generator on threadpool threads; keep its spans under this request.
+            iterate_in_context(sse_events(), request_context),
+            on_close=close_stream,
+        )
 
     except ModerationError as exc:
-        raise HTTPException(status_code=400, detail={
-            "code": "prompt_rejected",
-            "message": str(exc),
-            "category": exc.category,
-            "request_id": getattr(http_request.state, "request_id", None),
-        }) from exc
+        raise _rejected(exc, http_request) from exc
+    except AdmissionRejected as exc:
+        raise _overloaded(exc, http_request) from exc
     except Exception as exc:  # pragma: no cover - surfaced via detailed HTTP response
         logger.exception("Chat stream endpoint failed", extra={"session_id": request.session_id})
         raise HTTPException(status_code=500, detail={
@@ -175,10 +228,10 @@ def list_chat_sessions(
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ) -> List[ChatSessionSummary]:
-    sessions = crud.list_sessions(db, current_user.id)
+    sessions = crud.list_sessions_with_last_message(db, current_user.id)
     summaries = []
-    for s in sessions:
-        last_message = s.messages[-1].content if s.messages else None
+    for s, latest in sessions:
+        last_message = latest.content if latest else None
         preview = (last_message[:80] + "…") if last_message and len(last_message) > 80 else last_message
         summaries.append(ChatSessionSummary(
             id=s.id,
@@ -222,12 +275,94 @@ def delete_chat_session(
         raise HTTPException(status_code=404, detail="Session not found")
 
 
+def _rejected(exc: ModerationError, http_request: Request) -> HTTPException:
+    return HTTPException(status_code=400, detail={
+        "code": "prompt_rejected" if exc.stage == "input" else "reply_rejected",
+        "message": str(exc),
+        "category": exc.category,
+        "request_id": getattr(http_request.state, "request_id", None),
+    })
+
+
+def _client_gone() -> HTTPException:
+    # 499 mirrors nginx's "client closed request" for the access log.
+    return HTTPException(status_code=499, detail="Client closed request")
+
+
+def _overloaded(exc: AdmissionRejected, http_request: Request) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail={
+            "code": "model_overloaded",
+            "message": "The model is busy, please retry shortly",
+            "reason": exc.reason,
+            "request_id": getattr(http_request.state, "request_id", None),
+        },
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def _prepare(request: ChatRequest, db: Session, current_user: User) -> tuple[str, str, list]:
+    """Moderate, detect and translate the prompt and load history; returns ``(lang, english_prompt, history)``."""
+    with tracer.start_as_current_span("chat.moderate_input"):
+        enforce_safe_prompt(request.message)
+    with tracer.start_as_current_span("chat.detect_language") as span:
+        detected_lang = detect_language(request.message)
+        span.set_attribute("chat.detected_lang", detected_lang)
+    if detected_lang != "en":
+        with tracer.start_as_current_span("chat.translate_input"):
+            input_text = translate_text(request.message, from_lang=detected_lang, to_lang="en")
+    else:
+        input_text = request.message
+    with tracer.start_as_current_span("chat.load_history") as span:
+        history = (
+            _load_history(db, request.session_id, current_user.id) if request.session_id else (request.history or [])
+        )
+        span.set_attribute("chat.history_turns", len(history))
+    return detected_lang, input_text, history
+
+
+async def _generate_until_disconnect(http_request: Request, input_text: str, history: list) -> tuple[str, bool]:
+    """Generate a reply, stopping early if the client disconnects; returns ``(reply, cancelled)``."""
+    cancel_event = threading.Event()
+    generation = asyncio.ensure_future(
+        run_in_threadpool(generate_reply, input_text, history, cancel_event=cancel_event)
+    )
+    try:
+        while True:
+            done, _ = await asyncio.wait({generation}, timeout=_DISCONNECT_POLL_SECONDS)
+            if done:
+                return generation.result(), cancel_event.is_set()
+            # Keep waiting after cancelling: the model stops within a token and the slot is freed then.
+            if not cancel_event.is_set() and await http_request.is_disconnected():
+                cancel_event.set()
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
+
+
+def _save_partial_reply(db: Session, session_entry, reply_en: str, detected_lang: str) -> None:
+    """Record the part of a reply generated before the client left, if it passes moderation."""
+    reply_en = reply_en.strip()
+    if not reply_en:
+        return
+    try:
+        enforce_safe_reply(reply_en)
+    except ModerationError:
+        return
+    crud.record_message(db, session_entry, "assistant", _translate_reply(reply_en, detected_lang).strip())
+    logger.info("Saved partial reply after client disconnect", extra={"session_id": session_entry.id})
+
+
+def _translate_reply(reply_en: str, detected_lang: str) -> str:
+    if detected_lang == "en":
+        return reply_en
+    with tracer.start_as_current_span("chat.translate_output"):
+        return translate_text(reply_en, from_lang="en", to_lang=detected_lang)
+
+
 def _load_history(db: Session, session_id: Optional[str], user_id: str) -> List[dict]:
     if not session_id:
         return []
-    session_obj = crud.get_session_with_messages(db, session_id, user_id)
-    if not session_obj:
-        return []
-    messages = session_obj.messages
-    recent = messages[-8:]
+    recent = crud.list_recent_messages(db, session_id, user_id, limit=8)
     return [{"role": m.role, "content": m.content} for m in recent]
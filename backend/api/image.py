@@ -1,54 +1,267 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from backend.config.settings import get_settings
 import base64
-from io import BytesIO
 
+from backend.core.admission import AdmissionRejected, Priority, image_admission
 from backend.core.dependencies import get_current_user
+from backend.core.image_cache import MAX_SEED, image_renderer, random_seed
+from backend.core.image_encoding import MEDIA_TYPES, encode_image, negotiate_format
+from backend.core.image_jobs import ImageJobQueueFull, image_jobs
+from backend.core.image_profiles import GenerationProfile, ImageProfileError, resolve_profile
+from backend.core.image_worker import ImageGenerationCancelled
+from backend.core.model_metrics import GENERATIONS_IN_FLIGHT, IMAGE_GENERATION_SECONDS
 from backend.db.models import User
 
 router = APIRouter()
 
 settings = get_settings()
-_pipe = None
-_device = (settings.image_device or "cpu").lower()
 
-def _get_pipe():
-    global _pipe
-    if _pipe is not None:
-        return _pipe
-    if not settings.image_generation_enabled:
-        raise RuntimeError("Image generation is disabled by configuration")
-    from diffusers import StableDiffusionPipeline
-    import torch
-    model_id = settings.image_model or "runwayml/stable-diffusion-v1-5"
-    try:
-        torch_dtype = torch.float16 if _device.startswith("cuda") else torch.float32
-        _pipe = StableDiffusionPipeline.from_pretrained(
-            model_id,
-            torch_dtype=torch_dtype,
-        ).to(_device)
-        _pipe.enable_attention_slicing()
-    except Exception as e:
-        raise RuntimeError(f"Failed to load image pipeline: {e}")
-    return _pipe
+_JOB_EVENTS_POLL_SECONDS = 0.5
+_TERMINAL_JOB_STATES = {"succeeded", "failed", "rejected"}
+
 
 class ImageRequest(BaseModel):
     prompt: str
+    profile: Optional[str] = None  # draft | standard | quality; defaults to IMAGE_PROFILE
+    steps: Optional[int] = None
+    size: Optional[int] = None
+    negative_prompt: Optional[str] = None
+    seed: Optional[int] = Field(default=None, ge=0, le=MAX_SEED)  # random when omitted
 
-@router.post("/generate")
-async def generate_image(req: ImageRequest, current_user: User = Depends(get_current_user)):
+    @property
+    def cacheable(self) -> bool:
+        # Only an explicit seed asks for a reproducible image; without one, asking again means a new image.
+        return self.seed is not None
+
+    def resolved_seed(self) -> int:
+        return self.seed if self.seed is not None else random_seed()
+
+
+class ImageJobResponse(BaseModel):
+    job_id: str
+    status: str
+    profile: str
+    seed: int
+    step: int
+    total_steps: int
+    error: Optional[str] = None
+    created_at: str
+    finished_at: Optional[str] = None
+    status_url: str
+    events_url: str
+    result_url: str
+
+
+def _job_response(job: dict) -> ImageJobResponse:
+    base = f"/image/jobs/{job['id']}"
+    return ImageJobResponse(
+        job_id=job["id"],
+        status=job["status"],
+        profile=job["profile"]["name"],
+        seed=job["seed"],
+        step=job.get("step", 0),
+        total_steps=job.get("total_steps", 0),
+        error=job.get("error"),
+        created_at=job["created_at"],
+        finished_at=job.get("finished_at"),
+        status_url=base,
+        events_url=f"{base}/events",
+        result_url=f"{base}/result",
+    )
+
+
+def _ensure_enabled() -> None:
+    if not settings.image_generation_enabled:
+        raise HTTPException(status_code=503, detail="Image generation feature is disabled")
+
+
+def _resolve_profile(req: ImageRequest) -> GenerationProfile:
     try:
-        if not settings.image_generation_enabled:
-            raise HTTPException(status_code=503, detail="Image generation feature is disabled")
-        pipe = _get_pipe()
-        result = pipe(req.prompt, guidance_scale=8.5)
-        image = result.images[0]
+        return resolve_profile(req.profile, settings.image_profile, steps=req.steps, size=req.size)
+    except ImageProfileError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+async def _render(req: ImageRequest, profile: GenerationProfile, seed: int, http_request: Request) -> bytes:
+    slot = await image_admission.acquire_async(Priority.BATCH)
+    in_flight = GENERATIONS_IN_FLIGHT.labels(kind="image")
+    in_flight.inc()
+
+    def _release() -> None:
+        in_flight.dec()
+        slot.release()
 
-        buffered = BytesIO()
-        image.save(buffered, format="PNG")
-        encoded_image = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    started = time.perf_counter()
+    # The slot is held until the worker really finishes, even if we stop waiting for it.
+    png_bytes = await image_renderer.run(
+        req.prompt,
+        profile,
+        negative_prompt=req.negative_prompt,
+        seed=seed,
+        cacheable=req.cacheable,
+        is_disconnected=http_request.is_disconnected,
+        on_done=_release,
+    )
+    IMAGE_GENERATION_SECONDS.labels(profile=profile.name).observe(time.perf_counter() - started)
+    return png_bytes
 
-        return {"image_base64": encoded_image}
+
+@router.post("/generate")
+async def generate_image(
+    req: ImageRequest,
+    http_request: Request,
+    quality: Optional[int] = Query(default=None, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+):
+    """Render ``req.prompt``.
+
+    Clients sending ``Accept: image/png``, ``image/webp`` or ``image/jpeg`` get the raw
+    bytes; anything else gets the legacy ``{"image_base64": ...}`` body. POST responses
+    are not conditionally cacheable, so ETags are served by the job result endpoint.
+    """
+    try:
+        _ensure_enabled()
+        profile = _resolve_profile(req)
+        seed = req.resolved_seed()
+        fmt = negotiate_format(http_request.headers.get("accept"))
+        headers = {}
+        if fmt is not None:
+            quality = _resolve_quality(fmt, quality)
+            headers = {"Vary": "Accept", "X-Image-Seed": str(seed)}
+        png_bytes = None
+        if req.cacheable:
+            # Hits are served without an admission slot, so they never queue behind renders.
+            png_bytes = await run_in_threadpool(
+                image_renderer.lookup, req.prompt, profile, negative_prompt=req.negative_prompt, seed=seed
+            )
+        if png_bytes is None:
+            png_bytes = await _render(req, profile, seed, http_request)
+        if fmt is not None:
+            body = await run_in_threadpool(encode_image, png_bytes, fmt, quality)
+            return Response(content=body, media_type=MEDIA_TYPES[fmt], headers=headers)
+        encoded_image = base64.b64encode(png_bytes).decode("utf-8")
+
+        return {"image_base64": encoded_image, "seed": seed}
+    except HTTPException:
+        raise
+    except AdmissionRejected as exc:
+        raise HTTPException(
+            status_code=503,
+            detail="Image generation is busy, please retry shortly",
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+    except ImageGenerationCancelled as exc:
+        # Client is gone; 499 mirrors nginx's "client closed request" for the access log.
+        raise HTTPException(status_code=499, detail="Client closed request") from exc
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/jobs", response_model=ImageJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_image_job(req: ImageRequest, current_user: User = Depends(get_current_user)):
+    _ensure_enabled()
+    profile = _resolve_profile(req)
+    try:
+        job = image_jobs.submit(
+            current_user.id,
+            req.prompt,
+            profile,
+            seed=req.resolved_seed(),
+            negative_prompt=req.negative_prompt,
+            cacheable=req.cacheable,
+        )
+    except ImageJobQueueFull as exc:
+        raise HTTPException(
+            status_code=503,
+            detail="Image job queue is full, please retry shortly",
+            headers={"Retry-After": "5"},
+        ) from exc
+    return _job_response(job)
+
+
+def _get_job_or_404(job_id: str, user: User) -> dict:
+    job = image_jobs.get(job_id, user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Image job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=ImageJobResponse)
+def get_image_job(job_id: str, current_user: User = Depends(get_current_user)):
+    return _job_response(_get_job_or_404(job_id, current_user))
+
+
+@router.get("/jobs/{job_id}/events")
+def image_job_events(job_id: str, current_user: User = Depends(get_current_user)):
+    _get_job_or_404(job_id, current_user)
+
+    async def job_events():
+        # Polls on the event loop so a subscriber does not hold a threadpool thread while it waits.
+        last_sent = None
+        while True:
+            job = await run_in_threadpool(image_jobs.get, job_id, current_user.id)
+            if job is None:
+                yield "event: error\ndata: {\"message\": \"job_expired\"}\n\n"
+                return
+            payload = _job_response(job).model_dump_json()
+            if payload != last_sent:
+                last_sent = payload
+                event = "done" if job["status"] in _TERMINAL_JOB_STATES else "progress"
+                yield f"event: {event}\ndata: {payload}\n\n"
+            if job["status"] in _TERMINAL_JOB_STATES:
+                return
+            await asyncio.sleep(_JOB_EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(job_events(), media_type="text/event-stream")
+
+
+@router.get("/jobs/{job_id}/result")
+def get_image_job_result(
+    job_id: str,
+    http_request: Request,
+    quality: Optional[int] = Query(default=None, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+):
+    """Serve a finished job's image, as PNG unless ``Accept`` asks for WebP or JPEG."""
+    job = _get_job_or_404(job_id, current_user)
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail={
+            "code": "job_not_ready",
+            "status": job["status"],
+        })
+    path = image_jobs.result_path(job_id)
+    if not path.exists():
+        raise HTTPException(status_code=410, detail="Image result is no longer available")
+    fmt = negotiate_format(http_request.headers.get("accept")) or "png"
+    # A job's result never changes once written, so its id (plus the encoding) is a strong validator.
+    etag = f'"{job_id}"'
+    if fmt != "png":
+        quality = _resolve_quality(fmt, quality)
+        etag = f'"{job_id}-{fmt}-q{quality}"'
+    headers = {"ETag": etag, "Vary": "Accept", "Cache-Control": "private, max-age=86400"}
+    if _etag_matches(etag, http_request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    if fmt == "png":
+        return FileResponse(path, media_type=MEDIA_TYPES[fmt], headers=headers)
+    body = encode_image(path.read_bytes(), fmt, quality)
+    return Response(content=body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+def _resolve_quality(fmt: str, quality: Optional[int]) -> int:
+    if quality is not None:
+        return quality
+    return settings.image_webp_quality if fmt == "webp" else settings.image_jpeg_quality
@@ -0,0 +1,152 @@
+"""Per-call Python cost of the chat hot paths, measured apart from model time.
+
+Times prompt formatting, tokenizer encode/decode, SSE event framing, response
+serialization the way FastAPI does it (validate, dump to JSON-able data, render)
+and one request through the middleware stack, each on fixed inputs. Reports the
+best of ``--repeat`` runs in microseconds per call. The tokenizer comes from
+``CHAT_MODEL`` (or ``--tokenizer``) and must already be in the local Hugging Face
+cache; its cases are skipped otherwise. Prints JSON. Run from the repo root::
+
+    python -m backend.benchmarks.bench_hot_paths --repeat 7
+    python -m backend.benchmarks.bench_hot_paths --filter sse
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import timeit
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from backend.api.chat import ChatResponse, ChatSessionSummary, Message
+from backend.benchmarks import bench_middleware
+from backend.config.settings import get_settings
+from backend.core.llm_handler import _format_prompt
+from backend.core.sse import FlushPolicy, coalesce, format_event
+
+_PROMPT = "Explain, step by step, how a hash map handles collisions and when it resizes."
+_REPLY = (
+    "A hash map stores each key in a bucket chosen from its hash. When two keys land in the "
+    "same bucket it either chains them in a small list or probes for the next free slot. "
+    "Once the load factor passes a threshold the table doubles and every key is rehashed."
+)
+_HISTORY = [
+    {"role": "user" if index % 2 == 0 else "assistant", "content": f"{_PROMPT} (turn {index})"}
+    for index in range(8)
+]
+_TOKEN_CHUNKS = ["A", " hash", " map", " stores", " each", " key", " in", " a", " bucket", "."]
+
+
+def _time(fn: Callable[[], object], repeat: int) -> float:
+    """Best microseconds per call of ``fn`` over ``repeat`` autoranged runs."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def _prompt_cases() -> dict[str, Callable[[], object]]:
+    messages = [Message(**turn) for turn in _HISTORY]
+    return {
+        "format_prompt.no_history": lambda: _format_prompt(_PROMPT),
+        "format_prompt.dict_history": lambda: _format_prompt(_PROMPT, _HISTORY),
+        "format_prompt.model_history": lambda: _format_prompt(_PROMPT, messages),
+    }
+
+
+def _tokenizer_cases(name: str) -> tuple[dict[str, Callable[[], object]], Optional[str]]:
+    try:
+        from transformers import AutoTokenizer  # type: ignore
+
+        tokenizer = AutoTokenizer.from_pretrained(name, local_files_only=True)
+    except Exception as exc:  # noqa: BLE001 - any load failure just skips these cases
+        return {}, f"tokenizer {name!r} unavailable: {type(exc).__name__}"
+    try:
+        import torch  # noqa: F401
+
+        tensors = "pt"
+    except ImportError:
+        tensors = None
+    text = _format_prompt(_PROMPT, _HISTORY)
+    reply_ids = tokenizer(_REPLY)["input_ids"]
+    return {
+        "tokenizer.encode_prompt": lambda: tokenizer([text], return_tensors=tensors),
+        "tokenizer.decode_reply": lambda: tokenizer.decode(reply_ids, skip_special_tokens=True),
+        # The text streamer decodes the tokens buffered since its last flush on every step.
+        "tokenizer.decode_one_token": lambda: tokenizer.decode(reply_ids[:1], skip_special_tokens=True),
+    }, None
+
+
+def _sse_cases() -> dict[str, Callable[[], object]]:
+    done = {"session_id": "5f0c8a8e-0000-4000-8000-000000000000", "detected_lang": "en", "final_text": _REPLY}
+
+    def frame_tokens():
+        # /chat/stream's framing per chunk, plus the encode Starlette applies to str bodies.
+        for chunk in _TOKEN_CHUNKS:
+            format_event("message", chunk).encode("utf-8")
+
+    tokens = _TOKEN_CHUNKS * 7
+    per_chunk = FlushPolicy(interval=0, max_bytes=1, heartbeat=0)
+    coalesced = FlushPolicy(interval=0.05, max_bytes=1024, heartbeat=15)
+
+    return {
+        "sse.frame_10_tokens": frame_tokens,
+        "sse.coalesce_70_tokens.per_chunk": lambda: list(coalesce(tokens, per_chunk)),
+        "sse.coalesce_70_tokens.coalesced": lambda: list(coalesce(tokens, coalesced)),
+        "sse.done_event": lambda: format_event("done", json.dumps(done)).encode("utf-8"),
+    }
+
+
+def _serialization_cases() -> dict[str, Callable[[], object]]:
+    now = datetime.now(timezone.utc)
+    reply = ChatResponse(response=_REPLY, detected_lang="en", session_id="5f0c8a8e")
+    sessions = [
+        ChatSessionSummary(id=f"session-{index}", title=_PROMPT[:60], updated_at=now, last_message_preview=_REPLY[:80])
+        for index in range(50)
+    ]
+    reply_adapter = TypeAdapter(ChatResponse)
+    sessions_adapter = TypeAdapter(List[ChatSessionSummary])
+
+    def fastapi_path(adapter, value):
+        # serialize_response: validate against response_model, dump to JSON-able data, render.
+        return JSONResponse(adapter.dump_python(adapter.validate_python(value), mode="json")).body
+
+    return {
+        "json.chat_response.fastapi": lambda: fastapi_path(reply_adapter, reply),
+        "json.chat_response.jsonable_encoder": lambda: JSONResponse(jsonable_encoder(reply)).body,
+        "json.chat_response.model_dump_json": reply.model_dump_json,
+        "json.sessions_50.fastapi": lambda: fastapi_path(sessions_adapter, sessions),
+        "json.sessions_50.dump_json": lambda: sessions_adapter.dump_json(sessions),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tokenizer", default=get_settings().chat_model)
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--middleware-requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    tokenizer_cases, skipped = _tokenizer_cases(args.tokenizer)
+    cases = {**_prompt_cases(), **tokenizer_cases, **_sse_cases(), **_serialization_cases()}
+    results = [
+        {"case": name, "us_per_call": round(_time(fn, args.repeat), 3)}
+        for name, fn in cases.items()
+        if args.filter in name
+    ]
+    if args.filter in "middleware.asgi_stack":
+        stack = asyncio.run(bench_middleware._bench("asgi", args.middleware_requests, chunks=200))
+        results.append({"case": "middleware.asgi_stack", "us_per_call": stack["per_request_us"]})
+    report = {"results": results}
+    if skipped:
+        report["skipped"] = skipped
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Images per minute of the Stable Diffusion pipeline at different batch sizes.
+
+Loads ``IMAGE_MODEL`` (or ``--model``) on ``IMAGE_DEVICE`` and renders the same
+number of images at each batch size through :func:`render_png_batch`. Use a
+small ``--steps``/``--size`` on CPU. Run from the repo root::
+
+    python -m backend.benchmarks.bench_image_batching --batch-sizes 1,2,4 --images 8 --steps 10
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from dataclasses import replace
+
+os.environ["IMAGE_ENABLED"] = "true"
+
+from backend.core import image_worker  # noqa: E402
+from backend.core.image_profiles import PROFILES  # noqa: E402
+
+
+def _bench(profile, batch_size: int, images: int) -> dict:
+    prompts = [f"a watercolor lighthouse at dusk, variation {index}" for index in range(images)]
+    image_worker.render_png_batch(prompts[:batch_size], profile)  # warm-up
+    start = time.perf_counter()
+    for offset in range(0, images, batch_size):
+        image_worker.render_png_batch(prompts[offset:offset + batch_size], profile)
+    elapsed = time.perf_counter() - start
+    return {
+        "batch_size": batch_size,
+        "images": images,
+        "seconds": round(elapsed, 2),
+        "images_per_minute": round(images / elapsed * 60, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--profile", default="draft", choices=sorted(PROFILES))
+    parser.add_argument("--batch-sizes", default="1,2,4")
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--size", type=int, default=256)
+    args = parser.parse_args()
+
+    if args.model:
+        image_worker.settings.image_model = args.model
+    image_worker._get_pipe().set_progress_bar_config(disable=True)
+    # Pin steps and resolution so only the batch size varies between runs.
+    profile = replace(PROFILES[args.profile], steps=args.steps, size=args.size)
+
+    results = [_bench(profile, int(size), args.images) for size in args.batch_sizes.split(",")]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
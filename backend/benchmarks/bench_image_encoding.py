@@ -0,0 +1,70 @@
+"""Payload size and serialization CPU per image for each /image/generate response form.
+
+Compares the legacy base64 JSON body with raw PNG, WebP and JPEG bytes, starting
+from the PNG the worker produces. Uses a synthetic photo-like image so it runs
+without the diffusion model. Run from the repo root::
+
+    python -m backend.benchmarks.bench_image_encoding --size 512 --iterations 50
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import time
+from io import BytesIO
+
+from backend.core.image_encoding import encode_image
+
+
+def _sample_png(size: int) -> bytes:
+    from PIL import Image, ImageFilter
+
+    noise = Image.effect_noise((size, size), 64).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+    image = Image.blend(noise, gradient, 0.6).filter(ImageFilter.GaussianBlur(1))
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def _legacy_json(png_bytes: bytes, _quality: int) -> bytes:
+    return json.dumps({"image_base64": base64.b64encode(png_bytes).decode("utf-8"), "seed": 0}).encode()
+
+
+def _bench(name: str, encode, png_bytes: bytes, quality: int, iterations: int) -> dict:
+    body = encode(png_bytes, quality)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encode(png_bytes, quality)
+    per_image_ms = (time.perf_counter() - start) / iterations * 1000
+    return {
+        "form": name,
+        "bytes": len(body),
+        "encode_ms": round(per_image_ms, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--quality", type=int, default=80)
+    args = parser.parse_args()
+
+    png_bytes = _sample_png(args.size)
+    forms = {
+        "json_base64_png": _legacy_json,
+        "png": lambda data, quality: encode_image(data, "png", quality),
+        "webp": lambda data, quality: encode_image(data, "webp", quality),
+        "jpeg": lambda data, quality: encode_image(data, "jpeg", quality),
+    }
+    results = [_bench(name, encode, png_bytes, args.quality, args.iterations) for name, encode in forms.items()]
+    legacy_bytes = results[0]["bytes"]
+    for result in results:
+        result["vs_legacy"] = round(result["bytes"] / legacy_bytes, 3)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Seconds per image and peak memory for each image generation profile.
+
+Every profile runs in a fresh spawned process so its peak RSS (and peak CUDA
+memory on GPU) is not inflated by the previous one. Prints JSON, or a Markdown
+table with ``--markdown``. Run from the repo root::
+
+    python -m backend.benchmarks.bench_image_profiles --images 2 --markdown
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+_PROMPT = "a watercolor lighthouse at dusk"
+
+
+def _measure(name: str, images: int, model: str | None, queue) -> None:
+    os.environ["IMAGE_ENABLED"] = "true"
+    from backend.core import image_worker
+    from backend.core.image_profiles import PROFILES
+
+    if model:
+        image_worker.settings.image_model = model
+    profile = PROFILES[name]
+    image_worker._get_pipe().set_progress_bar_config(disable=True)
+    image_worker.render_png(_PROMPT, profile)  # warm-up: weights, scheduler variant, kernels
+    cuda = image_worker._device.startswith("cuda")
+    if cuda:
+        import torch
+
+        torch.cuda.reset_peak_memory_stats()
+    start = time.perf_counter()
+    for _ in range(images):
+        image_worker.render_png(_PROMPT, profile)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_kb //= 1024
+    result = {
+        "profile": name,
+        "scheduler": profile.scheduler,
+        "steps": profile.steps,
+        "size": profile.size,
+        "seconds_per_image": round(elapsed / images, 2),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+    }
+    if cuda:
+        result["peak_cuda_mb"] = round(torch.cuda.max_memory_allocated() / 2**20, 1)
+    queue.put(result)
+
+
+def _markdown(results: list[dict]) -> str:
+    columns = list(results[0])
+    lines = [
+        "| " + " | ".join(columns) + " |",
+        "|" + "|".join("---" for _ in columns) + "|",
+    ]
+    for row in results:
+        lines.append("| " + " | ".join(str(row.get(column, "")) for column in columns) + " |")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", default="draft,standard,quality")
+    parser.add_argument("--images", type=int, default=2)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--markdown", action="store_true")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name in args.profiles.split(","):
+        queue = context.Queue()
+        process = context.Process(target=_measure, args=(name, args.images, args.model, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+    print(_markdown(results) if args.markdown else json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+"""End-to-end load test of the API with deterministic stub models or a small local one.
+
+Starts the app in a child process (``--serve``) on a scratch SQLite database, with
+the chat model replaced by a stub that waits ``--stub-ttft-ms`` and then emits
+``--stub-tokens`` at ``--stub-tokens-per-second``; ``--model local`` keeps the real
+chat model instead (point ``CHAT_MODEL`` at a small checkpoint). Language detection
+and translation are always stubbed so the numbers are about the API and the chat
+model. Stubs sleep rather than burn CPU, so they model latency, not GIL contention.
+
+``--concurrency`` virtual users, each with its own account, run a weighted mix of
+chat, stream, session listing, translate and login calls for ``--duration``
+seconds after ``--warmup``. Prints JSON with throughput, p50/p95/p99 latency,
+time to first streamed token and SQL statements per request for each scenario;
+``--baseline`` compares against an earlier ``--output`` and exits 1 on a
+regression. ``--url`` drives an already running deployment instead (SQL counts
+are then omitted). Run from the repo root::
+
+    python -m backend.benchmarks.bench_load --concurrency 16 --duration 30 --output load.json
+    python -m backend.benchmarks.bench_load --concurrency 16 --duration 30 --baseline load.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+import httpx
+
+_STATS_PATH = "/__bench/stats"
+_PATHS = {
+    "chat": "/chat/",
+    "stream": "/chat/stream",
+    "sessions": "/chat/sessions",
+    "translate": "/translate/translate",
+    "auth": "/auth/login",
+}
+_PROMPTS = (
+    "Summarise the plot of Hamlet in three sentences.",
+    "What is the difference between a process and a thread?",
+    "Suggest a name for a bakery that sells only croissants.",
+    "Explain how HTTPS keeps a password private on the way to the server.",
+)
+_STUB_WORDS = ("the ", "quick ", "brown ", "fox ", "jumps ", "over ", "a ", "lazy ", "dog. ")
+_PASSWORD = "bench-password-1"
+
+# --- server side --------------------------------------------------------------
+
+_QUERIES: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("bench_queries", default=None)
+
+
+class _QueryCounter:
+    """ASGI wrapper counting SQL statements per request path, served at ``_STATS_PATH``.
+
+    Starlette copies the context into the threadpool, so statements issued by sync
+    endpoints and streamed bodies are attributed to the request that caused them.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.stats: defaultdict[str, list[int]] = defaultdict(lambda: [0, 0])
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["path"] == _STATS_PATH:
+            from starlette.responses import JSONResponse
+
+            if scope["method"] == "DELETE":
+                self.stats.clear()
+            body = {path: {"requests": requests, "queries": queries} for path, (requests, queries) in self.stats.items()}
+            await JSONResponse(body)(scope, receive, send)
+            return
+        counter = [0]
+        token = _QUERIES.set(counter)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _QUERIES.reset(token)
+            entry = self.stats[scope["path"]]
+            entry[0] += 1
+            entry[1] += counter[0]
+
+
+def _count_query(*_args) -> None:
+    counter = _QUERIES.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def _install_stubs(args: argparse.Namespace) -> None:
+    from backend.api import translate
+    from backend.core import llm_handler
+    from backend.utils import language_tools
+
+    per_token = 1.0 / args.stub_tokens_per_second
+
+    def _tokens(max_new_tokens: int) -> list[str]:
+        count = min(args.stub_tokens, max_new_tokens)
+        return [_STUB_WORDS[index % len(_STUB_WORDS)] for index in range(count)]
+
+    def generate_reply(prompt, history=None, max_new_tokens=300, temperature=0.7, cancel_event=None):
+        time.sleep(args.stub_ttft_ms / 1000)
+        generated = []
+        for token in _tokens(max_new_tokens):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            generated.append(token)
+            time.sleep(per_token)
+        return "".join(generated)
+
+    def stream_reply(prompt, history=None, max_new_tokens=300, temperature=0.7, cancel_event=None):
+        time.sleep(args.stub_ttft_ms / 1000)
+        for index, token in enumerate(_tokens(max_new_tokens)):
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            if index:
+                time.sleep(per_token)
+            yield token
+
+    if args.model == "stub":
+        llm_handler.generate_reply = generate_reply
+        llm_handler.stream_reply = stream_reply
+    language_tools.detect_language = lambda text: "en"
+    language_tools.translate_text = lambda text, from_lang, to_lang: text
+    translate.translate_text = lambda text, from_code, to_code: text
+
+
+def _serve(args: argparse.Namespace) -> None:
+    import uvicorn
+    from sqlalchemy import event
+
+    from backend import main as app_module
+    from backend.db.session import engine
+
+    _install_stubs(args)
+    event.listen(engine, "before_cursor_execute", _count_query)
+    uvicorn.run(_QueryCounter(app_module.app), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# --- load generator -----------------------------------------------------------
+
+
+def _percentiles(values: list[float]) -> Optional[dict]:
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {
+        "p50": rank(0.50),
+        "p95": rank(0.95),
+        "p99": rank(0.99),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+class _VirtualUser:
+    def __init__(self, index: int, client: httpx.AsyncClient, args: argparse.Namespace) -> None:
+        self.email = f"bench-{index}@example.com"
+        self.client = client
+        self.args = args
+        self.rng = random.Random(args.seed + index)
+        self.headers: dict[str, str] = {}
+        self.session_id: Optional[str] = None
+        self.turns = 0
+
+    async def login(self) -> None:
+        payload = {"email": self.email, "password": _PASSWORD}
+        response = await self.client.post("/auth/signup", json=payload)
+        if response.status_code == 400:  # left over from an earlier run against --url
+            response = await self.client.post("/auth/login", json=payload)
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def _chat_body(self) -> dict:
+        if self.turns >= self.args.turns:
+            self.session_id, self.turns = None, 0
+        self.turns += 1
+        body = {"message": self.rng.choice(_PROMPTS)}
+        if self.session_id:
+            body["session_id"] = self.session_id
+        return body
+
+    async def run(self, scenario: str) -> tuple[int, Optional[float]]:
+        """Issue one call; returns ``(status, ttft_seconds)`` with status 0 for a failed stream."""
+        client, headers = self.client, self.headers
+        if scenario == "chat":
+            response = await client.post(_PATHS["chat"], json=self._chat_body(), headers=headers)
+            if response.status_code == 200:
+                self.session_id = response.json()["session_id"]
+            return response.status_code, None
+        if scenario == "stream":
+            started = time.perf_counter()
+            ttft = None
+            event = None
+            async with client.stream("POST", _PATHS["stream"], json=self._chat_body(), headers=headers) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    return response.status_code, None
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[7:]
+                    elif line.startswith("data: ") and event == "message" and ttft is None:
+                        ttft = time.perf_counter() - started
+                    elif line.startswith("data: ") and event == "done":
+                        self.session_id = json.loads(line[6:])["session_id"]
+                        return 200, ttft
+            return 0, ttft
+        if scenario == "sessions":
+            response = await client.get(_PATHS["sessions"], headers=headers)
+        elif scenario == "translate":
+            body = {"text": self.rng.choice(_PROMPTS), "from": "en", "to": "ur"}
+            response = await client.post(_PATHS["translate"], json=body, headers=headers)
+        else:
+            response = await client.post(_PATHS["auth"], json={"email": self.email, "password": _PASSWORD})
+        return response.status_code, None
+
+
+async def _drive(url: str, args: argparse.Namespace, mix: dict[str, int]) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=args.request_timeout, limits=limits) as client:
+        users = [_VirtualUser(index, client, args) for index in range(args.concurrency)]
+        await asyncio.gather(*(user.login() for user in users))
+
+        latencies: defaultdict[str, list[float]] = defaultdict(list)
+        ttfts: list[float] = []
+        statuses: defaultdict[str, Counter] = defaultdict(Counter)
+        names, weights = list(mix), list(mix.values())
+        warmup_end = time.perf_counter() + args.warmup
+        end = warmup_end + args.duration
+
+        async def loop(user: _VirtualUser) -> None:
+            while (now := time.perf_counter()) < end:
+                scenario = user.rng.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    status, ttft = await user.run(scenario)
+                except httpx.HTTPError:
+                    status, ttft = 0, None
+                if now < warmup_end:
+                    continue
+                latencies[scenario].append((time.perf_counter() - started) * 1000)
+                statuses[scenario][str(status)] += 1
+                if ttft is not None:
+                    ttfts.append(ttft * 1000)
+
+        async def reset_stats() -> None:
+            await asyncio.sleep(max(0.0, warmup_end - time.perf_counter()))
+            try:
+                await client.delete(_STATS_PATH)
+            except httpx.HTTPError:
+                pass
+
+        await asyncio.gather(reset_stats(), *(loop(user) for user in users))
+
+        try:
+            response = await client.get(_STATS_PATH)
+            server_stats = response.json() if response.status_code == 200 else {}
+        except (httpx.HTTPError, ValueError):
+            server_stats = {}
+
+    scenarios = {}
+    for scenario in names:
+        count = len(latencies[scenario])
+        ok = sum(n for status, n in statuses[scenario].items() if status.startswith("2"))
+        entry = {
+            "requests": count,
+            "errors": count - ok,
+            "error_rate": round((count - ok) / count, 4) if count else 0.0,
+            "status": dict(statuses[scenario]),
+            "throughput_rps": round(count / args.duration, 2),
+            "latency_ms": _percentiles(latencies[scenario]),
+        }
+        if scenario == "stream":
+            entry["ttft_ms"] = _percentiles(ttfts)
+        db = server_stats.get(_PATHS[scenario])
+        entry["db_queries_per_request"] = round(db["queries"] / db["requests"], 2) if db and db["requests"] else None
+        scenarios[scenario] = entry
+    total = sum(entry["requests"] for entry in scenarios.values())
+    return {"requests": total, "throughput_rps": round(total / args.duration, 2), "scenarios": scenarios}
+
+
+# --- baseline comparison ------------------------------------------------------
+
+# (metric path, True when higher is better)
+_COMPARED = (
+    ("throughput_rps", True),
+    ("latency_ms.p50", False),
+    ("latency_ms.p95", False),
+    ("latency_ms.p99", False),
+    ("ttft_ms.p95", False),
+    ("db_queries_per_request", False),
+    ("error_rate", False),
+)
+
+
+def _lookup(entry: dict, path: str) -> Optional[float]:
+    for key in path.split("."):
+        entry = entry.get(key) if isinstance(entry, dict) else None
+    return entry
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """Per-scenario metric changes; SQL counts and error rate regress on any increase."""
+    rows = []
+    for scenario, entry in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if before is None:
+            continue
+        for path, higher_is_better in _COMPARED:
+            old, new = _lookup(before, path), _lookup(entry, path)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+            worse = -change if higher_is_better else change
+            exact = path in {"db_queries_per_request", "error_rate"}
+            rows.append({
+                "scenario": scenario,
+                "metric": path,
+                "baseline": old,
+                "current": new,
+                "change_pct": round(change * 100, 1) if change != float("inf") else None,
+                "regressed": worse > 0 if exact else worse > tolerance,
+            })
+    return rows
+
+
+def _parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in _PATHS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}; expected one of {', '.join(_PATHS)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{url}/healthz", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"{url} not ready after {timeout:.0f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=None, help="drive this running deployment instead of starting one")
+    parser.add_argument("--model", choices=("stub", "local"), default="stub")
+    parser.add_argument("--stub-ttft-ms", type=float, default=150.0)
+    parser.add_argument("--stub-tokens", type=int, default=64)
+    parser.add_argument("--stub-tokens-per-second", type=float, default=25.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--mix", type=_parse_mix, default="chat=2,stream=4,sessions=2,translate=1,auth=1")
+    parser.add_argument("--turns", type=int, default=4, help="chat turns per session before starting a new one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--output", default=None, help="also write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown before flagging")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        _serve(args)
+        return
+
+    process = None
+    url = args.url
+    if url is None:
+        scratch = tempfile.mkdtemp(prefix="zgpt-load-")
+        env = os.environ.copy()
+        env.setdefault("DB_URL", f"sqlite:///{scratch}/load.db")
+        env.setdefault("RATE_LIMIT_PER_MINUTE", "1000000")
+        env.setdefault("IMAGE_ENABLED", "false")
+        command = [sys.executable, "-m", "backend.benchmarks.bench_load", "--serve", *sys.argv[1:]]
+        process = subprocess.Popen(command, env=env)
+        url = f"http://127.0.0.1:{args.port}"
+    try:
+        if process is not None:
+            _wait_ready(url, process, timeout=600 if args.model == "local" else 60)
+        report = asyncio.run(_drive(url, args, args.mix))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report["config"] = {
+        "model": args.model if args.url is None else "external",
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "mix": args.mix,
+        "stub": {
+            "ttft_ms": args.stub_ttft_ms,
+            "tokens": args.stub_tokens,
+            "tokens_per_second": args.stub_tokens_per_second,
+        } if args.model == "stub" and args.url is None else None,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            report["comparison"] = compare(report, json.load(handle), args.tolerance)
+        regressions = [row for row in report["comparison"] if row["regressed"]]
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    print(json.dumps(report, indent=2))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Storage savings and read overhead of compressed ``ChatMessage.content``.
+
+Run from the repo root::
+
+    python -m backend.benchmarks.bench_message_compression --iterations 2000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import string
+import time
+
+from backend.db.compression import _ZSTD_AVAILABLE, compress_text, decompress_text
+
+
+def _sample_corpus(seed: int = 7) -> dict[str, str]:
+    rng = random.Random(seed)
+    words = ["model", "token", "session", "python", "latency", "reply", "def", "return", "import", "self"]
+    prose = " ".join(rng.choice(words) for _ in range(1500))
+    code = "\n".join(
+        f"    def handler_{i}(self, request):\n        return self.process(request, retries={i % 5})"
+        for i in range(150)
+    )
+    noise = "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(6000))
+    return {
+        "short_reply": "Sure, here is a quick answer.",
+        "assistant_prose": prose,
+        "pasted_code": code,
+        "random_paste": noise,
+    }
+
+
+def _time_per_call(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(iterations: int) -> list[dict]:
+    codecs = ["none", "zlib"] + (["zstd"] if _ZSTD_AVAILABLE else [])
+    results = []
+    for name, text in _sample_corpus().items():
+        raw_bytes = len(text.encode("utf-8"))
+        for codec in codecs:
+            payload = compress_text(text, codec=codec, min_bytes=1024)
+            results.append({
+                "sample": name,
+                "codec": codec,
+                "raw_bytes": raw_bytes,
+                "stored_bytes": len(payload),
+                "ratio": round(len(payload) / raw_bytes, 3),
+                "write_us": round(_time_per_call(lambda: compress_text(text, codec=codec, min_bytes=1024), iterations), 2),
+                "read_us": round(_time_per_call(lambda: decompress_text(payload), iterations), 2),
+            })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations), indent=2))
+
+
+if __name__ == "__main__":
+    main()
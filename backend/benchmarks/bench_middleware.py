@@ -0,0 +1,153 @@
+"""Per-request overhead and SSE chunk latency of the middleware stack.
+
+Compares the pure ASGI middleware against an equivalent ``BaseHTTPMiddleware``
+stack (the previous implementation). Run from the repo root::
+
+    python -m backend.benchmarks.bench_middleware --requests 5000 --chunks 500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from backend.middleware.rate_limit import RateLimitMiddleware
+from backend.middleware.request_context import RequestContextMiddleware
+from backend.middleware.security_headers import SecurityHeadersMiddleware
+
+_BIG_LIMIT = 10**9
+
+
+class _LegacyRequestContext(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = "bench"
+        response.headers["X-Response-Time"] = "0"
+        return response
+
+
+class _LegacyRateLimit(BaseHTTPMiddleware):
+    def __init__(self, app):
+        super().__init__(app)
+        self.limiter = RateLimitMiddleware(app, limit_per_minute=_BIG_LIMIT)
+
+    async def dispatch(self, request, call_next):
+        self.limiter.memory.check("ip:bench")
+        return await call_next(request)
+
+
+class _LegacySecurityHeaders(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers.setdefault("X-Frame-Options", "DENY")
+        return response
+
+
+async def _ping(_request):
+    return PlainTextResponse("pong")
+
+
+def _stream_endpoint(chunks: int, stamps: list[float]):
+    async def _stream(_request):
+        async def body():
+            for _ in range(chunks):
+                stamps.append(time.perf_counter())
+                yield "event: message\ndata: tok\n\n"
+                await asyncio.sleep(0)
+
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    return _stream
+
+
+def _build_app(kind: str, chunks: int, stamps: list[float]) -> Starlette:
+    if kind == "legacy":
+        middleware = [
+            Middleware(_LegacySecurityHeaders),
+            Middleware(_LegacyRateLimit),
+            Middleware(_LegacyRequestContext),
+        ]
+    elif kind == "asgi":
+        middleware = [
+            Middleware(SecurityHeadersMiddleware),
+            Middleware(RateLimitMiddleware, limit_per_minute=_BIG_LIMIT),
+            Middleware(RequestContextMiddleware),
+        ]
+    else:
+        middleware = []
+    routes = [Route("/ping", _ping), Route("/stream", _stream_endpoint(chunks, stamps))]
+    return Starlette(routes=routes, middleware=middleware)
+
+
+async def _call(app, path: str, on_body=None) -> None:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [],
+        "client": ("127.0.0.1", 5000),
+        "server": ("bench", 80),
+    }
+    sent_request = False
+
+    async def receive():
+        nonlocal sent_request
+        if not sent_request:
+            sent_request = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if on_body and message["type"] == "http.response.body" and message.get("body"):
+            on_body()
+
+    await app(scope, receive, send)
+
+
+async def _bench(kind: str, requests: int, chunks: int) -> dict:
+    stamps: list[float] = []
+    app = _build_app(kind, chunks, stamps)
+    for _ in range(50):
+        await _call(app, "/ping")
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await _call(app, "/ping")
+    per_request_us = (time.perf_counter() - start) / requests * 1e6
+
+    arrivals: list[float] = []
+    await _call(app, "/stream", on_body=lambda: arrivals.append(time.perf_counter()))
+    latencies = sorted((arrival - stamp) * 1e6 for stamp, arrival in zip(stamps, arrivals))
+    return {
+        "stack": kind,
+        "per_request_us": round(per_request_us, 2),
+        "sse_chunk_latency_p50_us": round(statistics.median(latencies), 2),
+        "sse_chunk_latency_p99_us": round(latencies[int(len(latencies) * 0.99) - 1], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--chunks", type=int, default=500)
+    args = parser.parse_args()
+    results = [asyncio.run(_bench(kind, args.requests, args.chunks)) for kind in ("none", "legacy", "asgi")]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
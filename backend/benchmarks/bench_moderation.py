@@ -0,0 +1,66 @@
+"""Moderation cost per prompt: one regex per rule versus the combined engine.
+
+Generates ``--rules`` synthetic phrase rules on top of the defaults and scans a
+clean prompt (the common, worst case: every rule must fail). Run from the repo
+root::
+
+    python -m backend.benchmarks.bench_moderation --rules 10,100,1000 --chars 4000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import time
+
+from backend.core.moderation import DEFAULT_RULES, ModerationEngine, ModerationRule
+
+
+def _rules(count: int) -> list[ModerationRule]:
+    extra = [ModerationRule(f"synthetic_{index}", (f"forbidden phrase {index}",), "synthetic") for index in range(count)]
+    return list(DEFAULT_RULES) + extra
+
+
+def _per_rule_loop(rules: list[ModerationRule]):
+    compiled = [
+        (rule, re.compile("|".join(r"\s+".join(map(re.escape, phrase.split())) for phrase in rule.phrases), re.IGNORECASE))
+        for rule in rules
+    ]
+
+    def scan(text: str):
+        for rule, pattern in compiled:
+            if pattern.search(text):
+                return rule.category
+        return None
+
+    return scan
+
+
+def _time(scan, text: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        scan(text)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", default="10,100,1000")
+    parser.add_argument("--chars", type=int, default=4000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    text = ("The quick brown fox jumps over the lazy dog. " * (args.chars // 45 + 1))[: args.chars]
+    results = []
+    for count in (int(value) for value in args.rules.split(",")):
+        rules = _rules(count)
+        results.append({
+            "rules": len(rules),
+            "per_rule_loop_us": round(_time(_per_rule_loop(rules), text, args.iterations), 1),
+            "combined_us": round(_time(ModerationEngine(rules).scan, text, args.iterations), 1),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Resident and proportional memory of the API with one worker, N workers, and N preloaded workers.
+
+Starts ``python -m backend.serve`` for each layout, waits for ``/healthz`` and sums
+``Rss`` / ``Pss`` from ``/proc/<pid>/smaps_rollup`` over the master and its workers.
+PSS splits shared pages between the processes mapping them, so it is the number
+that shows weights shared through ``--preload`` and memory-mapped safetensors.
+Linux only. Prints JSON. Run from the repo root::
+
+    python -m backend.benchmarks.bench_worker_memory --workers 4
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def _children(pid: int) -> list[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", encoding="ascii") as handle:
+            return [int(child) for child in handle.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def _rollup(pid: int) -> dict[str, int]:
+    totals = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as handle:
+        for line in handle:
+            name, _, value = line.partition(":")
+            if name in {"Rss", "Pss"}:
+                totals[name.lower()] = int(value.split()[0])
+    return totals
+
+
+def _wait_ready(url: str, process: subprocess.Popen, workers: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"launcher exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                # Every worker must be listening, not just the first one up.
+                if response.status == 200 and len(_children(process.pid)) >= workers:
+                    time.sleep(2)
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} not ready after {timeout:.0f}s")
+
+
+def _measure(label: str, workers: int, preload: bool, args: argparse.Namespace) -> dict:
+    command = [
+        sys.executable, "-m", "backend.serve",
+        "--host", "127.0.0.1",
+        "--port", str(args.port),
+        "--workers", str(workers),
+        "--models", args.models,
+        "--log-level", "warning",
+    ]
+    if preload:
+        command.append("--preload")
+    process = subprocess.Popen(command, env=os.environ.copy())
+    try:
+        _wait_ready(f"http://127.0.0.1:{args.port}/healthz", process, workers, args.timeout)
+        pids = [process.pid, *_children(process.pid)]
+        rollups = [_rollup(pid) for pid in pids]
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return {
+        "layout": label,
+        "workers": workers,
+        "preload": preload,
+        "rss_mb": round(sum(entry["rss"] for entry in rollups) / 1024, 1),
+        "pss_mb": round(sum(entry["pss"] for entry in rollups) / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--models", default="chat,detector")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    args = parser.parse_args()
+
+    layouts = [
+        ("single", 1, False),
+        ("prefork", args.workers, False),
+        ("prefork-preload", args.workers, True),
+    ]
+    results = [_measure(label, workers, preload, args) for label, workers, preload in layouts]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
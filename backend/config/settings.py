@@ -28,19 +28,64 @@ class Settings(BaseModel):
     chat_model: str = Field(default=os.getenv("CHAT_MODEL", "TinyLlama/TinyLlama-1.1B-Chat-v1.0"))
     chat_device: str = Field(default=os.getenv("CHAT_DEVICE", "auto"))
     chat_precision: str = Field(default=os.getenv("CHAT_PRECISION", "float16"))
+    model_mmap_weights: bool = Field(default=os.getenv("MODEL_MMAP_WEIGHTS", "true").lower() == "true")
+    chat_max_concurrency: int = Field(default=int(os.getenv("CHAT_MAX_CONCURRENCY", "2")))
+    chat_queue_size: int = Field(default=int(os.getenv("CHAT_QUEUE_SIZE", "16")))
+    chat_queue_timeout_seconds: float = Field(default=float(os.getenv("CHAT_QUEUE_TIMEOUT_SECONDS", "30")))
+    inference_socket: str = Field(default=os.getenv("INFERENCE_SOCKET", ""))
+    inference_timeout_seconds: float = Field(default=float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "300")))
+    sse_flush_interval_ms: float = Field(default=float(os.getenv("SSE_FLUSH_INTERVAL_MS", "50")))
+    sse_flush_bytes: int = Field(default=int(os.getenv("SSE_FLUSH_BYTES", "1024")))
+    sse_heartbeat_seconds: float = Field(default=float(os.getenv("SSE_HEARTBEAT_SECONDS", "15")))
 
     image_model: str = Field(default=os.getenv("IMAGE_MODEL", "runwayml/stable-diffusion-v1-5"))
     image_device: str = Field(default=os.getenv("IMAGE_DEVICE", "cpu"))
     image_generation_enabled: bool = Field(default=os.getenv("IMAGE_ENABLED", "true").lower() == "true")
+    image_worker_mode: str = Field(default=os.getenv("IMAGE_WORKER_MODE", "thread"))
+    image_job_backend: str = Field(default=os.getenv("IMAGE_JOB_BACKEND", "local"))
+    image_job_queue_size: int = Field(default=int(os.getenv("IMAGE_JOB_QUEUE_SIZE", "32")))
+    image_results_dir: str = Field(default=os.getenv("IMAGE_RESULTS_DIR", "./data/images"))
+    image_job_ttl_seconds: float = Field(default=float(os.getenv("IMAGE_JOB_TTL_SECONDS", "86400")))
+    image_max_concurrency: int = Field(default=int(os.getenv("IMAGE_MAX_CONCURRENCY", "1")))
+    image_queue_size: int = Field(default=int(os.getenv("IMAGE_QUEUE_SIZE", "4")))
+    image_queue_timeout_seconds: float = Field(default=float(os.getenv("IMAGE_QUEUE_TIMEOUT_SECONDS", "60")))
+    image_profile: str = Field(default=os.getenv("IMAGE_PROFILE", "standard"))
+    image_cache_dir: str = Field(default=os.getenv("IMAGE_CACHE_DIR", "./data/image-cache"))
+    image_cache_max_mb: float = Field(default=float(os.getenv("IMAGE_CACHE_MAX_MB", "512")))
+    image_jpeg_quality: int = Field(default=int(os.getenv("IMAGE_JPEG_QUALITY", "85")))
+    image_webp_quality: int = Field(default=int(os.getenv("IMAGE_WEBP_QUALITY", "80")))
+    image_batch_size: int = Field(default=int(os.getenv("IMAGE_BATCH_SIZE", "1")))
+    image_batch_window_ms: float = Field(default=float(os.getenv("IMAGE_BATCH_WINDOW_MS", "50")))
 
     translate_model: str = Field(default=os.getenv("TRANSLATE_MODEL", "argos_translate"))
 
     moderation_enabled: bool = Field(default=os.getenv("MODERATION_ENABLED", "true").lower() == "true")
+    moderation_rules_path: str = Field(default=os.getenv("MODERATION_RULES_PATH", ""))
+    moderation_rules_reload_seconds: float = Field(default=float(os.getenv("MODERATION_RULES_RELOAD_SECONDS", "5")))
+    moderation_stream_window: int = Field(default=int(os.getenv("MODERATION_STREAM_WINDOW", "256")))
+    moderation_classifier: str = Field(default=os.getenv("MODERATION_CLASSIFIER", ""))
+    moderation_classifier_device: str = Field(default=os.getenv("MODERATION_CLASSIFIER_DEVICE", "cpu"))
+    moderation_classifier_threshold: float = Field(default=float(os.getenv("MODERATION_CLASSIFIER_THRESHOLD", "0.8")))
+    moderation_classifier_batch_size: int = Field(default=int(os.getenv("MODERATION_CLASSIFIER_BATCH_SIZE", "16")))
+    moderation_classifier_batch_window_ms: float = Field(
+        default=float(os.getenv("MODERATION_CLASSIFIER_BATCH_WINDOW_MS", "5"))
+    )
+    moderation_classifier_cache_size: int = Field(default=int(os.getenv("MODERATION_CLASSIFIER_CACHE_SIZE", "4096")))
+    moderation_classifier_timeout_seconds: float = Field(
+        default=float(os.getenv("MODERATION_CLASSIFIER_TIMEOUT_SECONDS", "2"))
+    )
 
     rate_limit_per_minute: int = Field(default=int(os.getenv("RATE_LIMIT_PER_MINUTE", "60")))
     rate_limit_window_seconds: int = Field(default=int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "60")))
+    rate_limit_max_keys: int = Field(default=int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+    rate_limit_route_costs: str | None = Field(default=os.getenv("RATE_LIMIT_ROUTE_COSTS"))
+    rate_limit_max_concurrent_generations: int = Field(
+        default=int(os.getenv("RATE_LIMIT_MAX_CONCURRENT_GENERATIONS", "2"))
+    )
 
     db_url: str = Field(default=os.getenv("DB_URL", "sqlite:///./data/zgpt.db"))
+    message_compression: str = Field(default=os.getenv("MESSAGE_COMPRESSION", "zlib"))
+    message_compression_min_bytes: int = Field(default=int(os.getenv("MESSAGE_COMPRESSION_MIN_BYTES", "1024")))
     redis_url: str | None = Field(default=os.getenv("REDIS_URL"))
 
     jwt_secret_key: str = Field(default=os.getenv("JWT_SECRET_KEY", "changeme"))
@@ -48,6 +93,17 @@ class Settings(BaseModel):
     jwt_access_token_expire_minutes: int = Field(default=int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "60")))
     jwt_refresh_token_expire_minutes: int = Field(default=int(os.getenv("JWT_REFRESH_TOKEN_EXPIRE_MINUTES", "10080")))
 
+    bcrypt_rounds: int = Field(default=int(os.getenv("BCRYPT_ROUNDS", "12")))
+    password_hash_workers: int = Field(default=int(os.getenv("PASSWORD_HASH_WORKERS", "2")))
+    password_hash_max_pending: int = Field(default=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64")))
+
+    auth_cache_ttl_seconds: int = Field(default=int(os.getenv("AUTH_CACHE_TTL_SECONDS", "30")))
+    auth_cache_max_entries: int = Field(default=int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000")))
+    auth_cache_redis: bool = Field(default=os.getenv("AUTH_CACHE_REDIS", "false").lower() == "true")
+
+    profiling_enabled: bool = Field(default=os.getenv("PROFILING_ENABLED", "false").lower() == "true")
+    profiling_max_seconds: float = Field(default=float(os.getenv("PROFILING_MAX_SECONDS", "30")))
+
     metrics_enabled: bool = Field(default=os.getenv("METRICS_ENABLED", "true").lower() == "true")
     metrics_endpoint: str = Field(default=os.getenv("METRICS_ENDPOINT", "/metrics"))
 
@@ -89,6 +145,157 @@ class Settings(BaseModel):
             raise ValueError("CHAT_PRECISION must be float16, float32, or bfloat16")
         return normalized
 
+    @field_validator("image_worker_mode")
+    @classmethod
+    def validate_image_worker_mode(cls, value: str) -> str:
+        normalized = (value or "thread").lower()
+        if normalized not in {"thread", "process"}:
+            raise ValueError("IMAGE_WORKER_MODE must be thread or process")
+        return normalized
+
+    @field_validator("image_job_backend")
+    @classmethod
+    def validate_image_job_backend(cls, value: str) -> str:
+        normalized = (value or "local").lower()
+        if normalized not in {"local", "redis"}:
+            raise ValueError("IMAGE_JOB_BACKEND must be local or redis")
+        return normalized
+
+    @field_validator("image_job_ttl_seconds")
+    @classmethod
+    def validate_image_job_ttl(cls, value: float) -> float:
+        if value <= 0:
+            raise ValueError("IMAGE_JOB_TTL_SECONDS must be greater than zero")
+        return value
+
+    @field_validator("chat_max_concurrency", "image_max_concurrency")
+    @classmethod
+    def validate_max_concurrency(cls, value: int) -> int:
+        if value <= 0:
+            raise ValueError("CHAT_MAX_CONCURRENCY and IMAGE_MAX_CONCURRENCY must be greater than zero")
+        return value
+
+    @field_validator("image_profile")
+    @classmethod
+    def validate_image_profile(cls, value: str) -> str:
+        normalized = (value or "standard").lower()
+        if normalized not in {"draft", "standard", "quality"}:
+            raise ValueError("IMAGE_PROFILE must be draft, standard, or quality")
+        return normalized
+
+    @field_validator("image_cache_max_mb")
+    @classmethod
+    def validate_image_cache_size(cls, value: float) -> float:
+        if value < 0:
+            raise ValueError("IMAGE_CACHE_MAX_MB must not be negative")
+        return value
+
+    @field_validator("image_jpeg_quality", "image_webp_quality")
+    @classmethod
+    def validate_image_quality(cls, value: int) -> int:
+        if not 1 <= value <= 100:
+            raise ValueError("IMAGE_JPEG_QUALITY and IMAGE_WEBP_QUALITY must be between 1 and 100")
+        return value
+
+    @field_validator("image_batch_size")
+    @classmethod
+    def validate_image_batch_size(cls, value: int) -> int:
+        if value <= 0:
+            raise ValueError("IMAGE_BATCH_SIZE must be greater than zero")
+        return value
+
+    @field_validator("sse_flush_interval_ms", "sse_heartbeat_seconds")
+    @classmethod
+    def validate_sse_timings(cls, value: float) -> float:
+        if value < 0:
+            raise ValueError("SSE_FLUSH_INTERVAL_MS and SSE_HEARTBEAT_SECONDS must not be negative")
+        return value
+
+    @field_validator("sse_flush_bytes")
+    @classmethod
+    def validate_sse_flush_bytes(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("SSE_FLUSH_BYTES must be at least 1")
+        return value
+
+    @field_validator("image_batch_window_ms")
+    @classmethod
+    def validate_image_batch_window(cls, value: float) -> float:
+        if value < 0:
+            raise ValueError("IMAGE_BATCH_WINDOW_MS must not be negative")
+        return value
+
+    @field_validator(
+        "chat_queue_size",
+        "image_queue_size",
+        "image_job_queue_size",
+        "chat_queue_timeout_seconds",
+        "image_queue_timeout_seconds",
+    )
+    @classmethod
+    def validate_queue_bounds(cls, value):
+        if value < 0:
+            raise ValueError("Admission queue sizes and timeouts must not be negative")
+        return value
+
+    @field_validator("moderation_rules_reload_seconds", "moderation_stream_window")
+    @classmethod
+    def validate_moderation_bounds(cls, value):
+        if value < 0:
+            raise ValueError("MODERATION_RULES_RELOAD_SECONDS and MODERATION_STREAM_WINDOW must not be negative")
+        return value
+
+    @field_validator("moderation_classifier_device")
+    @classmethod
+    def validate_classifier_device(cls, value: str) -> str:
+        normalized = (value or "cpu").lower()
+        # Passed to the transformers pipeline as ``device``, which has no "auto".
+        if normalized == "auto":
+            raise ValueError("MODERATION_CLASSIFIER_DEVICE must be a torch device such as cpu, cuda or cuda:1")
+        return normalized
+
+    @field_validator("moderation_classifier_threshold")
+    @classmethod
+    def validate_classifier_threshold(cls, value: float) -> float:
+        if not 0 < value <= 1:
+            raise ValueError("MODERATION_CLASSIFIER_THRESHOLD must be in (0, 1]")
+        return value
+
+    @field_validator(
+        "moderation_classifier_batch_size",
+        "moderation_classifier_cache_size",
+        "moderation_classifier_timeout_seconds",
+    )
+    @classmethod
+    def validate_classifier_bounds(cls, value):
+        if value <= 0:
+            raise ValueError(
+                "MODERATION_CLASSIFIER_BATCH_SIZE, _CACHE_SIZE and _TIMEOUT_SECONDS must be greater than zero"
+            )
+        return value
+
+    @field_validator("inference_timeout_seconds")
+    @classmethod
+    def validate_inference_timeout(cls, value: float) -> float:
+        if value <= 0:
+            raise ValueError("INFERENCE_TIMEOUT_SECONDS must be greater than zero")
+        return value
+
+    @field_validator("moderation_classifier_batch_window_ms")
+    @classmethod
+    def validate_classifier_window(cls, value: float) -> float:
+        if value < 0:
+            raise ValueError("MODERATION_CLASSIFIER_BATCH_WINDOW_MS must not be negative")
+        return value
+
+
+    @field_validator("profiling_max_seconds")
+    @classmethod
+    def validate_profiling_max_seconds(cls, value: float) -> float:
+        if value <= 0:
+            raise ValueError("PROFILING_MAX_SECONDS must be greater than zero")
+        return value
+
     @field_validator("rate_limit_per_minute")
     @classmethod
     def validate_rate_limit(cls, value: int) -> int:
@@ -103,6 +310,57 @@ class Settings(BaseModel):
             raise ValueError("RATE_LIMIT_WINDOW_SECONDS must be greater than zero")
         return value
 
+    @field_validator("rate_limit_max_keys")
+    @classmethod
+    def validate_rate_limit_keys(cls, value: int) -> int:
+        if value <= 0:
+            raise ValueError("RATE_LIMIT_MAX_KEYS must be greater than zero")
+        return value
+
+    @field_validator("rate_limit_max_concurrent_generations")
+    @classmethod
+    def validate_concurrent_generations(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("RATE_LIMIT_MAX_CONCURRENT_GENERATIONS must not be negative")
+        return value
+
+    @field_validator("message_compression")
+    @classmethod
+    def validate_message_compression(cls, value: str) -> str:
+        allowed = {"none", "zlib", "zstd"}
+        normalized = (value or "none").lower()
+        if normalized not in allowed:
+            raise ValueError("MESSAGE_COMPRESSION must be none, zlib, or zstd")
+        return normalized
+
+    @field_validator("message_compression_min_bytes")
+    @classmethod
+    def validate_compression_threshold(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("MESSAGE_COMPRESSION_MIN_BYTES must not be negative")
+        return value
+
+    @field_validator("bcrypt_rounds")
+    @classmethod
+    def validate_bcrypt_rounds(cls, value: int) -> int:
+        if not 4 <= value <= 31:
+            raise ValueError("BCRYPT_ROUNDS must be between 4 and 31")
+        return value
+
+    @field_validator("password_hash_workers", "password_hash_max_pending")
+    @classmethod
+    def validate_password_pool(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("PASSWORD_HASH_WORKERS and PASSWORD_HASH_MAX_PENDING must not be negative")
+        return value
+
+    @field_validator("auth_cache_ttl_seconds", "auth_cache_max_entries")
+    @classmethod
+    def validate_auth_cache(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("AUTH_CACHE_TTL_SECONDS and AUTH_CACHE_MAX_ENTRIES must not be negative")
+        return value
+
     @field_validator("metrics_endpoint")
     @classmethod
     def normalize_metrics_endpoint(cls, value: str) -> str:
@@ -115,6 +373,18 @@ class Settings(BaseModel):
     def is_prod(self) -> bool:
         return self.app_env.lower() in {"prod", "production"}
 
+    @property
+    def rate_limit_route_costs_dict(self) -> dict[str, int]:
+        if not self.rate_limit_route_costs:
+            return {}
+        costs = {}
+        for part in self.rate_limit_route_costs.split(","):
+            if "=" not in part:
+                continue
+            path, cost = part.split("=", 1)
+            costs[path.strip()] = max(1, int(cost.strip()))
+        return costs
+
     @property
     def otel_headers_dict(self) -> dict[str, str]:
         if not self.otel_exporter_headers:
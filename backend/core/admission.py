@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from backend.config.settings import get_settings
+from backend.core.observability import get_or_create_metric
+
+settings = get_settings()
+
+ADMISSION_IN_FLIGHT = get_or_create_metric(
+    Gauge,
+    "zgpt_admission_in_flight",
+    "Model calls currently holding an admission slot",
+    labelnames=("model",),
+)
+ADMISSION_QUEUED = get_or_create_metric(
+    Gauge,
+    "zgpt_admission_queued",
+    "Model calls waiting for an admission slot",
+    labelnames=("model",),
+)
+ADMISSION_REJECTED = get_or_create_metric(
+    Counter,
+    "zgpt_admission_rejected_total",
+    "Model calls rejected by admission control",
+    labelnames=("model", "reason"),
+)
+ADMISSION_WAIT = get_or_create_metric(
+    Histogram,
+    "zgpt_admission_wait_seconds",
+    "Time spent queued before a model call was admitted",
+    labelnames=("model",),
+)
+
+
+class Priority(IntEnum):
+    """Lower values are admitted first when slots free up."""
+
+    INTERACTIVE = 0
+    STANDARD = 1
+    BATCH = 2
+
+
+class AdmissionRejected(RuntimeError):
+    def __init__(self, model: str, reason: str, retry_after: int = 1) -> None:
+        super().__init__(f"{model} is overloaded ({reason})")
+        self.model = model
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    notify: Callable[[], None] = field(compare=False)
+    granted: bool = field(default=False, compare=False)
+    abandoned: bool = field(default=False, compare=False)
+
+
+class AdmissionSlot:
+    """Handle for an admitted call; ``release`` is idempotent."""
+
+    def __init__(self, controller: "AdmissionController") -> None:
+        self._controller = controller
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._controller._release()
+
+
+class AdmissionController:
+    """Semaphore with a bounded, priority-ordered wait queue and queue-time deadlines.
+
+    Slots are handed directly to the best waiter on release, so a burst never
+    overshoots ``max_concurrency``. Callers beyond ``max_queue`` or waiting longer
+    than ``queue_timeout`` get :class:`AdmissionRejected` immediately instead of
+    piling more work onto a saturated model.
+    """
+
+    def __init__(self, model: str, max_concurrency: int, max_queue: int, queue_timeout: float) -> None:
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queued = 0
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        ADMISSION_REJECTED.labels(model=self.model, reason=reason).inc()
+        return AdmissionRejected(self.model, reason, retry_after=max(1, int(self.queue_timeout)))
+
+    def _publish(self) -> None:
+        ADMISSION_IN_FLIGHT.labels(model=self.model).set(self._in_flight)
+        ADMISSION_QUEUED.labels(model=self.model).set(self._queued)
+
+    def _enqueue(self, priority: Priority, notify: Callable[[], None]) -> Optional[_Waiter]:
+        with self._lock:
+            if self._in_flight < self.max_concurrency and not self._queued:
+                self._in_flight += 1
+                self._publish()
+                return None
+            if self._queued >= self.max_queue:
+                raise self._reject("queue_full")
+            waiter = _Waiter(int(priority), next(self._seq), notify)
+            heapq.heappush(self._waiters, waiter)
+            self._queued += 1
+            self._publish()
+            return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Withdraw ``waiter``; returns False when a slot was granted in the meantime."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            waiter.abandoned = True
+            self._queued -= 1
+            self._publish()
+            return True
+
+    def _release(self) -> None:
+        notify = None
+        with self._lock:
+            while self._waiters:
+                waiter = heapq.heappop(self._waiters)
+                if waiter.abandoned:
+                    continue
+                waiter.granted = True
+                self._queued -= 1
+                notify = waiter.notify
+                break
+            else:
+                self._in_flight -= 1
+            self._publish()
+        if notify is not None:
+            notify()
+
+    def acquire(self, priority: Priority = Priority.STANDARD, timeout: Optional[float] = None) -> AdmissionSlot:
+        started = time.perf_counter()
+        event = threading.Event()
+        waiter = self._enqueue(priority, event.set)
+        if waiter is not None:
+            event.wait(self.queue_timeout if timeout is None else timeout)
+            if self._abandon(waiter):
+                raise self._reject("timeout")
+        ADMISSION_WAIT.labels(model=self.model).observe(time.perf_counter() - started)
+        return AdmissionSlot(self)
+
+    async def acquire_async(
+        self,
+        priority: Priority = Priority.STANDARD,
+        timeout: Optional[float] = None,
+    ) -> AdmissionSlot:
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def notify() -> None:
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        waiter = self._enqueue(priority, notify)
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(granted), self.queue_timeout if timeout is None else timeout)
+            except asyncio.TimeoutError:
+                if self._abandon(waiter):
+                    raise self._reject("timeout")
+            except asyncio.CancelledError:
+                if not self._abandon(waiter):
+                    # Granted while being cancelled: hand the slot straight back.
+                    self._release()
+                raise
+        ADMISSION_WAIT.labels(model=self.model).observe(time.perf_counter() - started)
+        return AdmissionSlot(self)
+
+    @contextmanager
+    def slot(self, priority: Priority = Priority.STANDARD) -> Iterator[AdmissionSlot]:
+        admitted = self.acquire(priority)
+        try:
+            yield admitted
+        finally:
+            admitted.release()
+
+    @asynccontextmanager
+    async def async_slot(self, priority: Priority = Priority.STANDARD) -> AsyncIterator[AdmissionSlot]:
+        admitted = await self.acquire_async(priority)
+        try:
+            yield admitted
+        finally:
+            admitted.release()
+
+
+chat_admission = AdmissionController(
+    "chat",
+    max_concurrency=settings.chat_max_concurrency,
+    max_queue=settings.chat_queue_size,
+    queue_timeout=settings.chat_queue_timeout_seconds,
+)
+# Each image worker renders up to IMAGE_BATCH_SIZE prompts per pipeline call, so that
+# many requests can be admitted per worker for batches to actually form.
+image_admission = AdmissionController(
+    "image",
+    max_concurrency=settings.image_max_concurrency * settings.image_batch_size,
+    max_queue=settings.image_queue_size,
+    queue_timeout=settings.image_queue_timeout_seconds,
+)
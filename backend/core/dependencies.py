@@ -1,7 +1,12 @@
-from fastapi import Depends, HTTPException, status
+import hashlib
+from typing import Any
+
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from opentelemetry import trace
 from sqlmodel import Session
 
+from backend.core.principal_cache import principal_cache
 from backend.core.security import decode_token
 from backend.db import crud
 from backend.db.session import get_session
@@ -9,7 +14,19 @@ from backend.db.session import get_session
 bearer_scheme = HTTPBearer(auto_error=False)
 
 
+def get_token_payload(request: Request, token: str) -> dict[str, Any]:
+    """Decode ``token`` once per request and memoize the claims on ``request.state``."""
+    cached = getattr(request.state, "token_payload", None)
+    if cached is not None and getattr(request.state, "token", None) == token:
+        return cached
+    payload = decode_token(token)
+    request.state.token = token
+    request.state.token_payload = payload
+    return payload
+
+
 def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
     db: Session = Depends(get_session),
 ):
@@ -20,7 +37,7 @@ def get_current_user(
         )
 
     try:
-        payload = decode_token(credentials.credentials)
+        payload = get_token_payload(request, credentials.credentials)
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -34,10 +51,28 @@ def get_current_user(
             detail="Invalid token payload",
         )
 
+    # Tokens minted before ``jti`` was added fall back to a digest of the token itself.
+    jti = payload.get("jti") or hashlib.sha256(credentials.credentials.encode()).hexdigest()
+    user = principal_cache.get(user_id, jti)
+    trace.get_current_span().set_attribute("auth.cache_hit", user is not None)
+    if user is not None:
+        return user
+
     user = crud.get_user(db, user_id=user_id)
     if user is None or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found or inactive",
         )
+    principal_cache.set(user, jti, token_exp=payload.get("exp"))
     return user
+
+
+def get_admin_user(current_user=Depends(get_current_user)):
+    """Authenticated user with the stored ``is_admin`` flag, granted via ``python -m backend.manage``."""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    return current_user
@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, MutableMapping, Optional
+
+from prometheus_client import Counter
+
+from backend.config.settings import get_settings
+from backend.core.image_profiles import GenerationProfile
+from backend.core.image_worker import (
+    ImageBatcher,
+    ImageGenerationCancelled,
+    MemberCancel,
+    await_render,
+    image_batcher,
+)
+from backend.core.observability import get_or_create_metric
+
+LOGGER = logging.getLogger(__name__)
+settings = get_settings()
+
+IMAGE_CACHE_REQUESTS = get_or_create_metric(
+    Counter,
+    "zgpt_image_cache_requests_total",
+    "Image renders served from the disk cache, joined to an identical in-flight render, rendered, or rendered "
+    "uncached (no explicit seed)",
+    labelnames=("result",),
+)
+
+MAX_SEED = 2**32 - 1
+
+
+def random_seed() -> int:
+    """Fresh seed for requests that do not pass one, so asking again gives a new image."""
+    return secrets.randbelow(MAX_SEED + 1)
+
+
+def cache_key(
+    model: str,
+    prompt: str,
+    negative_prompt: Optional[str],
+    seed: int,
+    profile: GenerationProfile,
+) -> str:
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "negative_prompt": negative_prompt or "",
+        "seed": seed,
+        "profile": profile.to_dict(),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    """Content-addressed PNG files under ``directory`` with size-bounded LRU eviction.
+
+    Files are named by cache key and written atomically. Reads bump the file's mtime,
+    which orders eviction; the index is rebuilt from disk on first use so a restart
+    keeps the cache.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.png"
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        if self._index is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            entries = sorted(
+                (entry.stat().st_mtime, entry.stem, entry.stat().st_size)
+                for entry in self.directory.glob("*.png")
+            )
+            self._index = OrderedDict((key, size) for _, key, size in entries)
+            self._total = sum(self._index.values())
+        return self._index
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        with self._lock:
+            index = self._load_index()
+            if key not in index:
+                return None
+            try:
+                data = path.read_bytes()
+                os.utime(path)
+            except FileNotFoundError:
+                self._total -= index.pop(key)
+                return None
+            index.move_to_end(key)
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        with self._lock:
+            index = self._load_index()
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+            self._total += len(data) - index.pop(key, 0)
+            index[key] = len(data)
+            while self._total > self.max_bytes and index:
+                evicted, size = index.popitem(last=False)
+                self._total -= size
+                self._path(evicted).unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load_index())
+
+
+class _InFlight:
+    def __init__(self, future: Future, cancel_event: Any) -> None:
+        self.future = future
+        self.cancel_event = cancel_event
+        self.members: list[MemberCancel] = []
+
+
+class CachedImageRenderer:
+    """Serves renders from :class:`ImageCache` and shares identical in-flight renders.
+
+    A miss goes to the batcher; concurrent requests with the same cache key attach to
+    that render and get their own future, so a client that gives up only cancels the
+    shared render once every other requester has given up too. Renders submitted with
+    ``cacheable=False`` (requests without an explicit seed) skip both and go straight
+    to the batcher.
+    """
+
+    def __init__(self, batcher: ImageBatcher, cache: Optional[ImageCache], model: str) -> None:
+        self.batcher = batcher
+        self.cache = cache
+        self.model = model
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        return self.batcher.pool
+
+    def lookup(
+        self,
+        prompt: str,
+        profile: GenerationProfile,
+        *,
+        negative_prompt: Optional[str] = None,
+        seed: int,
+    ) -> Optional[bytes]:
+        """Cached PNG for these parameters, or ``None``; does not start a render."""
+        if self.cache is None:
+            return None
+        cached = self.cache.get(cache_key(self.model, prompt, negative_prompt, seed, profile))
+        if cached is not None:
+            IMAGE_CACHE_REQUESTS.labels(result="hit").inc()
+        return cached
+
+    def submit(
+        self,
+        prompt: str,
+        profile: GenerationProfile,
+        progress: Optional[MutableMapping[str, int]] = None,
+        *,
+        negative_prompt: Optional[str] = None,
+        seed: int,
+        cacheable: bool = True,
+        on_done: Optional[Callable[[], None]] = None,
+    ) -> tuple[Future, MemberCancel]:
+        """Start or join the render for these parameters; returns this caller's future and cancel flag.
+
+        ``on_done`` fires once the render itself has finished (immediately for a cache
+        hit), not when this caller's future is cancelled, so it can release resources
+        the render is still using.
+        """
+        if not cacheable:
+            IMAGE_CACHE_REQUESTS.labels(result="uncached").inc()
+            future, cancel_event = self.batcher.submit(
+                prompt, profile, progress, negative_prompt=negative_prompt, seed=seed
+            )
+            _notify_when_done(future, on_done)
+            return future, cancel_event
+
+        key = cache_key(self.model, prompt, negative_prompt, seed, profile)
+        member = MemberCancel()
+        cached = self.lookup(prompt, profile, negative_prompt=negative_prompt, seed=seed)
+        if cached is not None:
+            if progress is not None:
+                progress["step"] = progress["total"] = profile.steps
+            future: Future = Future()
+            future.set_result(cached)
+            _notify_when_done(future, on_done)
+            return future, member
+
+        with self._lock:
+            shared = self._in_flight.get(key)
+            # A render every requester already abandoned is about to be interrupted.
+            if shared is None or shared.cancel_event.is_set():
+                IMAGE_CACHE_REQUESTS.labels(result="miss").inc()
+                render, cancel_event = self.batcher.submit(
+                    prompt,
+                    profile,
+                    progress,
+                    negative_prompt=negative_prompt,
+                    seed=seed,
+                )
+                shared = self._in_flight[key] = _InFlight(render, cancel_event)
+                render.add_done_callback(lambda done: self._finish(key, done))
+            else:
+                IMAGE_CACHE_REQUESTS.labels(result="shared").inc()
+            shared.members.append(member)
+
+        def _cancel_if_abandoned() -> None:
+            if all(other.is_set() for other in shared.members):
+                shared.cancel_event.set()
+                shared.future.cancel()
+
+        member.on_set = _cancel_if_abandoned
+        # On the shared render, once per caller: cancelling this caller's copy does not stop the GPU.
+        _notify_when_done(shared.future, on_done)
+        return self._follow(shared.future), member
+
+    @staticmethod
+    def _follow(shared: Future) -> Future:
+        """Per-caller future mirroring ``shared`` that can be cancelled on its own."""
+        mine: Future = Future()
+
+        def _copy(done: Future) -> None:
+            if not mine.set_running_or_notify_cancel():
+                return
+            if done.cancelled():
+                mine.set_exception(ImageGenerationCancelled("Image generation cancelled"))
+            elif done.exception() is not None:
+                mine.set_exception(done.exception())
+            else:
+                mine.set_result(done.result())
+
+        shared.add_done_callback(_copy)
+        return mine
+
+    def _finish(self, key: str, done: Future) -> None:
+        with self._lock:
+            shared = self._in_flight.get(key)
+            if shared is not None and shared.future is done:
+                del self._in_flight[key]
+        if self.cache is None or done.cancelled() or done.exception() is not None:
+            return
+        try:
+            self.cache.put(key, done.result())
+        except OSError as exc:  # pragma: no cover - disk full or read-only volume
+            LOGGER.warning("Failed to store image in cache: %s", exc)
+
+    async def run(
+        self,
+        prompt: str,
+        profile: GenerationProfile,
+        *,
+        negative_prompt: Optional[str] = None,
+        seed: int,
+        cacheable: bool = True,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        on_done: Optional[Callable[[], None]] = None,
+    ) -> bytes:
+        """Render (or fetch) ``prompt``, cancelling this caller's share if the client disconnects.
+
+        ``on_done`` fires once the render this caller is attached to has finished, or
+        as soon as every caller gave up before it started.
+        """
+        try:
+            future, cancel_event = self.submit(
+                prompt, profile, negative_prompt=negative_prompt, seed=seed, cacheable=cacheable, on_done=on_done
+            )
+        except Exception:
+            if on_done is not None:
+                on_done()
+            raise
+        return await await_render(future, cancel_event, is_disconnected)
+
+
+def _notify_when_done(future: Future, on_done: Optional[Callable[[], None]]) -> None:
+    if on_done is not None:
+        future.add_done_callback(lambda _: on_done())
+
+
+def _build_cache() -> Optional[ImageCache]:
+    if settings.image_cache_max_mb <= 0:
+        return None
+    return ImageCache(Path(settings.image_cache_dir), int(settings.image_cache_max_mb * 1024 * 1024))
+
+
+image_renderer = CachedImageRenderer(image_batcher, _build_cache(), settings.image_model)
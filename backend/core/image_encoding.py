@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from io import BytesIO
+from typing import Optional
+
+MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+_FORMATS_BY_MEDIA_TYPE = {media_type: fmt for fmt, media_type in MEDIA_TYPES.items()}
+_PIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+
+def negotiate_format(accept: Optional[str]) -> Optional[str]:
+    """Pick ``png``/``webp``/``jpeg`` from an ``Accept`` header.
+
+    Returns ``None`` when the client prefers JSON or accepts anything (``*/*`` or no
+    header), which keeps the legacy base64 body for existing clients. ``image/*``
+    means PNG, the lossless format the pipeline produces.
+    """
+    if not accept:
+        return None
+    ranges = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranges.append((-quality, position, media_type.lower()))
+    for _, _, media_type in sorted(ranges):
+        if media_type in _FORMATS_BY_MEDIA_TYPE:
+            return _FORMATS_BY_MEDIA_TYPE[media_type]
+        if media_type == "image/*":
+            return "png"
+        if media_type in {"application/json", "*/*"}:
+            return None
+    return None
+
+
+def encode_image(png_bytes: bytes, fmt: str, quality: int) -> bytes:
+    """Transcode a rendered PNG to ``fmt``; PNG is returned untouched."""
+    if fmt == "png":
+        return png_bytes
+    from PIL import Image
+
+    with Image.open(BytesIO(png_bytes)) as image:
+        buffered = BytesIO()
+        image.convert("RGB").save(buffered, format=_PIL_FORMATS[fmt], quality=quality)
+    return buffered.getvalue()
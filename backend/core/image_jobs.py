@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from backend.config.settings import get_settings
+from backend.core.admission import AdmissionRejected, Priority, image_admission
+from backend.core.image_cache import CachedImageRenderer, image_renderer
+from backend.core.image_profiles import GenerationProfile
+
+LOGGER = logging.getLogger(__name__)
+settings = get_settings()
+
+_PROGRESS_SYNC_SECONDS = 0.5
+_SWEEP_INTERVAL_SECONDS = 60
+_REDIS_PREFIX = "zgpt:image"
+
+
+class ImageJobQueueFull(RuntimeError):
+    pass
+
+
+class LocalImageJobStore:
+    """Process-local job records and FIFO queue."""
+
+    def __init__(self, max_queue: int, ttl_seconds: float) -> None:
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._ttl = timedelta(seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=max_queue)
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def expire(self, now: datetime) -> List[str]:
+        """Drop jobs that finished more than the TTL before ``now``; returns their ids."""
+        cutoff = (now - self._ttl).isoformat()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.get("finished_at") and job["finished_at"] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return expired
+
+    def enqueue(self, job_id: str) -> None:
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full as exc:
+            raise ImageJobQueueFull("Image job queue is full") from exc
+
+    def dequeue(self, timeout: float) -> Optional[str]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class RedisImageJobStore:
+    """JSON job records and a shared list queue in Redis, so any replica can render."""
+
+    def __init__(self, redis_url: str, max_queue: int, ttl_seconds: float) -> None:
+        import redis
+
+        self._redis = redis.Redis.from_url(redis_url, decode_responses=True)
+        self._max_queue = max_queue
+        self._ttl = max(1, int(ttl_seconds))
+
+    def _key(self, job_id: str) -> str:
+        return f"{_REDIS_PREFIX}:job:{job_id}"
+
+    def create(self, job: Dict[str, Any]) -> None:
+        self._redis.set(self._key(job["id"]), json.dumps(job), ex=self._ttl)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = self._redis.get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        job = self.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        self._redis.set(self._key(job_id), json.dumps(job), ex=self._ttl)
+
+    def expire(self, now: datetime) -> List[str]:
+        # Records carry a Redis TTL and expire on their own.
+        return []
+
+    def enqueue(self, job_id: str) -> None:
+        if self._redis.llen(f"{_REDIS_PREFIX}:queue") >= self._max_queue:
+            raise ImageJobQueueFull("Image job queue is full")
+        self._redis.lpush(f"{_REDIS_PREFIX}:queue", job_id)
+
+    def dequeue(self, timeout: float) -> Optional[str]:
+        item = self._redis.brpop(f"{_REDIS_PREFIX}:queue", timeout=max(1, int(timeout)))
+        return item[1] if item else None
+
+
+class ImageJobQueue:
+    """Queued image generation decoupled from the HTTP request.
+
+    Dispatcher threads, started with the app (``start``), pull job ids from the
+    store, take an image admission slot,
+    render through the cached image renderer and write the PNG to ``results_dir``. Progress
+    from the diffusers step callback is copied into the job record while it runs.
+    Finished jobs and result files older than ``ttl_seconds`` are swept by the
+    dispatchers about once a minute.
+    """
+
+    def __init__(
+        self,
+        store,
+        renderer: CachedImageRenderer,
+        results_dir: Path,
+        dispatchers: int,
+        ttl_seconds: float,
+    ) -> None:
+        self.store = store
+        self.renderer = renderer
+        self.results_dir = results_dir
+        self.dispatchers = dispatchers
+        self.ttl_seconds = ttl_seconds
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._next_sweep = 0.0
+
+    def submit(
+        self,
+        user_id: str,
+        prompt: str,
+        profile: GenerationProfile,
+        *,
+        seed: int,
+        negative_prompt: Optional[str] = None,
+        cacheable: bool = True,
+    ) -> Dict[str, Any]:
+        self.start()
+        job = {
+            "id": uuid4().hex,
+            "user_id": user_id,
+            "prompt": prompt,
+            "negative_prompt": negative_prompt,
+            "seed": seed,
+            "cacheable": cacheable,
+            "profile": profile.to_dict(),
+            "status": "queued",
+            "step": 0,
+            "total_steps": 0,
+            "error": None,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "finished_at": None,
+        }
+        self.store.create(job)
+        try:
+            self.store.enqueue(job["id"])
+        except ImageJobQueueFull:
+            self.store.update(job["id"], status="rejected", finished_at=datetime.now(timezone.utc).isoformat())
+            raise
+        return job
+
+    def get(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        if job is None or job.get("user_id") != user_id:
+            return None
+        return job
+
+    def result_path(self, job_id: str) -> Path:
+        return self.results_dir / f"{job_id}.png"
+
+    def start(self) -> None:
+        """Start the dispatcher threads once; with the Redis store every replica consumes the shared queue."""
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self.results_dir.mkdir(parents=True, exist_ok=True)
+            for index in range(self.dispatchers):
+                thread = threading.Thread(target=self._dispatch_loop, name=f"image-jobs-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def sweep(self) -> int:
+        """Forget expired jobs and delete result files older than the TTL; returns files removed."""
+        self.store.expire(datetime.now(timezone.utc))
+        # Judged by file age rather than job records, which may already have expired in Redis.
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for path in self.results_dir.glob("*.png"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue  # another replica sharing the volume got there first
+        return removed
+
+    def _maybe_sweep(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + _SWEEP_INTERVAL_SECONDS
+        try:
+            self.sweep()
+        except Exception as exc:  # pragma: no cover - store outage or unreadable results dir
+            LOGGER.warning("Image job sweep failed: %s", exc)
+
+    def _acquire_slot(self):
+        while not self._stopping.is_set():
+            try:
+                return image_admission.acquire(Priority.BATCH)
+            except AdmissionRejected:
+                self._stopping.wait(1)
+        return None
+
+    def _dispatch_loop(self) -> None:
+        while not self._stopping.is_set():
+            self._maybe_sweep()
+            try:
+                job_id = self.store.dequeue(timeout=1)
+            except Exception as exc:  # pragma: no cover - store outage
+                LOGGER.warning("Image job queue unavailable: %s", exc)
+                self._stopping.wait(1)
+                continue
+            if job_id is None:
+                continue
+            slot = self._acquire_slot()
+            if slot is None:
+                return
+            try:
+                self._process(job_id)
+            finally:
+                slot.release()
+
+    def _process(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        self.store.update(job_id, status="running")
+        progress = self.renderer.pool.new_progress()
+        try:
+            profile = GenerationProfile.from_dict(job["profile"])
+            future, _ = self.renderer.submit(
+                job["prompt"],
+                profile,
+                progress,
+                negative_prompt=job.get("negative_prompt"),
+                seed=job["seed"],
+                cacheable=job.get("cacheable", True),
+            )
+            while True:
+                try:
+                    png_bytes = future.result(timeout=_PROGRESS_SYNC_SECONDS)
+                    break
+                except TimeoutError:
+                    self.store.update(
+                        job_id,
+                        step=progress.get("step", 0),
+                        total_steps=progress.get("total", 0),
+                    )
+            self.result_path(job_id).write_bytes(png_bytes)
+        except Exception as exc:
+            LOGGER.exception("Image job %s failed", job_id)
+            self.store.update(
+                job_id,
+                status="failed",
+                error=str(exc),
+                finished_at=datetime.now(timezone.utc).isoformat(),
+            )
+            return
+        self.store.update(
+            job_id,
+            status="succeeded",
+            step=progress.get("total", 0) or progress.get("step", 0),
+            total_steps=progress.get("total", 0),
+            finished_at=datetime.now(timezone.utc).isoformat(),
+        )
+
+
+def _build_store():
+    if settings.image_job_backend == "redis":
+        if settings.redis_url:
+            return RedisImageJobStore(
+                settings.redis_url, settings.image_job_queue_size, settings.image_job_ttl_seconds
+            )
+        LOGGER.warning("IMAGE_JOB_BACKEND=redis but REDIS_URL is unset; using the local job queue")
+    return LocalImageJobStore(settings.image_job_queue_size, settings.image_job_ttl_seconds)
+
+
+image_jobs = ImageJobQueue(
+    store=_build_store(),
+    renderer=image_renderer,
+    results_dir=Path(settings.image_results_dir),
+    dispatchers=settings.image_max_concurrency * settings.image_batch_size,
+    ttl_seconds=settings.image_job_ttl_seconds,
+)
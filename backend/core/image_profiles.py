@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, Optional
+
+SCHEDULERS = ("default", "dpm", "euler_a", "lcm")
+MIN_SIZE = 256
+MAX_SIZE = 1024
+
+
+class ImageProfileError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    """Diffusion settings for one speed/quality tier.
+
+    ``max_step_megapixels`` is the compute budget: ``steps × width × height`` (in
+    megapixels) that a request may not exceed when overriding steps or size. VAE
+    slicing trades a little speed for lower peak memory; tiling lowers it further but
+    decodes tile by tile, which slightly changes the output pixels.
+    """
+
+    name: str
+    scheduler: str
+    steps: int
+    size: int
+    guidance_scale: float
+    max_step_megapixels: float
+    vae_slicing: bool = False
+    vae_tiling: bool = False
+
+    @property
+    def step_megapixels(self) -> float:
+        return self.steps * self.size * self.size / 1_000_000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "GenerationProfile":
+        return cls(**data)
+
+
+PROFILES: Dict[str, GenerationProfile] = {
+    "draft": GenerationProfile(
+        name="draft",
+        scheduler="dpm",
+        steps=12,
+        size=384,
+        guidance_scale=7.0,
+        max_step_megapixels=3.0,
+        vae_slicing=True,
+    ),
+    "standard": GenerationProfile(
+        name="standard",
+        scheduler="dpm",
+        steps=20,
+        size=512,
+        guidance_scale=7.5,
+        max_step_megapixels=6.0,
+        vae_slicing=True,
+    ),
+    # The pipeline's own scheduler and step count, as renders ran before profiles, plus
+    # VAE tiling (which the old path never enabled) to cap the decoder's peak memory.
+    "quality": GenerationProfile(
+        name="quality",
+        scheduler="default",
+        steps=50,
+        size=512,
+        guidance_scale=8.5,
+        max_step_megapixels=16.0,
+        vae_tiling=True,
+    ),
+}
+
+
+def resolve_profile(
+    name: Optional[str],
+    default: str,
+    *,
+    steps: Optional[int] = None,
+    size: Optional[int] = None,
+) -> GenerationProfile:
+    """Look up ``name`` (or ``default``) and apply request overrides within its budget."""
+    profile = PROFILES.get((name or default).lower())
+    if profile is None:
+        raise ImageProfileError(f"Unknown image profile; choose one of {', '.join(PROFILES)}")
+    overrides: Dict[str, Any] = {}
+    if steps is not None:
+        if steps <= 0:
+            raise ImageProfileError("steps must be greater than zero")
+        overrides["steps"] = steps
+    if size is not None:
+        if not MIN_SIZE <= size <= MAX_SIZE or size % 64:
+            raise ImageProfileError(f"size must be a multiple of 64 between {MIN_SIZE} and {MAX_SIZE}")
+        overrides["size"] = size
+    resolved = replace(profile, **overrides) if overrides else profile
+    if resolved.step_megapixels > profile.max_step_megapixels:
+        raise ImageProfileError(
+            f"steps × size exceeds the {profile.name} profile budget "
+            f"({resolved.step_megapixels:.1f} > {profile.max_step_megapixels:.1f} step-megapixels)"
+        )
+    return resolved
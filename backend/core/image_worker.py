@@ -0,0 +1,491 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Any, Awaitable, Callable, Hashable, MutableMapping, Optional, Sequence
+
+from prometheus_client import Histogram
+
+from backend.config.settings import get_settings
+from backend.core import inference
+from backend.core.image_profiles import GenerationProfile
+from backend.core.model_metrics import MODEL_LOAD_SECONDS
+from backend.core.observability import get_or_create_metric
+
+LOGGER = logging.getLogger(__name__)
+settings = get_settings()
+_pipe = None
+_variant_pipes: dict[tuple[str, bool, bool], Any] = {}
+_pipe_lock = threading.Lock()
+_device = (settings.image_device or "cpu").lower()
+
+_DISCONNECT_POLL_SECONDS = 0.5
+
+IMAGE_BATCH_SIZE = get_or_create_metric(
+    Histogram,
+    "zgpt_image_batch_size",
+    "Prompts rendered together in one diffusion pipeline call",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16),
+)
+IMAGE_BATCH_WAIT = get_or_create_metric(
+    Histogram,
+    "zgpt_image_batch_wait_seconds",
+    "Time a prompt waited in the batch collector before its batch was dispatched",
+)
+
+
+class ImageGenerationCancelled(RuntimeError):
+    """Raised when a render is abandoned because the client went away."""
+
+
+_SCHEDULER_CLASSES = {
+    "dpm": "DPMSolverMultistepScheduler",
+    "euler_a": "EulerAncestralDiscreteScheduler",
+    "lcm": "LCMScheduler",
+}
+
+
+def _get_profile_pipe(profile: GenerationProfile):
+    """Pipeline sharing the loaded weights, set up for ``profile``'s scheduler and VAE options.
+
+    Schedulers keep per-run state, and VAE tiling changes the decoded pixels, so each
+    combination gets its own lightweight pipeline object built once from the base
+    pipeline's components. Nothing on a shared module is toggled per call, which would
+    let concurrent workers decode with each other's settings.
+    """
+    pipe = _get_pipe()
+    key = (profile.scheduler, profile.vae_slicing, profile.vae_tiling)
+    if key == ("default", False, False):
+        return pipe
+    variant = _variant_pipes.get(key)
+    if variant is not None:
+        return variant
+    with _pipe_lock:
+        variant = _variant_pipes.get(key)
+        if variant is None:
+            if profile.scheduler == "default":
+                scheduler_cls = pipe.scheduler.__class__
+            else:
+                import diffusers
+
+                scheduler_cls = getattr(diffusers, _SCHEDULER_CLASSES[profile.scheduler])
+            # A shallow copy has its own slicing/tiling flags but shares the submodules and weights.
+            vae = copy.copy(pipe.vae)
+            if profile.vae_slicing:
+                vae.enable_slicing()
+            if profile.vae_tiling:
+                vae.enable_tiling()
+            components = dict(pipe.components, scheduler=scheduler_cls.from_config(pipe.scheduler.config), vae=vae)
+            variant = pipe.__class__(**components)
+            variant.set_progress_bar_config(disable=True)
+            _variant_pipes[key] = variant
+    return variant
+
+
+def _get_pipe():
+    global _pipe
+    if _pipe is not None:
+        return _pipe
+    if not settings.image_generation_enabled:
+        raise RuntimeError("Image generation is disabled by configuration")
+    with _pipe_lock:
+        if _pipe is not None:
+            return _pipe
+        from diffusers import StableDiffusionPipeline
+        import torch
+        model_id = settings.image_model or "runwayml/stable-diffusion-v1-5"
+        started = time.perf_counter()
+        try:
+            torch_dtype = torch.float16 if _device.startswith("cuda") else torch.float32
+            # None prefers memory-mapped safetensors (shared between workers) and falls back to .bin.
+            pipe = StableDiffusionPipeline.from_pretrained(
+                model_id,
+                torch_dtype=torch_dtype,
+                use_safetensors=None if settings.model_mmap_weights else False,
+            ).to(_device)
+            pipe.enable_attention_slicing()
+        except Exception as e:
+            raise RuntimeError(f"Failed to load image pipeline: {e}")
+        MODEL_LOAD_SECONDS.labels(model="image").observe(time.perf_counter() - started)
+        _pipe = pipe
+    return _pipe
+
+
+def render_png_batch(
+    prompts: Sequence[str],
+    profile: GenerationProfile,
+    progress: Optional[Sequence[Optional[MutableMapping[str, int]]]] = None,
+    negative_prompts: Optional[Sequence[Optional[str]]] = None,
+    seeds: Optional[Sequence[Optional[int]]] = None,
+    *,
+    cancel_event: Any = None,
+) -> list[bytes]:
+    """Render ``prompts`` in one pipeline call and PNG-encode each image inside a worker.
+
+    ``profile`` selects the scheduler, step count, resolution and VAE memory options.
+    ``cancel_event`` is checked after every denoising step; once set, the pipeline's
+    interrupt flag skips the remaining steps and the render is abandoned. Each entry of
+    ``progress`` (a plain or manager-backed dict, or ``None``) receives ``step``/``total``
+    as denoising advances; batched prompts share the same schedule. ``seeds`` give each
+    prompt its own generator, so an image does not depend on what it was batched with.
+    """
+    pipe = _get_profile_pipe(profile)
+    trackers = [tracker for tracker in (progress or ()) if tracker is not None]
+
+    def _on_step_end(pipeline, step, timestep, callback_kwargs):
+        total = getattr(pipeline, "num_timesteps", 0) or 0
+        for tracker in trackers:
+            tracker["step"] = step + 1
+            tracker["total"] = total
+        if cancel_event is not None and cancel_event.is_set():
+            pipeline._interrupt = True
+        return callback_kwargs
+
+    generator = None
+    if seeds is not None and any(seed is not None for seed in seeds):
+        import torch
+
+        generator = [
+            torch.Generator(device="cpu").manual_seed(seed) if seed is not None else torch.Generator(device="cpu")
+            for seed in seeds
+        ]
+    negative = None
+    if negative_prompts is not None and any(negative_prompts):
+        negative = [text or "" for text in negative_prompts]
+
+    result = pipe(
+        list(prompts),
+        negative_prompt=negative,
+        generator=generator,
+        num_inference_steps=profile.steps,
+        height=profile.size,
+        width=profile.size,
+        guidance_scale=profile.guidance_scale,
+        callback_on_step_end=_on_step_end,
+    )
+    if cancel_event is not None and cancel_event.is_set():
+        raise ImageGenerationCancelled("Image generation cancelled")
+
+    encoded = []
+    for image in result.images:
+        buffered = BytesIO()
+        image.save(buffered, format="PNG")
+        encoded.append(buffered.getvalue())
+    return encoded
+
+
+def render_png(
+    prompt: str,
+    profile: GenerationProfile,
+    progress: Optional[MutableMapping[str, int]] = None,
+    negative_prompt: Optional[str] = None,
+    seed: Optional[int] = None,
+    *,
+    cancel_event: Any = None,
+) -> bytes:
+    """Single-prompt :func:`render_png_batch`."""
+    return render_png_batch([prompt], profile, [progress], [negative_prompt], [seed], cancel_event=cancel_event)[0]
+
+
+async def await_render(
+    future: Future,
+    cancel_event: Any,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+) -> Any:
+    """Await a render future, setting ``cancel_event`` if the client disconnects."""
+    wrapped = asyncio.wrap_future(future)
+    try:
+        while True:
+            done, _ = await asyncio.wait({wrapped}, timeout=_DISCONNECT_POLL_SECONDS)
+            if done:
+                return wrapped.result()
+            if is_disconnected is not None and await is_disconnected():
+                raise ImageGenerationCancelled("Client disconnected")
+    except BaseException:
+        if not future.done():
+            cancel_event.set()
+            future.cancel()
+        # Nobody awaits the abandoned job; retrieve its outcome so asyncio does not log it.
+        wrapped.add_done_callback(lambda f: f.cancelled() or f.exception())
+        raise
+
+
+class ImageWorkerPool:
+    """Dedicated executor for diffusion work so the event loop never runs the pipeline.
+
+    ``thread`` mode shares one pipeline across worker threads (torch releases the GIL
+    during inference). ``process`` mode loads the pipeline in each spawned worker,
+    isolating its memory from the API process; cancellation events then go through
+    a multiprocessing manager.
+    """
+
+    def __init__(self, mode: str, workers: int) -> None:
+        self.mode = mode
+        self.workers = workers
+        self._executor: Optional[Executor] = None
+        self._manager = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.mode == "process":
+                        context = multiprocessing.get_context("spawn")
+                        self._manager = context.Manager()
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers,
+                            thread_name_prefix="image-worker",
+                        )
+        return self._executor
+
+    def _new_cancel_event(self):
+        self._get_executor()
+        if self._manager is not None:
+            return self._manager.Event()
+        return threading.Event()
+
+    def new_progress(self) -> MutableMapping[str, int]:
+        """Progress mapping a worker can update, shared across processes when needed."""
+        self._get_executor()
+        if self._manager is not None:
+            return self._manager.dict()
+        return {}
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> tuple[Future, Any]:
+        """Schedule ``fn(*args, cancel_event=...)`` and return its future and cancel event."""
+        cancel_event = self._new_cancel_event()
+        return self._get_executor().submit(fn, *args, cancel_event=cancel_event), cancel_event
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        on_done: Optional[Callable[[], None]] = None,
+    ) -> Any:
+        """Run ``fn`` on the pool, cancelling it if the client disconnects.
+
+        ``on_done`` fires when the worker actually finishes, which may be after this
+        coroutine has given up on a cancelled job.
+        """
+        try:
+            future, cancel_event = self.submit(fn, *args)
+        except Exception:
+            if on_done is not None:
+                on_done()
+            raise
+        if on_done is not None:
+            future.add_done_callback(lambda _: on_done())
+        return await await_render(future, cancel_event, is_disconnected)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+
+
+class MemberCancel:
+    """Cancel flag for one of several callers sharing a render.
+
+    ``on_set`` lets the owner of the shared work interrupt it once every member has
+    cancelled, so one disconnecting client never aborts another client's image.
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self.on_set: Optional[Callable[[], None]] = None
+
+    def set(self) -> None:
+        self._event.set()
+        if self.on_set is not None:
+            self.on_set()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+
+@dataclass
+class _BatchItem:
+    key: Hashable
+    prompt: str
+    profile: GenerationProfile
+    progress: Optional[MutableMapping[str, int]]
+    negative_prompt: Optional[str] = None
+    seed: Optional[int] = None
+    future: Future = field(default_factory=Future)
+    cancel_event: MemberCancel = field(default_factory=MemberCancel)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class ImageBatcher:
+    """Micro-batches concurrent prompts into single diffusion pipeline calls.
+
+    A collector thread waits for a pool worker to free up, takes the oldest prompt and
+    gathers further prompts with identical generation parameters for up to ``window``
+    seconds or ``max_batch`` prompts, then renders them with one
+    :func:`render_png_batch` call and fans the images back out to each caller's future.
+    Prompts whose parameters differ are held over for the next batch. With
+    ``max_batch=1`` every prompt is rendered on its own.
+    """
+
+    def __init__(self, pool: ImageWorkerPool, max_batch: int, window: float) -> None:
+        self.pool = pool
+        self.max_batch = max_batch
+        self.window = window
+        self._queue: "queue.Queue[Optional[_BatchItem]]" = queue.Queue()
+        self._held: deque[_BatchItem] = deque()
+        self._free_workers = threading.Semaphore(pool.workers)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def submit(
+        self,
+        prompt: str,
+        profile: GenerationProfile,
+        progress: Optional[MutableMapping[str, int]] = None,
+        *,
+        negative_prompt: Optional[str] = None,
+        seed: Optional[int] = None,
+    ) -> tuple[Future, MemberCancel]:
+        """Queue ``prompt`` for the next compatible batch; returns its future and cancel flag."""
+        self._ensure_collector()
+        item = _BatchItem(
+            key=profile,
+            prompt=prompt,
+            profile=profile,
+            progress=progress,
+            negative_prompt=negative_prompt,
+            seed=seed,
+        )
+        self._queue.put(item)
+        return item.future, item.cancel_event
+
+    def _ensure_collector(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._collect_loop, name="image-batcher", daemon=True)
+                self._thread.start()
+
+    def _next_item(self, timeout: Optional[float]) -> Optional[_BatchItem]:
+        if self._held:
+            return self._held.popleft()
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _gather(self, first: _BatchItem) -> list[_BatchItem]:
+        batch = [first]
+        for item in list(self._held):
+            if len(batch) >= self.max_batch:
+                break
+            if item.key == first.key:
+                self._held.remove(item)
+                batch.append(item)
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch and not self._stopping.is_set():
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            if item.key == first.key:
+                batch.append(item)
+            else:
+                self._held.append(item)
+        return batch
+
+    def _collect_loop(self) -> None:
+        while not self._stopping.is_set():
+            self._free_workers.acquire()
+            first = None
+            while first is None and not self._stopping.is_set():
+                first = self._next_item(timeout=1)
+            if first is None:
+                self._free_workers.release()
+                return
+            # Callers that gave up before their batch started are dropped here.
+            batch = [item for item in self._gather(first) if item.future.set_running_or_notify_cancel()]
+            if not batch:
+                self._free_workers.release()
+                continue
+            try:
+                self._dispatch(batch)
+            except Exception as exc:  # pragma: no cover - executor shut down underneath us
+                LOGGER.warning("Failed to dispatch image batch: %s", exc)
+                self._free_workers.release()
+                for item in batch:
+                    item.future.set_exception(exc)
+
+    def _dispatch(self, batch: list[_BatchItem]) -> None:
+        now = time.perf_counter()
+        IMAGE_BATCH_SIZE.observe(len(batch))
+        for item in batch:
+            IMAGE_BATCH_WAIT.observe(now - item.enqueued_at)
+        future, cancel_event = self.pool.submit(
+            inference.render_png_batch,
+            [item.prompt for item in batch],
+            batch[0].profile,
+            [item.progress for item in batch],
+            [item.negative_prompt for item in batch],
+            [item.seed for item in batch],
+        )
+
+        def _cancel_if_abandoned() -> None:
+            if all(item.cancel_event.is_set() for item in batch):
+                cancel_event.set()
+
+        for item in batch:
+            item.cancel_event.on_set = _cancel_if_abandoned
+        _cancel_if_abandoned()
+        future.add_done_callback(lambda done: self._fan_out(done, batch))
+
+    def _fan_out(self, done: Future, batch: list[_BatchItem]) -> None:
+        self._free_workers.release()
+        try:
+            images = done.result()
+        except BaseException as exc:
+            for item in batch:
+                item.future.set_exception(exc)
+            return
+        for item, image in zip(batch, images):
+            item.future.set_result(image)
+
+    def shutdown(self) -> None:
+        self._stopping.set()
+        self._queue.put(None)
+        with self._lock:
+            self._thread = None
+
+
+# With a separate inference server the workers only wait on its socket, so threads suffice.
+image_pool = ImageWorkerPool(
+    "thread" if settings.inference_socket else settings.image_worker_mode,
+    settings.image_max_concurrency,
+)
+image_batcher = ImageBatcher(
+    image_pool,
+    max_batch=settings.image_batch_size,
+    window=settings.image_batch_window_ms / 1000,
+)
@@ -0,0 +1,329 @@
+"""Model calls used by the API, served in-process or by a separate inference server.
+
+With ``INFERENCE_SOCKET`` unset (the default) every function here calls straight into
+:mod:`backend.core.llm_handler`, :mod:`backend.utils.language_tools` and
+:mod:`backend.core.image_worker`. When it names a Unix socket, the same calls go to
+``python -m backend.inference_server`` listening there, so HTTP workers can be
+scaled and restarted without loading any weights.
+
+Wire format: each frame is two big-endian ``uint32`` lengths followed by a JSON
+message and an optional binary payload (rendered PNGs). A request is
+``{"method", "args", "trace"}``, where ``trace`` carries the caller's W3C trace
+context; the server acknowledges it with ``{"accepted": true}``, may send
+``{"chunk"}`` or ``{"progress"}`` frames, and ends with ``{"result"}`` or
+``{"error"}``. A client abandoning a render or a chat generation sends
+``{"cancel": true}``; chat calls then end early with the text generated so far.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Any, Generator, Iterable, Iterator, MutableMapping, Optional, Sequence
+
+from opentelemetry import propagate
+
+from backend.config.settings import get_settings
+from backend.core import llm_handler
+from backend.core.image_profiles import GenerationProfile
+from backend.utils import language_tools
+
+LOGGER = logging.getLogger(__name__)
+settings = get_settings()
+
+_HEADER = struct.Struct("!II")
+_CANCEL_POLL_SECONDS = 0.2
+
+
+class InferenceError(RuntimeError):
+    """The inference server could not be reached or failed the call."""
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if received == 0:
+                return None
+            raise ConnectionError("connection closed mid-frame")
+        received += count
+    return bytes(buffer)
+
+
+def send_frame(sock: socket.socket, message: dict, payload: bytes = b"") -> None:
+    body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(body), len(payload)) + body + payload)
+
+
+def recv_frame(sock: socket.socket) -> Optional[tuple[dict, bytes]]:
+    """Next ``(message, payload)`` from ``sock``, or ``None`` if the peer closed cleanly."""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    body_size, payload_size = _HEADER.unpack(header)
+    body = _recv_exact(sock, body_size)
+    payload = _recv_exact(sock, payload_size) if payload_size else b""
+    if body is None or payload is None:
+        raise ConnectionError("connection closed mid-frame")
+    return json.loads(body), payload
+
+
+def _plain_history(history: Optional[Iterable[Any]]) -> Optional[list[dict]]:
+    if history is None:
+        return None
+    return [
+        {
+            "role": turn.get("role") if isinstance(turn, dict) else getattr(turn, "role", ""),
+            "content": turn.get("content") if isinstance(turn, dict) else getattr(turn, "content", ""),
+        }
+        for turn in history
+    ]
+
+
+class InferenceClient:
+    """Blocking client for the inference server that keeps idle connections for reuse.
+
+    Each call holds one connection for its duration, so concurrent callers use
+    separate connections. A pooled connection the server has since closed (for
+    example after a restart) is retried once on a fresh one.
+    """
+
+    def __init__(self, path: str, timeout: float) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._idle: list[socket.socket] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as exc:
+            sock.close()
+            raise InferenceError(f"Inference server unavailable at {self.path}: {exc}") from exc
+        return sock
+
+    def _request(self, method: str, args: dict) -> socket.socket:
+        """Send a request and wait for its acknowledgement."""
+        for _ in range(2):
+            with self._lock:
+                sock = self._idle.pop() if self._idle else None
+            reused = sock is not None
+            if sock is None:
+                sock = self._connect()
+            try:
+                carrier: dict = {}
+                propagate.inject(carrier)
+                send_frame(sock, {"method": method, "args": args, "trace": carrier})
+                frame = recv_frame(sock)
+            except socket.timeout as exc:
+                sock.close()
+                raise InferenceError(f"Inference call {method} timed out") from exc
+            except OSError as exc:
+                frame, error = None, exc
+            else:
+                error = ConnectionError("connection closed by the inference server")
+            if frame is not None:
+                message, _ = frame
+                if "error" in message:
+                    self._release(sock)
+                    raise InferenceError(message["error"])
+                return sock
+            sock.close()
+            if not reused:
+                break
+        raise InferenceError(f"Inference call {method} failed: {error}")
+
+    def _release(self, sock: socket.socket) -> None:
+        with self._lock:
+            self._idle.append(sock)
+
+    def _stream(self, method: str, args: dict, cancel_event: Any = None) -> Iterator[tuple[dict, bytes]]:
+        """Yield response frames up to and including the final ``result`` frame.
+
+        Once ``cancel_event`` is set a ``cancel`` frame is sent and the remaining
+        frames (a partial result for chat calls) are still read to the end.
+        """
+        sock = self._request(method, args)
+        reusable = False
+        cancelled = False
+        try:
+            while True:
+                if cancel_event is not None and not cancelled:
+                    deadline = time.monotonic() + self.timeout
+                    # Poll between frames so an abandoned render can be interrupted remotely.
+                    while not select.select([sock], [], [], _CANCEL_POLL_SECONDS)[0]:
+                        if cancel_event.is_set():
+                            send_frame(sock, {"cancel": True})
+                            cancelled = True
+                            break
+                        if time.monotonic() > deadline:
+                            raise socket.timeout("timed out")
+                frame = recv_frame(sock)
+                if frame is None:
+                    raise ConnectionError("connection closed by the inference server")
+                message, payload = frame
+                if "error" in message:
+                    # A cancel frame may still be unread on the server side.
+                    reusable = not cancelled
+                    if message.get("kind") == "cancelled":
+                        from backend.core.image_worker import ImageGenerationCancelled
+
+                        raise ImageGenerationCancelled(message["error"])
+                    raise InferenceError(message["error"])
+                if "result" in message:
+                    reusable = not cancelled
+                    yield message, payload
+                    return
+                yield message, payload
+        except OSError as exc:
+            raise InferenceError(f"Inference call {method} failed: {exc}") from exc
+        finally:
+            if reusable:
+                self._release(sock)
+            else:
+                sock.close()
+
+    def call(self, method: str, *, cancel_event: Any = None, **args: Any) -> Any:
+        for message, _ in self._stream(method, args, cancel_event):
+            if "result" in message:
+                return message["result"]
+        raise InferenceError(f"Inference call {method} returned no result")  # pragma: no cover
+
+    def stream(self, method: str, *, cancel_event: Any = None, **args: Any) -> Generator[str, None, None]:
+        for message, _ in self._stream(method, args, cancel_event):
+            if "chunk" in message:
+                yield message["chunk"]
+
+    def render_png_batch(
+        self,
+        prompts: Sequence[str],
+        profile: GenerationProfile,
+        progress: Optional[Sequence[Optional[MutableMapping[str, int]]]] = None,
+        negative_prompts: Optional[Sequence[Optional[str]]] = None,
+        seeds: Optional[Sequence[Optional[int]]] = None,
+        *,
+        cancel_event: Any = None,
+    ) -> list[bytes]:
+        trackers = [tracker for tracker in (progress or ()) if tracker is not None]
+        args = {
+            "prompts": list(prompts),
+            "profile": profile.to_dict(),
+            "negative_prompts": list(negative_prompts) if negative_prompts is not None else None,
+            "seeds": list(seeds) if seeds is not None else None,
+            "progress": bool(trackers),
+        }
+        for message, payload in self._stream("render_png_batch", args, cancel_event):
+            if "progress" in message:
+                for tracker in trackers:
+                    tracker.update(message["progress"])
+            elif "result" in message:
+                images, offset = [], 0
+                for size in message["result"]:
+                    images.append(payload[offset:offset + size])
+                    offset += size
+                return images
+        raise InferenceError("Inference call render_png_batch returned no result")  # pragma: no cover
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+
+_client: Optional[InferenceClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> Optional[InferenceClient]:
+    """Client for ``INFERENCE_SOCKET``, or ``None`` when models run in this process."""
+    global _client
+    if not settings.inference_socket:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = InferenceClient(settings.inference_socket, settings.inference_timeout_seconds)
+    return _client
+
+
+def detect_language(text: str) -> str:
+    client = get_client()
+    if client is None:
+        return language_tools.detect_language(text)
+    return client.call("detect_language", text=text)
+
+
+def translate_text(text: str, from_lang: str, to_lang: str) -> str:
+    client = get_client()
+    if client is None:
+        return language_tools.translate_text(text, from_lang=from_lang, to_lang=to_lang)
+    return client.call("translate_text", text=text, from_lang=from_lang, to_lang=to_lang)
+
+
+def generate_reply(
+    prompt: str,
+    history=None,
+    max_new_tokens: int = 300,
+    temperature: float = 0.7,
+    cancel_event: Any = None,
+) -> str:
+    client = get_client()
+    if client is None:
+        return llm_handler.generate_reply(prompt, history, max_new_tokens, temperature, cancel_event=cancel_event)
+    return client.call(
+        "generate_reply",
+        cancel_event=cancel_event,
+        prompt=prompt,
+        history=_plain_history(history),
+        max_new_tokens=max_new_tokens,
+        temperature=temperature,
+    )
+
+
+def stream_reply(
+    prompt: str,
+    history=None,
+    max_new_tokens: int = 300,
+    temperature: float = 0.7,
+    cancel_event: Any = None,
+) -> Generator[str, None, None]:
+    client = get_client()
+    if client is None:
+        return llm_handler.stream_reply(prompt, history, max_new_tokens, temperature, cancel_event=cancel_event)
+    return client.stream(
+        "stream_reply",
+        cancel_event=cancel_event,
+        prompt=prompt,
+        history=_plain_history(history),
+        max_new_tokens=max_new_tokens,
+        temperature=temperature,
+    )
+
+
+def render_png_batch(
+    prompts: Sequence[str],
+    profile: GenerationProfile,
+    progress: Optional[Sequence[Optional[MutableMapping[str, int]]]] = None,
+    negative_prompts: Optional[Sequence[Optional[str]]] = None,
+    seeds: Optional[Sequence[Optional[int]]] = None,
+    *,
+    cancel_event: Any = None,
+) -> list[bytes]:
+    client = get_client()
+    if client is None:
+        from backend.core import image_worker
+
+        return image_worker.render_png_batch(
+            prompts, profile, progress, negative_prompts, seeds, cancel_event=cancel_event
+        )
+    return client.render_png_batch(prompts, profile, progress, negative_prompts, seeds, cancel_event=cancel_event)
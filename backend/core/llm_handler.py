@@ -1,8 +1,15 @@
-from typing import Generator, Iterable, Optional
-from threading import Thread
+import time
+from typing import Any, Generator, Iterable, Optional
+from threading import Event, Thread
+
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+
 from backend.config.settings import get_settings
+from backend.core.model_metrics import GENERATIONS_CANCELLED, GENERATIONS_IN_FLIGHT, MODEL_LOAD_SECONDS, TokenClock
 
 settings = get_settings()
+tracer = trace.get_tracer(__name__)
 
 # Lazy-loaded singletons
 tokenizer = None
@@ -21,6 +28,29 @@ def _resolve_dtype(torch_module):
     return torch_module.float16
 
 
+def _weight_loading_kwargs() -> dict:
+    """Prefer memory-mapped safetensors so worker processes share weight pages.
+
+    Tensors whose stored dtype matches ``torch_dtype`` stay backed by the page cache
+    instead of private heap copies, so they are shared by every process on the host
+    that maps the same file (and by forked workers of a preloading launcher).
+    """
+    if not settings.model_mmap_weights:
+        return {}
+    return {"use_safetensors": True, "low_cpu_mem_usage": True}
+
+
+def _from_pretrained(loader, model_name: str, **kwargs):
+    extra = _weight_loading_kwargs()
+    try:
+        return loader.from_pretrained(model_name, **kwargs, **extra)
+    except OSError:
+        if not extra:
+            raise
+        # Checkpoint ships only .bin weights; fall back to the regular loader.
+        return loader.from_pretrained(model_name, **kwargs)
+
+
 def _load_model():
     global tokenizer, model, TextStreamer
     if tokenizer is not None and model is not None and TextStreamer is not None:
@@ -33,25 +63,29 @@ def _load_model():
     if not model_name:
         raise RuntimeError("CHAT_MODEL must be configured before using the chat endpoint.")
 
+    started = time.perf_counter()
     tokenizer = AutoTokenizer.from_pretrained(model_name)
 
     device_target = (settings.chat_device or "auto").lower()
     torch_dtype = _resolve_dtype(torch)
 
     if device_target == "cpu":
-        model_instance = AutoModelForCausalLM.from_pretrained(
+        model_instance = _from_pretrained(
+            AutoModelForCausalLM,
             model_name,
             torch_dtype=torch_dtype,
         )
         model_instance.to("cpu")
     elif device_target == "auto":
-        model_instance = AutoModelForCausalLM.from_pretrained(
+        model_instance = _from_pretrained(
+            AutoModelForCausalLM,
             model_name,
             device_map="auto",
             torch_dtype=torch_dtype,
         )
     else:
-        model_instance = AutoModelForCausalLM.from_pretrained(
+        model_instance = _from_pretrained(
+            AutoModelForCausalLM,
             model_name,
             torch_dtype=torch_dtype,
         )
@@ -60,6 +94,7 @@ def _load_model():
     model_instance.eval()
     model = model_instance
     TextStreamer = TextIteratorStreamer
+    MODEL_LOAD_SECONDS.labels(model="chat").observe(time.perf_counter() - started)
 
 
 def _format_prompt(prompt: str, history: Optional[Iterable[dict]] = None) -> str:
@@ -77,35 +112,124 @@ def _format_prompt(prompt: str, history: Optional[Iterable[dict]] = None) -> str
     return formatted
 
 
-def generate_reply(prompt: str, history=None, max_new_tokens: int = 300, temperature: float = 0.7) -> str:
+def _tokenize(input_text: str):
+    with tracer.start_as_current_span("llm.tokenize") as span:
+        inputs = tokenizer([input_text], return_tensors="pt").to(model.device)
+        span.set_attribute("llm.prompt_tokens", inputs["input_ids"].shape[-1])
+    return inputs
+
+
+class _StopWhenSet:
+    """``generate(stopping_criteria=...)`` entry ending decode once any of ``events`` is set.
+
+    Checked after every decode step, so a cancelled generation stops within one token;
+    ``triggered`` records whether it actually cut the generation short.
+    """
+
+    def __init__(self, *events: Any) -> None:
+        self.events = [event for event in events if event is not None]
+        self.triggered = False
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        if any(event.is_set() for event in self.events):
+            self.triggered = True
+        return self.triggered
+
+
+def generate_reply(
+    prompt: str,
+    history=None,
+    max_new_tokens: int = 300,
+    temperature: float = 0.7,
+    cancel_event: Any = None,
+) -> str:
+    """Generate a full reply; once ``cancel_event`` is set, returns the text generated so far."""
     _load_model()
     input_text = _format_prompt(prompt, history)
+    in_flight = GENERATIONS_IN_FLIGHT.labels(kind="chat")
+    in_flight.inc()
+    with tracer.start_as_current_span("llm.generate", attributes={"llm.mode": "blocking"}) as span:
+        try:
+            import torch
+
+            inputs = _tokenize(input_text)
+            clock = TokenClock("blocking", inputs["input_ids"].shape[-1])
+            stop = _StopWhenSet(cancel_event)
+            try:
+                with torch.no_grad():
+                    output_ids = model.generate(
+                        **inputs,
+                        do_sample=True,
+                        temperature=temperature,
+                        max_new_tokens=max_new_tokens,
+                        eos_token_id=tokenizer.eos_token_id,
+                        streamer=clock,
+                        stopping_criteria=[stop],
+                    )
+            except Exception as exc:
+                clock.finish(exc)
+                raise
+            clock.finish()
+            span.set_attribute("llm.completion_tokens", clock.tokens)
+            if stop.triggered:
+                GENERATIONS_CANCELLED.labels(mode="blocking").inc()
+                span.set_attribute("llm.cancelled", True)
+            text = tokenizer.batch_decode(output_ids, skip_special_tokens=True)[0]
+            return text.split("Assistant:")[-1].strip()
+        except Exception as e:
+            raise RuntimeError(f"LLM inference failed: {e}")
+        finally:
+            in_flight.dec()
+
+
+def _end_stream(clock: TokenClock, streamer: Any) -> None:
     try:
-        import torch
+        clock.end()
+    except Exception:
+        # Flushing the decode cache can fail the way generation did; still queue the stop signal.
+        streamer.on_finalized_text("", stream_end=True)
 
-        inputs = tokenizer([input_text], return_tensors="pt").to(model.device)
-        with torch.no_grad():
-            output_ids = model.generate(
-                **inputs,
-                do_sample=True,
-                temperature=temperature,
-                max_new_tokens=max_new_tokens,
-                eos_token_id=tokenizer.eos_token_id,
-            )
-        text = tokenizer.batch_decode(output_ids, skip_special_tokens=True)[0]
-        return text.split("Assistant:")[-1].strip()
-    except Exception as e:
-        raise RuntimeError(f"LLM inference failed: {e}")
 
+def stream_reply(
+    prompt: str,
+    history=None,
+    max_new_tokens: int = 300,
+    temperature: float = 0.7,
+    cancel_event: Any = None,
+) -> Generator[str, None, None]:
+    """Yield reply text as it is decoded.
 
-def stream_reply(prompt: str, history=None, max_new_tokens: int = 300, temperature: float = 0.7) -> Generator[str, None, None]:
+    Generation stops early once ``cancel_event`` is set or the caller closes the
+    generator, so an abandoned stream does not run on to ``max_new_tokens``.
+    """
     _load_model()
     input_text = _format_prompt(prompt, history)
-    streamer = TextStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    in_flight = GENERATIONS_IN_FLIGHT.labels(kind="chat")
+    in_flight.inc()
+    # The span outlives this call, so it is ended by the generation thread rather than a with block.
+    span = tracer.start_span("llm.generate", attributes={"llm.mode": "stream"})
+    trace_context = trace.set_span_in_context(span)
+    try:
+        streamer = TextStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
 
-    inputs = tokenizer([input_text], return_tensors="pt").to(model.device)
+        token = otel_context.attach(trace_context)
+        try:
+            inputs = _tokenize(input_text)
+        finally:
+            otel_context.detach(token)
+        clock = TokenClock("stream", inputs["input_ids"].shape[-1], inner=streamer, trace_context=trace_context)
+        closed = Event()
+        stop = _StopWhenSet(cancel_event, closed)
+    except BaseException:
+        in_flight.dec()
+        span.end()
+        raise
+
+    failure: list[Exception] = []
 
     def _generate():
+        token = otel_context.attach(trace_context)
+        completed = False
         try:
             model.generate(
                 **inputs,
@@ -113,16 +237,37 @@ def stream_reply(prompt: str, history=None, max_new_tokens: int = 300, temperatu
                 temperature=temperature,
                 max_new_tokens=max_new_tokens,
                 eos_token_id=tokenizer.eos_token_id,
-                streamer=streamer,
+                streamer=clock,
+                stopping_criteria=[stop],
             )
-        except Exception:
-            streamer.put(None)
+            completed = True
+            clock.finish()
+        except Exception as exc:
+            failure.append(exc)
+            clock.finish(exc)
+        finally:
+            if not completed:
+                # generate() only ends the streamer when it returns; without the stop
+                # signal the consumer below would wait on the streamer forever.
+                _end_stream(clock, streamer)
+            in_flight.dec()
+            if stop.triggered:
+                GENERATIONS_CANCELLED.labels(mode="stream").inc()
+                span.set_attribute("llm.cancelled", True)
+            span.set_attribute("llm.completion_tokens", clock.tokens)
+            span.end()
+            otel_context.detach(token)
 
-    thread = Thread(target=_generate)
+    thread = Thread(target=_generate, name="llm-generate")
     thread.start()
 
-    for text in streamer:
-        # Filter out the prefix upto "Assistant:" in case it appears
-        yield text
-
-    thread.join()
+    try:
+        for text in streamer:
+            # Filter out the prefix upto "Assistant:" in case it appears
+            yield text
+        if failure:
+            raise RuntimeError(f"LLM inference failed: {failure[0]}") from failure[0]
+    finally:
+        # Also reached when the consumer closes the generator mid-stream.
+        closed.set()
+        thread.join()
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
+from prometheus_client import Counter, Gauge, Histogram
+
+from backend.core.observability import get_or_create_metric
+
+tracer = trace.get_tracer(__name__)
+
+_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+MODEL_LOAD_SECONDS = get_or_create_metric(
+    Histogram,
+    "zgpt_model_load_seconds",
+    "Time spent loading a model into memory",
+    labelnames=("model",),
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600),
+)
+GENERATIONS_IN_FLIGHT = get_or_create_metric(
+    Gauge,
+    "zgpt_generations_in_flight",
+    "Chat generations and image renders currently running",
+    labelnames=("kind",),
+)
+GENERATION_SECONDS = get_or_create_metric(
+    Histogram,
+    "zgpt_generation_seconds",
+    "Wall time of one chat generation, prefill included",
+    labelnames=("mode",),
+    buckets=_LATENCY_BUCKETS,
+)
+GENERATIONS_CANCELLED = get_or_create_metric(
+    Counter,
+    "zgpt_generations_cancelled_total",
+    "Chat generations stopped early because the client went away",
+    labelnames=("mode",),
+)
+TIME_TO_FIRST_TOKEN = get_or_create_metric(
+    Histogram,
+    "zgpt_generation_time_to_first_token_seconds",
+    "Time from the start of a generation to its first generated token (tokenization and prefill)",
+    labelnames=("mode",),
+    buckets=_LATENCY_BUCKETS,
+)
+INTER_TOKEN_LATENCY = get_or_create_metric(
+    Histogram,
+    "zgpt_generation_inter_token_seconds",
+    "Gap between consecutive generated tokens during decode",
+    labelnames=("mode",),
+    buckets=(0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0),
+)
+TOKENS_PER_SECOND = get_or_create_metric(
+    Histogram,
+    "zgpt_generation_tokens_per_second",
+    "Completion tokens divided by generation wall time",
+    labelnames=("mode",),
+    buckets=(1, 2, 5, 10, 20, 35, 50, 75, 100, 200),
+)
+PROMPT_TOKENS = get_or_create_metric(
+    Histogram,
+    "zgpt_generation_prompt_tokens",
+    "Prompt tokens per generation, history and system prompt included",
+    buckets=_TOKEN_BUCKETS,
+)
+COMPLETION_TOKENS = get_or_create_metric(
+    Histogram,
+    "zgpt_generation_completion_tokens",
+    "Tokens generated per chat reply",
+    buckets=_TOKEN_BUCKETS,
+)
+TOKENS_TOTAL = get_or_create_metric(
+    Counter,
+    "zgpt_generation_tokens_total",
+    "Prompt and completion tokens processed by the chat model",
+    labelnames=("kind",),
+)
+LANGUAGE_LATENCY = get_or_create_metric(
+    Histogram,
+    "zgpt_language_latency_seconds",
+    "Language detection and translation latency",
+    labelnames=("operation",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+IMAGE_GENERATION_SECONDS = get_or_create_metric(
+    Histogram,
+    "zgpt_image_generation_seconds",
+    "Time from admission to rendered image for /image/generate, cache hits included",
+    labelnames=("profile",),
+    buckets=(0.05, 0.25, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+
+
+@contextmanager
+def timed(histogram: Any, **labels: str) -> Iterator[None]:
+    """Observe the duration of the ``with`` block, whether or not it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        (histogram.labels(**labels) if labels else histogram).observe(time.perf_counter() - started)
+
+
+class TokenClock:
+    """``generate(streamer=...)`` hook timing each generated token.
+
+    ``generate`` hands the streamer the prompt ids first and then one token per decode
+    step, so every call after the first is a generated token. An ``inner`` streamer
+    (the text streamer for SSE) receives every call unchanged. The clock also traces
+    the two phases as ``llm.prefill`` (until the first token) and ``llm.decode``
+    spans under ``trace_context``, or the current context when omitted.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        prompt_tokens: int,
+        inner: Optional[Any] = None,
+        trace_context: Optional[otel_context.Context] = None,
+    ) -> None:
+        self.mode = mode
+        self.prompt_tokens = prompt_tokens
+        self.inner = inner
+        self.tokens = 0
+        self.started = time.perf_counter()
+        self._last: Optional[float] = None
+        self._prompt_pending = True
+        self._trace_context = trace_context
+        self._span = tracer.start_span("llm.prefill", context=trace_context)
+
+    def put(self, value: Any) -> None:
+        if self._prompt_pending:
+            self._prompt_pending = False
+        else:
+            now = time.perf_counter()
+            if self._last is None:
+                TIME_TO_FIRST_TOKEN.labels(mode=self.mode).observe(now - self.started)
+                self._span.end()
+                self._span = tracer.start_span("llm.decode", context=self._trace_context)
+            else:
+                INTER_TOKEN_LATENCY.labels(mode=self.mode).observe(now - self._last)
+            self._last = now
+            self.tokens += 1
+        if self.inner is not None:
+            self.inner.put(value)
+
+    def end(self) -> None:
+        if self.inner is not None:
+            self.inner.end()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Close the open phase span and, unless generation failed, record the totals."""
+        self._span.set_attribute("llm.completion_tokens", self.tokens)
+        if error is not None:
+            self._span.record_exception(error)
+            self._span.set_status(Status(StatusCode.ERROR))
+        self._span.end()
+        if error is not None:
+            return
+        elapsed = time.perf_counter() - self.started
+        GENERATION_SECONDS.labels(mode=self.mode).observe(elapsed)
+        PROMPT_TOKENS.observe(self.prompt_tokens)
+        COMPLETION_TOKENS.observe(self.tokens)
+        TOKENS_TOTAL.labels(kind="prompt").inc(self.prompt_tokens)
+        TOKENS_TOTAL.labels(kind="completion").inc(self.tokens)
+        if self.tokens and elapsed > 0:
+            TOKENS_PER_SECOND.labels(mode=self.mode).observe(self.tokens / elapsed)
@@ -1,12 +1,32 @@
 from __future__ import annotations
 
+import json
+import logging
+import os
 import re
+import threading
+import time
 from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from opentelemetry import trace
+from prometheus_client import Histogram
 
 from backend.config.settings import get_settings
+from backend.core.moderation_classifier import get_classifier_tier
+from backend.core.observability import get_or_create_metric
 
+LOGGER = logging.getLogger(__name__)
 settings = get_settings()
 
+MODERATION_LATENCY = get_or_create_metric(
+    Histogram,
+    "zgpt_moderation_latency_seconds",
+    "Time spent in each moderation tier per check",
+    labelnames=("tier",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
 
 @dataclass
 class ModerationResult:
@@ -16,34 +36,251 @@ class ModerationResult:
 
 
 class ModerationError(Exception):
-    def __init__(self, message: str, *, category: str | None = None) -> None:
+    def __init__(self, message: str, *, category: str | None = None, stage: str = "input") -> None:
         super().__init__(message)
         self.category = category
+        self.stage = stage
+
+
+@dataclass(frozen=True)
+class ModerationRule:
+    """Blocked ``phrases`` (literal, any whitespace between words) plus optional regex ``patterns``."""
+
+    category: str
+    phrases: tuple[str, ...]
+    reason: str
+    patterns: tuple[str, ...] = ()
 
 
 # Extremely small heuristic list to prevent obviously disallowed prompts without external APIs.
-_PATTERN_RULES: list[tuple[str, re.Pattern[str], str]] = [
-    (
+# Override with a JSON rules file via MODERATION_RULES_PATH.
+DEFAULT_RULES: tuple[ModerationRule, ...] = (
+    ModerationRule(
         "self_harm",
-        re.compile(r"(kill myself|suicide|self-harm|end my life)", re.IGNORECASE),
+        ("kill myself", "suicide", "self-harm", "end my life"),
         "We can't help with requests related to self-harm.",
     ),
-    (
+    ModerationRule(
         "violence",
-        re.compile(r"(build(?:ing)?\s+a\s+bomb|make\s+an\s+explosive|assassinate)", re.IGNORECASE),
+        ("build a bomb", "building a bomb", "make an explosive", "assassinate"),
         "Violent or weapon-building instructions are blocked.",
     ),
-    (
+    ModerationRule(
         "hate",
-        re.compile(r"(hate\s+speech|kill all|genocide)", re.IGNORECASE),
+        ("hate speech", "kill all", "genocide"),
         "Hateful or harassing content is not permitted.",
     ),
-    (
+    ModerationRule(
         "sexual_minors",
-        re.compile(r"(minor\s+sexual|child\s+sexual)", re.IGNORECASE),
+        ("minor sexual", "child sexual"),
         "Sexual content involving minors is strictly disallowed.",
     ),
-]
+)
+
+
+def _normalize_phrase(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _trie_regex(node: dict) -> str:
+    branches = [
+        (r"\s+" if char == " " else re.escape(char)) + _trie_regex(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not branches:
+        return ""
+    group = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return f"(?:{group})?" if "" in node else group
+
+
+class ModerationEngine:
+    """All phrases of all rules compiled into one prefix-trie regex.
+
+    Shared prefixes collapse into a single branch, so at each text position the
+    regex engine only follows the few branches whose next character matches and a
+    scan costs O(text length) however many phrases are loaded. The matched text is
+    mapped back to its rule for category tagging. Regex ``patterns`` go into a
+    second alternation tagged by named group; keep them few, as each one is tried
+    at every position.
+    """
+
+    def __init__(self, rules: Iterable[ModerationRule]) -> None:
+        self.rules = tuple(rules)
+        self._by_phrase: dict[str, ModerationRule] = {}
+        trie: dict = {}
+        for rule in self.rules:
+            for phrase in rule.phrases:
+                normalized = _normalize_phrase(phrase)
+                if not normalized:
+                    continue
+                self._by_phrase.setdefault(normalized, rule)
+                node = trie
+                for char in normalized:
+                    node = node.setdefault(char, {})
+                node[""] = {}
+        self._phrases = re.compile(_trie_regex(trie), re.IGNORECASE) if trie else None
+
+        self._by_group = {f"r{index}": rule for index, rule in enumerate(self.rules) if rule.patterns}
+        alternatives = [f"(?P<{group}>{'|'.join(rule.patterns)})" for group, rule in self._by_group.items()]
+        self._patterns = re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+
+    def scan(self, text: str) -> ModerationResult:
+        if not text:
+            return ModerationResult(allowed=True)
+        rule = None
+        if self._phrases is not None:
+            match = self._phrases.search(text)
+            if match is not None:
+                rule = self._by_phrase[_normalize_phrase(match.group(0))]
+        if rule is None and self._patterns is not None:
+            match = self._patterns.search(text)
+            if match is not None:
+                rule = self._by_group[match.lastgroup]
+        if rule is None:
+            return ModerationResult(allowed=True)
+        return ModerationResult(allowed=False, category=rule.category, reason=rule.reason)
+
+
+def load_rules(path: str) -> tuple[ModerationRule, ...]:
+    """Parse a rules file: ``{"rules": [{"category", "reason", "phrases": [...], "patterns": [...]}]}``."""
+    with open(path, encoding="utf-8") as handle:
+        data = json.load(handle)
+    rules = []
+    for entry in data["rules"]:
+        patterns = tuple(entry.get("patterns", ()))
+        for pattern in patterns:
+            if "(?P<" in pattern:
+                raise ValueError(f"Named groups are not allowed in moderation patterns: {pattern!r}")
+            re.compile(pattern)
+        rules.append(ModerationRule(
+            entry["category"],
+            tuple(entry.get("phrases", ())),
+            entry.get("reason") or "Content rejected",
+            patterns,
+        ))
+    return tuple(rules)
+
+
+class RuleSet:
+    """Engine for the configured rules file, recompiled when the file changes on disk.
+
+    The file's mtime is checked at most every ``check_interval`` seconds. A file that
+    fails to parse is logged and the previous engine keeps serving.
+    """
+
+    def __init__(self, path: Optional[str], check_interval: float) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self._engine = ModerationEngine(DEFAULT_RULES)
+        self._mtime: Optional[float] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def engine(self) -> ModerationEngine:
+        if not self.path:
+            return self._engine
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._engine
+        with self._lock:
+            if now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                self._reload_if_changed()
+        return self._engine
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as exc:
+            LOGGER.warning("Moderation rules file %s unavailable: %s", self.path, exc)
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            self._engine = ModerationEngine(load_rules(self.path))
+        except (OSError, ValueError, KeyError, TypeError, re.error) as exc:
+            LOGGER.warning("Ignoring invalid moderation rules in %s: %s", self.path, exc)
+        else:
+            LOGGER.info("Loaded %d moderation rules from %s", len(self._engine.rules), self.path)
+        self._mtime = mtime
+
+
+_rules = RuleSet(settings.moderation_rules_path, settings.moderation_rules_reload_seconds)
+
+
+def get_engine() -> ModerationEngine:
+    return _rules.engine()
+
+
+class StreamModerator:
+    """Checks streamed output chunk by chunk.
+
+    The last ``window`` characters are carried over and rescanned with each new chunk,
+    so a phrase split across chunk boundaries is still caught while each chunk costs
+    O(window + chunk) rather than a rescan of the whole reply. The window should be
+    longer than the longest phrase the rules can match.
+    """
+
+    def __init__(self, engine: Optional[ModerationEngine] = None, window: Optional[int] = None) -> None:
+        if engine is None and settings.moderation_enabled:
+            engine = get_engine()
+        self._engine = engine
+        self._window = settings.moderation_stream_window if window is None else window
+        self._tail = ""
+
+    def feed(self, chunk: str) -> ModerationResult:
+        if self._engine is None or not chunk:
+            return ModerationResult(allowed=True)
+        text = self._tail + chunk
+        self._tail = text[-self._window:] if self._window else ""
+        return self._engine.scan(text)
+
+
+def _scan_rules(text: str) -> ModerationResult:
+    started = time.perf_counter()
+    result = get_engine().scan(text)
+    MODERATION_LATENCY.labels(tier="regex").observe(time.perf_counter() - started)
+    return result
+
+
+def _scan_classifier(text: str, result: ModerationResult) -> ModerationResult:
+    """Optional classifier tier for text the regex tier allowed; returns ``result`` when it has nothing to add."""
+    tier = get_classifier_tier()
+    if tier is None:
+        return result
+    started = time.perf_counter()
+    try:
+        verdict = tier.check(text)
+    except Exception as exc:
+        # A slow or broken model fails open to the regex verdict rather than blocking chat.
+        LOGGER.warning("Moderation classifier skipped: %s", exc or type(exc).__name__)
+        return result
+    finally:
+        MODERATION_LATENCY.labels(tier="classifier").observe(time.perf_counter() - started)
+    if verdict.category is None:
+        return result
+    return ModerationResult(
+        allowed=False,
+        category=verdict.category,
+        reason="Content was flagged by the moderation classifier.",
+    )
+
+
+def _scan(text: str) -> ModerationResult:
+    """Regex tier first; only text it lets through reaches the optional classifier tier."""
+    result = _scan_rules(text)
+    if not result.allowed:
+        return result
+    return _scan_classifier(text, result)
+
+
+def _annotate(result: ModerationResult) -> ModerationResult:
+    span = trace.get_current_span()
+    span.set_attribute("moderation.allowed", result.allowed)
+    if result.category:
+        span.set_attribute("moderation.category", result.category)
+    return result
 
 
 def check_prompt(text: str) -> ModerationResult:
@@ -51,9 +288,10 @@ def check_prompt(text: str) -> ModerationResult:
         return ModerationResult(allowed=True)
 
     normalized = text.strip()
-    for category, pattern, reason in _PATTERN_RULES:
-        if pattern.search(normalized):
-            return ModerationResult(allowed=False, category=category, reason=reason)
+    # Content rules first so an over-long prompt still reports what it contained.
+    result = _scan_rules(normalized)
+    if not result.allowed:
+        return result
 
     if len(normalized) > 8000:
         return ModerationResult(
@@ -62,12 +300,20 @@ def check_prompt(text: str) -> ModerationResult:
             reason="Prompt exceeds maximum supported length.",
         )
 
-    return ModerationResult(allowed=True)
+    return _scan_classifier(normalized, result)
 
 
 def enforce_safe_prompt(text: str) -> None:
     if not settings.moderation_enabled:
         return
-    result = check_prompt(text)
+    result = _annotate(check_prompt(text))
     if not result.allowed:
         raise ModerationError(result.reason or "Prompt rejected", category=result.category)
+
+
+def enforce_safe_reply(text: str) -> None:
+    if not settings.moderation_enabled:
+        return
+    result = _annotate(_scan(text))
+    if not result.allowed:
+        raise ModerationError(result.reason or "Reply rejected", category=result.category, stage="output")
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import hashlib
+import importlib
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import NamedTuple, Optional, Protocol, Sequence
+
+from opentelemetry import trace
+from prometheus_client import Counter, Histogram
+
+from backend.config.settings import get_settings
+from backend.core.observability import get_or_create_metric
+
+LOGGER = logging.getLogger(__name__)
+settings = get_settings()
+
+MODERATION_CLASSIFIER_CACHE = get_or_create_metric(
+    Counter,
+    "zgpt_moderation_classifier_cache_total",
+    "Classifier verdict cache lookups",
+    labelnames=("result",),
+)
+MODERATION_CLASSIFIER_BATCH = get_or_create_metric(
+    Histogram,
+    "zgpt_moderation_classifier_batch_size",
+    "Texts classified together in one model forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+# Labels that mean "nothing to flag" across common moderation/toxicity checkpoints.
+SAFE_LABELS = frozenset({"ok", "safe", "neutral", "non-toxic", "not_toxic", "non_toxic", "label_0", "normal"})
+
+
+class Verdict(NamedTuple):
+    """Classifier output; ``category`` is None when the text is clean."""
+
+    category: Optional[str]
+    score: float = 0.0
+
+
+class TextClassifier(Protocol):
+    def classify(self, texts: Sequence[str]) -> list[Verdict]: ...
+
+
+class TransformersClassifier:
+    """Hugging Face text-classification checkpoint; any non-safe label above ``threshold`` flags."""
+
+    def __init__(self, model_id: str, threshold: float, device: str = "cpu") -> None:
+        from transformers import pipeline
+
+        self.threshold = threshold
+        self._pipe = pipeline("text-classification", model=model_id, device=device, top_k=None, truncation=True)
+
+    def classify(self, texts: Sequence[str]) -> list[Verdict]:
+        verdicts = []
+        for scores in self._pipe(list(texts), batch_size=len(texts)):
+            flagged = [
+                entry for entry in scores
+                if entry["label"].lower() not in SAFE_LABELS and entry["score"] >= self.threshold
+            ]
+            best = max(flagged, key=lambda entry: entry["score"], default=None)
+            verdicts.append(Verdict(best["label"].lower(), best["score"]) if best else Verdict(None))
+        return verdicts
+
+
+def load_classifier(spec: str) -> TextClassifier:
+    """``module.path:factory`` calls a custom factory; anything else is a Hugging Face model id."""
+    if ":" in spec:
+        module_name, _, attribute = spec.partition(":")
+        return getattr(importlib.import_module(module_name), attribute)()
+    return TransformersClassifier(spec, settings.moderation_classifier_threshold, settings.moderation_classifier_device)
+
+
+class _Pending:
+    __slots__ = ("key", "text", "future")
+
+    def __init__(self, key: str, text: str) -> None:
+        self.key = key
+        self.text = text
+        self.future: Future = Future()
+
+
+class ClassifierTier:
+    """Shares one classifier across concurrent requests through a batching queue.
+
+    A collector thread takes whatever texts are waiting (up to ``max_batch``, waiting
+    at most ``window`` seconds for company) and classifies them in one forward pass.
+    Verdicts are cached by text hash, and identical texts already queued share one
+    slot in the batch.
+    """
+
+    def __init__(
+        self,
+        classifier: TextClassifier,
+        max_batch: int,
+        window: float,
+        cache_size: int,
+        timeout: float,
+    ) -> None:
+        self.classifier = classifier
+        self.max_batch = max_batch
+        self.window = window
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self._cache: "OrderedDict[str, Verdict]" = OrderedDict()
+        self._pending: dict[str, _Pending] = {}
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._collect_loop, name="moderation-classifier", daemon=True)
+        self._thread.start()
+
+    def check(self, text: str) -> Verdict:
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            cached = self._cache.get(key)
+            cache_hit = cached is not None
+            trace.get_current_span().set_attribute("moderation.classifier_cache_hit", cache_hit)
+            if cache_hit:
+                self._cache.move_to_end(key)
+                MODERATION_CLASSIFIER_CACHE.labels(result="hit").inc()
+                return cached
+            MODERATION_CLASSIFIER_CACHE.labels(result="miss").inc()
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = _Pending(key, text)
+                self._queue.put(pending)
+        return pending.future.result(timeout=self.timeout)
+
+    def _collect_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            MODERATION_CLASSIFIER_BATCH.observe(len(batch))
+            try:
+                verdicts = self.classifier.classify([item.text for item in batch])
+            except Exception as exc:
+                LOGGER.warning("Moderation classifier failed: %s", exc)
+                with self._lock:
+                    for item in batch:
+                        self._pending.pop(item.key, None)
+                for item in batch:
+                    item.future.set_exception(exc)
+                continue
+            with self._lock:
+                for item, verdict in zip(batch, verdicts):
+                    self._pending.pop(item.key, None)
+                    self._cache[item.key] = verdict
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            for item, verdict in zip(batch, verdicts):
+                item.future.set_result(verdict)
+
+
+# Failed loads are retried after this delay, doubling per consecutive failure up to the max.
+_RETRY_SECONDS = 5.0
+_RETRY_MAX_SECONDS = 300.0
+
+_tier: Optional[ClassifierTier] = None
+_tier_lock = threading.Lock()
+_failures = 0
+_retry_at = 0.0
+
+
+def get_classifier_tier() -> Optional[ClassifierTier]:
+    """The configured classifier tier, loaded on first use; None when disabled or not loaded yet.
+
+    A failed load is logged and retried with exponential backoff rather than given up
+    on, so a transient error (a model download timing out, say) does not switch the
+    tier off for the life of the process.
+    """
+    global _tier, _failures, _retry_at
+    if _tier is not None or not settings.moderation_classifier or time.monotonic() < _retry_at:
+        return _tier
+    with _tier_lock:
+        if _tier is None and time.monotonic() >= _retry_at:
+            try:
+                classifier = load_classifier(settings.moderation_classifier)
+            except Exception as exc:
+                _failures += 1
+                delay = min(_RETRY_SECONDS * 2 ** (_failures - 1), _RETRY_MAX_SECONDS)
+                _retry_at = time.monotonic() + delay
+                LOGGER.error(
+                    "Moderation classifier %s unavailable (attempt %d), retrying in %.0fs: %s",
+                    settings.moderation_classifier,
+                    _failures,
+                    delay,
+                    exc,
+                )
+                return None
+            _failures = 0
+            _tier = ClassifierTier(
+                classifier,
+                max_batch=settings.moderation_classifier_batch_size,
+                window=settings.moderation_classifier_batch_window_ms / 1000,
+                cache_size=settings.moderation_classifier_cache_size,
+                timeout=settings.moderation_classifier_timeout_seconds,
+            )
+    return _tier
@@ -1,14 +1,16 @@
 from __future__ import annotations
 
 import logging
-from typing import Optional
+from typing import Iterable, Iterator, Optional, TypeVar
 
+from opentelemetry import context as otel_context
 from opentelemetry import trace
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from prometheus_client import REGISTRY
 from prometheus_fastapi_instrumentator import Instrumentator
 from fastapi import FastAPI
 
@@ -16,6 +18,20 @@ from backend.config.settings import Settings
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+
+def get_or_create_metric(metric_cls, name: str, documentation: str, **kwargs):
+    """Return the registered collector called ``name`` or register a new one.
+
+    Modules holding metrics are reloaded by the test fixtures, so plain module-level
+    construction would raise on duplicate registration.
+    """
+    existing = REGISTRY._names_to_collectors.get(name)  # type: ignore[attr-defined]
+    if existing is not None:
+        return existing
+    return metric_cls(name, documentation, **kwargs)
+
 
 def setup_metrics(app: FastAPI, settings: Settings) -> Optional[Instrumentator]:
     if not settings.metrics_enabled:
@@ -36,7 +52,8 @@ def setup_metrics(app: FastAPI, settings: Settings) -> Optional[Instrumentator]:
     return instrumentator
 
 
-def setup_tracing(app: FastAPI, settings: Settings) -> Optional[TracerProvider]:
+def setup_tracer_provider(settings: Settings) -> Optional[TracerProvider]:
+    """Install the global OTLP tracer provider; ``None`` when no exporter is configured."""
     if not settings.otel_exporter_endpoint:
         return None
 
@@ -49,7 +66,39 @@ def setup_tracing(app: FastAPI, settings: Settings) -> Optional[TracerProvider]:
     )
     tracer_provider.add_span_processor(BatchSpanProcessor(exporter))
     trace.set_tracer_provider(tracer_provider)
+    return tracer_provider
+
+
+def setup_tracing(app: FastAPI, settings: Settings) -> Optional[TracerProvider]:
+    tracer_provider = setup_tracer_provider(settings)
+    if tracer_provider is None:
+        return None
 
     FastAPIInstrumentor.instrument_app(app)
     logger.info("OpenTelemetry tracing enabled -> %s", settings.otel_exporter_endpoint)
     return tracer_provider
+
+
+def iterate_in_context(iterable: Iterable[T], ctx: otel_context.Context) -> Iterator[T]:
+    """Advance ``iterable`` with ``ctx`` as the current OpenTelemetry context.
+
+    Starlette steps sync generators on threadpool threads one item at a time, so the
+    context current when a generator was created is not current while its body runs.
+    Attaching ``ctx`` around each step keeps spans opened inside it correctly parented.
+    """
+    iterator = iter(iterable)
+    try:
+        while True:
+            token = otel_context.attach(ctx)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                otel_context.detach(token)
+            yield item
+    finally:
+        # Closing early (client went away) must still run the inner generator's cleanup.
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
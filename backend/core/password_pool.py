@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.concurrency import run_in_threadpool
+
+from backend.config.settings import get_settings
+from backend.core.observability import get_or_create_metric
+from backend.core.security import hash_password, verify_and_update_password
+
+settings = get_settings()
+
+PASSWORD_HASH_PENDING = get_or_create_metric(
+    Gauge,
+    "zgpt_password_hash_pending",
+    "Password hash/verify jobs submitted and not yet finished",
+)
+PASSWORD_HASH_QUEUE_WAIT = get_or_create_metric(
+    Histogram,
+    "zgpt_password_hash_queue_wait_seconds",
+    "Time password jobs wait for a free hashing worker",
+)
+PASSWORD_HASH_DURATION = get_or_create_metric(
+    Histogram,
+    "zgpt_password_hash_duration_seconds",
+    "Time spent hashing or verifying a password inside a worker",
+    labelnames=("operation",),
+)
+PASSWORD_HASH_REJECTED = get_or_create_metric(
+    Counter,
+    "zgpt_password_hash_rejected_total",
+    "Password jobs rejected because the hashing queue was full",
+)
+
+_OPERATIONS = {
+    "hash": hash_password,
+    "verify": verify_and_update_password,
+}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when more password jobs are queued than ``PASSWORD_HASH_MAX_PENDING`` allows."""
+
+
+def _run_timed(operation: str, *args: Any) -> tuple[float, float, Any]:
+    # Executed inside the worker process; wall-clock start lets the caller split queue vs. CPU time.
+    started = time.time()
+    result = _OPERATIONS[operation](*args)
+    return started, time.time() - started, result
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if settings.password_hash_workers <= 0:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn keeps forked copies of loaded model weights and threads out of the workers.
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.password_hash_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+
+def shutdown_password_pool() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def _submit(operation: str, *args: Any) -> Any:
+    global _pending
+    with _pending_lock:
+        if settings.password_hash_max_pending and _pending >= settings.password_hash_max_pending:
+            PASSWORD_HASH_REJECTED.inc()
+            raise PasswordHasherBusy("Password hashing queue is full")
+        _pending += 1
+    PASSWORD_HASH_PENDING.inc()
+    submitted = time.time()
+    try:
+        executor = _get_executor()
+        if executor is None:
+            started, duration, result = await run_in_threadpool(_run_timed, operation, *args)
+        else:
+            loop = asyncio.get_running_loop()
+            started, duration, result = await loop.run_in_executor(executor, _run_timed, operation, *args)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+        PASSWORD_HASH_PENDING.dec()
+    PASSWORD_HASH_QUEUE_WAIT.observe(max(0.0, started - submitted))
+    PASSWORD_HASH_DURATION.labels(operation=operation).observe(duration)
+    return result
+
+
+async def hash_password_async(password: str) -> str:
+    return await _submit("hash", password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Verify off the event loop; the second item is a replacement hash when the cost factor changed."""
+    return await _submit("verify", plain_password, hashed_password)
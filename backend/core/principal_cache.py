@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Optional
+
+from backend.config.settings import get_settings
+from backend.db.models import User
+
+LOGGER = logging.getLogger(__name__)
+settings = get_settings()
+
+_REDIS_PREFIX = "zgpt:principal"
+
+
+def _snapshot(user: User) -> dict[str, Any]:
+    # Password hashes never leave the database row.
+    return {
+        "id": user.id,
+        "email": user.email,
+        "full_name": user.full_name,
+        "is_active": user.is_active,
+        "is_admin": user.is_admin,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+    }
+
+
+def _restore(data: dict[str, Any]) -> User:
+    created_at = data.get("created_at")
+    return User(
+        id=data["id"],
+        email=data["email"],
+        full_name=data.get("full_name"),
+        hashed_password="",
+        is_active=data.get("is_active", True),
+        is_admin=data.get("is_admin", False),
+        created_at=datetime.fromisoformat(created_at) if created_at else None,
+    )
+
+
+class PrincipalCache:
+    """Short-TTL cache of authenticated users keyed by ``(user_id, jti)``.
+
+    The in-process LRU answers most lookups; an optional Redis layer lets replicas
+    share warm entries. Both layers are bounded by the TTL and the token expiry, so
+    a deactivated user is locked out everywhere after at most ``ttl_seconds``.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int, redis_url: Optional[str] = None) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple[str, str], tuple[float, dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url and ttl_seconds:
+            import redis
+
+            self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.05)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, user_id: str, jti: str) -> Optional[User]:
+        if not self.enabled:
+            return None
+        key = (user_id, jti)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, data = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    return _restore(data)
+                del self._entries[key]
+
+        cached = self._redis_get(user_id, jti)
+        if cached is None:
+            return None
+        data, remaining = cached
+        self._store_local(key, data, min(float(self.ttl_seconds), remaining))
+        return _restore(data)
+
+    def set(self, user: User, jti: str, token_exp: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        ttl = float(self.ttl_seconds)
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        data = _snapshot(user)
+        self._store_local((user.id, jti), data, ttl)
+        self._redis_set(user.id, jti, data, ttl)
+
+    def invalidate_user(self, user_id: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+        if self._redis is not None:
+            try:
+                self._redis.delete(f"{_REDIS_PREFIX}:{user_id}")
+            except Exception as exc:  # pragma: no cover - network failure path
+                LOGGER.warning("Principal cache invalidation in Redis failed: %s", exc)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _store_local(self, key: tuple[str, str], data: dict[str, Any], ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _redis_get(self, user_id: str, jti: str) -> Optional[tuple[dict[str, Any], float]]:
+        if self._redis is None:
+            return None
+        try:
+            raw = self._redis.hget(f"{_REDIS_PREFIX}:{user_id}", jti)
+        except Exception as exc:  # pragma: no cover - network failure path
+            LOGGER.warning("Principal cache read from Redis failed: %s", exc)
+            return None
+        if not raw:
+            return None
+        data = json.loads(raw)
+        remaining = data.pop("_expires_at", 0) - time.time()
+        if remaining <= 0:
+            return None
+        return data, remaining
+
+    def _redis_set(self, user_id: str, jti: str, data: dict[str, Any], ttl: float) -> None:
+        if self._redis is None:
+            return
+        redis_key = f"{_REDIS_PREFIX}:{user_id}"
+        try:
+            pipeline = self._redis.pipeline()
+            pipeline.hset(redis_key, jti, json.dumps({**data, "_expires_at": time.time() + ttl}))
+            pipeline.expire(redis_key, max(1, int(ttl)))
+            pipeline.execute()
+        except Exception as exc:  # pragma: no cover - network failure path
+            LOGGER.warning("Principal cache write to Redis failed: %s", exc)
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.auth_cache_ttl_seconds,
+    max_entries=settings.auth_cache_max_entries,
+    redis_url=settings.redis_url if settings.auth_cache_redis else None,
+)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Distinct stacks kept per profile; further new stacks are folded into one bucket.
+MAX_STACKS = 10_000
+_TRUNCATED = "[truncated]"
+
+_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is requested while another one is running."""
+
+
+@dataclass
+class ProfileReport:
+    seconds: float
+    interval: float
+    samples: int
+    sampler_cpu_seconds: float
+    stacks: Counter = field(default_factory=Counter)
+    threads: list[dict] = field(default_factory=list)
+    allocations: list[dict] = field(default_factory=list)
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format (``thread;outer;...;inner count``), one stack per line."""
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(self.stacks.items())) + "\n"
+
+    def to_dict(self) -> dict:
+        return {
+            "seconds": round(self.seconds, 3),
+            "interval_ms": round(self.interval * 1000, 3),
+            "samples": self.samples,
+            "sampler_cpu_seconds": round(self.sampler_cpu_seconds, 4),
+            "threads": self.threads,
+            "allocations": self.allocations,
+            "collapsed": self.collapsed(),
+        }
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # Semicolons separate frames in the folded format.
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _collapse(thread_name: str, frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name.replace(";", ":"))
+    return ";".join(reversed(labels))
+
+
+def _thread_cpu_seconds() -> dict[int, float]:
+    """User+system CPU seconds per native thread id, read from ``/proc`` (empty off Linux)."""
+    try:
+        tids = os.listdir("/proc/self/task")
+        ticks = os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError):
+        return {}
+    usage = {}
+    for tid in tids:
+        try:
+            with open(f"/proc/self/task/{tid}/stat", encoding="ascii") as handle:
+                data = handle.read()
+        except OSError:
+            continue  # thread exited between listdir and open
+        # Fields after the parenthesised command name; utime and stime are the 12th and 13th.
+        fields = data[data.rindex(")") + 2:].split()
+        usage[int(tid)] = (int(fields[11]) + int(fields[12])) / ticks
+    return usage
+
+
+def _top_allocations(snapshot: tracemalloc.Snapshot, limit: int) -> list[dict]:
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+def profile(seconds: float, interval: float, allocations: int = 0) -> ProfileReport:
+    """Sample every thread's Python stack each ``interval`` seconds for ``seconds``.
+
+    Runs on the calling thread, which is left out of the samples. Per-thread CPU is
+    the ``/proc`` delta over the window. With ``allocations`` > 0, tracemalloc runs for
+    the window (unless it was already tracing) and the top allocation sites still
+    alive at the end are reported. Only one profile runs at a time per process.
+    """
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    started_tracing = allocations > 0 and not tracemalloc.is_tracing()
+    try:
+        if started_tracing:
+            tracemalloc.start()
+        own_ident = threading.get_ident()
+        stacks: Counter = Counter()
+        thread_samples: Counter = Counter()
+        samples = 0
+        cpu_before = _thread_cpu_seconds()
+        sampler_cpu = time.thread_time()
+        started = time.perf_counter()
+        deadline = started + seconds
+        while True:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = _collapse(names.get(ident, f"thread-{ident}"), frame)
+                if stack not in stacks and len(stacks) >= MAX_STACKS:
+                    stack = _TRUNCATED
+                stacks[stack] += 1
+                thread_samples[ident] += 1
+            samples += 1
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            time.sleep(min(interval, remaining))
+        elapsed = time.perf_counter() - started
+        sampler_cpu = time.thread_time() - sampler_cpu
+        cpu_after = _thread_cpu_seconds()
+
+        threads = []
+        for thread in threading.enumerate():
+            if thread.ident == own_ident:
+                continue
+            cpu: Optional[float] = None
+            if thread.native_id in cpu_after:
+                cpu = cpu_after[thread.native_id] - cpu_before.get(thread.native_id, 0.0)
+            threads.append({
+                "name": thread.name,
+                "native_id": thread.native_id,
+                "samples": thread_samples.get(thread.ident, 0),
+                "cpu_seconds": None if cpu is None else round(cpu, 3),
+                "cpu_percent": None if cpu is None else round(100 * cpu / elapsed, 1),
+            })
+        threads.sort(key=lambda entry: (entry["cpu_seconds"] or 0, entry["samples"]), reverse=True)
+
+        top = _top_allocations(tracemalloc.take_snapshot(), allocations) if allocations > 0 else []
+        return ProfileReport(
+            seconds=elapsed,
+            interval=interval,
+            samples=samples,
+            sampler_cpu_seconds=sampler_cpu,
+            stacks=stacks,
+            threads=threads,
+            allocations=top,
+        )
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _lock.release()
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import contextvars
+import queue
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+import anyio
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from backend.config.settings import Settings
+
+HEARTBEAT = ": keep-alive\n\n"
+
+_DONE = object()
+
+
+def format_event(event: str, data: str) -> str:
+    """One SSE event; embedded newlines become extra ``data:`` lines so they cannot end it early."""
+    lines = "\n".join(f"data: {line}" for line in data.split("\n"))
+    return f"event: {event}\n{lines}\n\n"
+
+
+@dataclass(frozen=True)
+class FlushPolicy:
+    """When buffered tokens are written out as one ``message`` event.
+
+    The first token goes out at once; after that, text is held until ``interval``
+    seconds have passed since the previous event or ``max_bytes`` are buffered.
+    An ``interval`` of zero writes every chunk as its own event. Idle streams get
+    a comment line every ``heartbeat`` seconds (zero disables it).
+    """
+
+    interval: float
+    max_bytes: int
+    heartbeat: float
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "FlushPolicy":
+        return cls(
+            interval=settings.sse_flush_interval_ms / 1000,
+            max_bytes=settings.sse_flush_bytes,
+            heartbeat=settings.sse_heartbeat_seconds,
+        )
+
+
+class _Failure:
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+def _pump(chunks: Iterable[str], out: queue.Queue, stop: threading.Event) -> None:
+    iterator = iter(chunks)
+    try:
+        for chunk in iterator:
+            out.put(chunk)
+            if stop.is_set():
+                break
+    except BaseException as exc:  # noqa: BLE001 - re-raised on the consuming thread
+        out.put(_Failure(exc))
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+        out.put(_DONE)
+
+
+def batches(chunks: Iterable[str], policy: FlushPolicy) -> Iterator[Optional[str]]:
+    """Group ``chunks`` into the text of each ``message`` event according to ``policy``.
+
+    ``None`` stands for a heartbeat. Timed flushes and heartbeats need to wake up
+    between chunks, so ``chunks`` is read on a helper thread running in the
+    caller's context. Closing this generator stops the helper after its current
+    chunk. Exceptions from ``chunks`` are re-raised here once the text before
+    them has been yielded.
+    """
+    if policy.interval <= 0 and policy.heartbeat <= 0:
+        for chunk in chunks:
+            if chunk:
+                yield chunk
+        return
+
+    out: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    context = contextvars.copy_context()
+    threading.Thread(
+        target=context.run, args=(_pump, chunks, out, stop), name="sse-pump", daemon=True
+    ).start()
+
+    pending: List[str] = []
+    pending_bytes = 0
+    first = True
+    last_event = last_write = time.monotonic()
+    try:
+        while True:
+            now = time.monotonic()
+            deadlines = []
+            if pending:
+                deadlines.append(last_event + policy.interval)
+            if policy.heartbeat > 0:
+                deadlines.append(last_write + policy.heartbeat)
+            timeout = max(0.0, min(deadlines) - now) if deadlines else None
+            try:
+                item = out.get(timeout=timeout)
+            except queue.Empty:
+                now = time.monotonic()
+                if pending and now >= last_event + policy.interval:
+                    yield "".join(pending)
+                    pending, pending_bytes = [], 0
+                    last_event = last_write = now
+                elif policy.heartbeat > 0 and now >= last_write + policy.heartbeat:
+                    yield None
+                    last_write = now
+                continue
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                if pending:
+                    yield "".join(pending)
+                raise item.exc
+            if not item:
+                continue
+            pending.append(item)
+            pending_bytes += len(item.encode("utf-8"))
+            now = time.monotonic()
+            if first or pending_bytes >= policy.max_bytes or now >= last_event + policy.interval:
+                yield "".join(pending)
+                pending, pending_bytes = [], 0
+                first = False
+                last_event = last_write = now
+        if pending:
+            yield "".join(pending)
+    finally:
+        stop.set()
+
+
+def coalesce(chunks: Iterable[str], policy: FlushPolicy) -> Iterator[str]:
+    """Frame ``chunks`` as SSE ``message`` events and heartbeats according to ``policy``."""
+    with closing(batches(chunks, policy)) as texts:
+        for text in texts:
+            yield HEARTBEAT if text is None else format_event("message", text)
+
+
+class EventStreamResponse(StreamingResponse):
+    """``text/event-stream`` response that calls ``on_close`` (in the threadpool) however it ends.
+
+    When the client disconnects mid-stream Starlette neither closes the body
+    iterator nor runs background tasks, so cleanup that must happen then, such as
+    stopping generation and releasing an admission slot, belongs in ``on_close``.
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(self, content: Any, on_close: Callable[[], None], **kwargs: Any) -> None:
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(self.on_close)
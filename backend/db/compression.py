@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import zlib
+from typing import Optional
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+from backend.config.settings import get_settings
+
+try:
+    import zstandard  # type: ignore
+    _ZSTD_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None  # type: ignore
+    _ZSTD_AVAILABLE = False
+
+settings = get_settings()
+
+# One-byte header in front of every stored payload so codecs can change without rewriting old rows.
+CODEC_RAW = b"\x00"
+CODEC_ZLIB = b"\x01"
+CODEC_ZSTD = b"\x02"
+
+_ZLIB_LEVEL = 6
+_ZSTD_LEVEL = 3
+
+
+def _resolve_codec(codec: Optional[str]) -> str:
+    codec = (codec or settings.message_compression).lower()
+    if codec == "zstd" and not _ZSTD_AVAILABLE:
+        # Fall back rather than failing writes when the optional wheel is missing.
+        return "zlib"
+    return codec
+
+
+def compress_text(text: str, *, codec: Optional[str] = None, min_bytes: Optional[int] = None) -> bytes:
+    raw = text.encode("utf-8")
+    threshold = settings.message_compression_min_bytes if min_bytes is None else min_bytes
+    codec = _resolve_codec(codec)
+    if codec == "none" or len(raw) < threshold:
+        return CODEC_RAW + raw
+
+    if codec == "zstd":
+        packed = CODEC_ZSTD + zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(raw)
+    else:
+        packed = CODEC_ZLIB + zlib.compress(raw, _ZLIB_LEVEL)
+
+    # Incompressible content (already-compressed pastes, base64 blobs) is kept as-is.
+    if len(packed) >= len(raw) + 1:
+        return CODEC_RAW + raw
+    return packed
+
+
+def decompress_text(payload: bytes | str) -> str:
+    if isinstance(payload, str):
+        # Rows written before the compression migration ran.
+        return payload
+    payload = bytes(payload)
+    if not payload:
+        return ""
+    header, body = payload[:1], payload[1:]
+    if header == CODEC_RAW:
+        return body.decode("utf-8")
+    if header == CODEC_ZLIB:
+        return zlib.decompress(body).decode("utf-8")
+    if header == CODEC_ZSTD:
+        if not _ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard is required to read zstd-compressed messages")
+        return zstandard.ZstdDecompressor().decompress(body).decode("utf-8")
+    raise ValueError(f"Unknown message codec header: {header!r}")
+
+
+class CompressedText(TypeDecorator):
+    """Text column stored as a codec-tagged blob, compressed above a size threshold."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress_text(value)
@@ -1,10 +1,16 @@
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
+from opentelemetry import trace
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload, undefer
 from sqlmodel import Session, select
 
+from backend.core.principal_cache import principal_cache
 from backend.db.models import ChatMessage, ChatSession, User
 
+tracer = trace.get_tracer(__name__)
+
 
 def get_user(session: Session, user_id: str) -> Optional[User]:
     return session.get(User, user_id)
@@ -23,6 +29,39 @@ def create_user(session: Session, *, email: str, full_name: Optional[str], hashe
     return user
 
 
+def update_password_hash(session: Session, user: User, hashed_password: str) -> User:
+    user.hashed_password = hashed_password
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    return user
+
+
+def set_user_active(session: Session, user_id: str, is_active: bool) -> Optional[User]:
+    user = session.get(User, user_id)
+    if user is None:
+        return None
+    user.is_active = is_active
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    principal_cache.invalidate_user(user_id)
+    return user
+
+
+def set_user_admin(session: Session, email: str, is_admin: bool) -> Optional[User]:
+    user = get_user_by_email(session, email)
+    if user is None:
+        return None
+    user.is_admin = is_admin
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    principal_cache.invalidate_user(user.id)
+    return user
+
+
+@tracer.start_as_current_span("db.upsert_session")
 def upsert_session(session: Session, session_id: Optional[str], title: Optional[str], user_id: str) -> ChatSession:
     db_session: Optional[ChatSession] = None
     if session_id:
@@ -44,12 +83,14 @@ def upsert_session(session: Session, session_id: Optional[str], title: Optional[
     return db_session
 
 
+@tracer.start_as_current_span("db.record_message")
 def record_message(
     session_db: Session,
     session_obj: ChatSession,
     role: str,
     content: str,
 ) -> ChatMessage:
+    trace.get_current_span().set_attribute("chat.role", role)
     message = ChatMessage(session_id=session_obj.id, role=role, content=content)
     session_db.add(message)
     session_db.commit()
@@ -60,17 +101,35 @@ def record_message(
     return message
 
 
-def list_sessions(session_db: Session, user_id: str) -> List[ChatSession]:
+def list_sessions_with_last_message(
+    session_db: Session, user_id: str
+) -> List[Tuple[ChatSession, Optional[ChatMessage]]]:
+    """The user's sessions, most recently updated first, each with its latest message in the same query."""
+    last_ids = (
+        select(ChatMessage.session_id, func.max(ChatMessage.id).label("message_id"))
+        .join(ChatSession, ChatSession.id == ChatMessage.session_id)
+        .where(ChatSession.user_id == user_id)
+        .group_by(ChatMessage.session_id)
+        .subquery()
+    )
     statement = (
-        select(ChatSession)
+        select(ChatSession, ChatMessage)
+        .outerjoin(last_ids, last_ids.c.session_id == ChatSession.id)
+        .outerjoin(ChatMessage, ChatMessage.id == last_ids.c.message_id)
         .where(ChatSession.user_id == user_id)
+        .options(undefer(ChatMessage.content))
         .order_by(ChatSession.updated_at.desc())
     )
-    return list(session_db.exec(statement).all())
+    return [(chat_session, message) for chat_session, message in session_db.exec(statement).all()]
 
 
 def get_session_with_messages(session_db: Session, session_id: str, user_id: str) -> Optional[ChatSession]:
-    session_obj = session_db.get(ChatSession, session_id)
+    # Callers read every message body, so load them with the messages rather than one query each.
+    session_obj = session_db.get(
+        ChatSession,
+        session_id,
+        options=[selectinload(ChatSession.messages).undefer(ChatMessage.content)],
+    )
     if session_obj and session_obj.user_id != user_id:
         return None
     if session_obj:
@@ -78,6 +137,19 @@ def get_session_with_messages(session_db: Session, session_id: str, user_id: str
     return session_obj
 
 
+def list_recent_messages(session_db: Session, session_id: str, user_id: str, limit: int) -> List[ChatMessage]:
+    """The last ``limit`` messages of one of the user's sessions, oldest first; empty if it is not theirs."""
+    statement = (
+        select(ChatMessage)
+        .join(ChatSession, ChatSession.id == ChatMessage.session_id)
+        .where(ChatMessage.session_id == session_id, ChatSession.user_id == user_id)
+        .options(undefer(ChatMessage.content))
+        .order_by(ChatMessage.id.desc())
+        .limit(limit)
+    )
+    return list(reversed(session_db.exec(statement).all()))
+
+
 def list_messages(session_db: Session, session_id: str) -> List[ChatMessage]:
     statement = (
         select(ChatMessage)
@@ -0,0 +1,71 @@
+"""Store chat message content as codec-tagged, optionally compressed blobs
+
+Revision ID: 20261019_01
+Revises: 20251126_01
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from backend.db.compression import compress_text, decompress_text
+
+# revision identifiers, used by Alembic.
+revision: str = "20261019_01"
+down_revision: Union[str, None] = "20251126_01"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+message_table = sa.table(
+    "chatmessage",
+    sa.column("id", sa.Integer()),
+    sa.column("content", sa.Text()),
+    sa.column("content_blob", sa.LargeBinary()),
+)
+
+
+def _copy_rows(source: str, target: str, convert) -> None:
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(message_table.c.id, message_table.c[source])
+            .where(message_table.c.id > last_id)
+            .order_by(message_table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for row_id, value in rows:
+            bind.execute(
+                message_table.update()
+                .where(message_table.c.id == row_id)
+                .values({target: convert(value)})
+            )
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    op.add_column("chatmessage", sa.Column("content_blob", sa.LargeBinary(), nullable=True))
+    _copy_rows("content", "content_blob", lambda value: compress_text(value or ""))
+    with op.batch_alter_table("chatmessage") as batch_op:
+        batch_op.drop_column("content")
+        batch_op.alter_column(
+            "content_blob",
+            new_column_name="content",
+            existing_type=sa.LargeBinary(),
+            nullable=False,
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("chatmessage") as batch_op:
+        batch_op.alter_column("content", new_column_name="content_blob", existing_type=sa.LargeBinary())
+    op.add_column("chatmessage", sa.Column("content", sa.Text(), nullable=True))
+    _copy_rows("content_blob", "content", lambda value: decompress_text(value) if value is not None else "")
+    with op.batch_alter_table("chatmessage") as batch_op:
+        batch_op.drop_column("content_blob")
+        batch_op.alter_column("content", existing_type=sa.Text(), nullable=False)
@@ -2,8 +2,12 @@ from datetime import datetime, timezone
 from typing import List, Optional
 from uuid import uuid4
 
+from sqlalchemy import Column
+from sqlalchemy.orm import deferred
 from sqlmodel import Field, Relationship, SQLModel
 
+from backend.db.compression import CompressedText
+
 
 def utcnow() -> datetime:
     return datetime.now(timezone.utc)
@@ -15,6 +19,7 @@ class User(SQLModel, table=True):
     full_name: Optional[str] = None
     hashed_password: str
     is_active: bool = Field(default=True)
+    is_admin: bool = Field(default=False)
     created_at: datetime = Field(default_factory=utcnow)
 
     sessions: List["ChatSession"] = Relationship(back_populates="user")
@@ -34,11 +39,17 @@ class ChatSession(SQLModel, table=True):
     user: Optional[User] = Relationship(back_populates="sessions")
 
 
+# Deferred so rows loaded only for their role or timestamps skip fetching and inflating the blob.
+_message_content = Column("content", CompressedText(), nullable=False)
+
+
 class ChatMessage(SQLModel, table=True):
+    __mapper_args__ = {"properties": {"content": deferred(_message_content)}}
+
     id: Optional[int] = Field(default=None, primary_key=True)
     session_id: str = Field(foreign_key="chatsession.id", index=True)
     role: str = Field(index=True)
-    content: str
+    content: str = Field(sa_column=_message_content)
     created_at: datetime = Field(default_factory=utcnow)
 
     session: Optional[ChatSession] = Relationship(back_populates="messages")
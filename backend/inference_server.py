@@ -0,0 +1,227 @@
+"""Long-lived inference process serving the models to API workers over a Unix socket.
+
+Holds the chat model, language detector, translation and the diffusion pipeline
+and answers the frames described in :mod:`backend.core.inference`. Start it once
+per host, then run the API with ``INFERENCE_SOCKET`` pointing at the same path:
+HTTP workers can be scaled or restarted without reloading weights, and their GIL
+no longer competes with tokenization. Run from the repo root::
+
+    python -m backend.inference_server --socket /tmp/zgpt-inference.sock --preload chat,detector
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import select
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import threading
+
+from opentelemetry import context as otel_context
+from opentelemetry import propagate, trace
+from prometheus_client import start_http_server
+
+from backend.config.settings import get_settings
+from backend.core import image_worker, llm_handler
+from backend.core.image_profiles import GenerationProfile
+from backend.core.image_worker import ImageGenerationCancelled
+from backend.core.inference import recv_frame, send_frame
+from backend.core.observability import setup_tracer_provider
+from backend.serve import MODEL_LOADERS, preload_models
+from backend.utils import language_tools
+
+LOGGER = logging.getLogger("backend.inference_server")
+settings = get_settings()
+tracer = trace.get_tracer("backend.inference_server")
+
+# The model lives here now, so this process bounds concurrent use of it.
+_chat_slots = threading.BoundedSemaphore(settings.chat_max_concurrency)
+_image_slots = threading.BoundedSemaphore(settings.image_max_concurrency)
+
+
+class _CancelWatch:
+    """Cancel event for a call that turns set once the client sends ``cancel`` or hangs up."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self._sock = sock
+        self._set = False
+
+    def is_set(self) -> bool:
+        if not self._set and select.select([self._sock], [], [], 0)[0]:
+            # The only thing a client sends mid-call is a cancel frame (or EOF).
+            try:
+                recv_frame(self._sock)
+            except OSError:
+                pass
+            self._set = True
+        return self._set
+
+
+class _ProgressRelay(dict):
+    """Progress mapping that forwards each completed ``step``/``total`` update to the client."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        super().__init__()
+        self._sock = sock
+
+    def __setitem__(self, key, value) -> None:
+        super().__setitem__(key, value)
+        if key == "total":
+            send_frame(self._sock, {"progress": dict(self)})
+
+
+def _detect_language(sock: socket.socket, text: str) -> None:
+    send_frame(sock, {"result": language_tools.detect_language(text)})
+
+
+def _translate_text(sock: socket.socket, text: str, from_lang: str, to_lang: str) -> None:
+    send_frame(sock, {"result": language_tools.translate_text(text, from_lang=from_lang, to_lang=to_lang)})
+
+
+def _generate_reply(sock: socket.socket, prompt: str, history, max_new_tokens: int, temperature: float) -> None:
+    with _chat_slots:
+        reply = llm_handler.generate_reply(
+            prompt, history, max_new_tokens, temperature, cancel_event=_CancelWatch(sock)
+        )
+    send_frame(sock, {"result": reply})
+
+
+def _stream_reply(sock: socket.socket, prompt: str, history, max_new_tokens: int, temperature: float) -> None:
+    with _chat_slots:
+        stream = llm_handler.stream_reply(
+            prompt, history, max_new_tokens, temperature, cancel_event=_CancelWatch(sock)
+        )
+        try:
+            for chunk in stream:
+                send_frame(sock, {"chunk": chunk})
+        finally:
+            stream.close()
+    send_frame(sock, {"result": None})
+
+
+def _render_png_batch(sock: socket.socket, prompts, profile, negative_prompts, seeds, progress: bool) -> None:
+    trackers = None
+    if progress:
+        # Batched prompts share one schedule, so a single relay reports for all of them.
+        trackers = [_ProgressRelay(sock)] + [None] * (len(prompts) - 1)
+    with _image_slots:
+        images = image_worker.render_png_batch(
+            prompts,
+            GenerationProfile.from_dict(profile),
+            trackers,
+            negative_prompts,
+            seeds,
+            cancel_event=_CancelWatch(sock),
+        )
+    send_frame(sock, {"result": [len(image) for image in images]}, b"".join(images))
+
+
+_METHODS = {
+    "detect_language": _detect_language,
+    "translate_text": _translate_text,
+    "generate_reply": _generate_reply,
+    "stream_reply": _stream_reply,
+    "render_png_batch": _render_png_batch,
+}
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Serves one client connection, one call at a time, until the client hangs up."""
+
+    def handle(self) -> None:
+        sock = self.request
+        while True:
+            try:
+                frame = recv_frame(sock)
+                if frame is None:
+                    return
+                self._serve(sock, frame[0])
+            except ConnectionError:
+                return
+
+    @staticmethod
+    def _serve(sock: socket.socket, message: dict) -> None:
+        method = message.get("method")
+        handler = _METHODS.get(method)
+        if handler is None:
+            send_frame(sock, {"error": f"Unknown inference method {method!r}"})
+            return
+        send_frame(sock, {"accepted": True})
+        # Continue the caller's trace so model spans nest under the API request.
+        token = otel_context.attach(propagate.extract(message.get("trace") or {}))
+        try:
+            with tracer.start_as_current_span(f"inference.{method}", record_exception=False):
+                handler(sock, **(message.get("args") or {}))
+        except ConnectionError:
+            raise
+        except ImageGenerationCancelled as exc:
+            send_frame(sock, {"error": str(exc), "kind": "cancelled"})
+        except Exception as exc:
+            LOGGER.exception("Inference call %s failed", method)
+            send_frame(sock, {"error": str(exc) or type(exc).__name__})
+        finally:
+            otel_context.detach(token)
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _remove_stale_socket(path: str) -> None:
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default=settings.inference_socket or None, help="defaults to INFERENCE_SOCKET")
+    parser.add_argument(
+        "--preload",
+        default="chat,detector",
+        help=f"comma-separated models to load before accepting calls: {', '.join(MODEL_LOADERS)}",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="serve this process's model metrics for Prometheus on this port",
+    )
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    if not args.socket:
+        parser.error("--socket or INFERENCE_SOCKET is required")
+    models = [name for name in args.preload.split(",") if name]
+    unknown = set(models) - set(MODEL_LOADERS)
+    if unknown:
+        parser.error(f"unknown models: {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=args.log_level.upper())
+    tracer_provider = setup_tracer_provider(settings)
+    if args.metrics_port is not None:
+        start_http_server(args.metrics_port)
+    preload_models(models)
+    _remove_stale_socket(args.socket)
+    server = InferenceServer(args.socket, _Handler)
+    os.chmod(args.socket, 0o660)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    LOGGER.info("Inference server listening on %s", args.socket)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        _remove_stale_socket(args.socket)
+        if tracer_provider is not None:
+            tracer_provider.shutdown()
+
+
+if __name__ == "__main__":
+    main()
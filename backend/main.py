@@ -1,53 +1,24 @@
 from contextlib import asynccontextmanager
-import logging
-import time
-import uuid
 
-from fastapi import APIRouter, FastAPI, Request
+from fastapi import APIRouter, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 from redis import asyncio as redis
-from starlette.middleware.base import BaseHTTPMiddleware
 
-from backend.api import auth, chat, image, translate
+from backend.api import admin, auth, chat, image, translate
 from backend.config.settings import get_settings
-from backend.core.logging_utils import request_id_ctx_var, setup_logging
+from backend.core.logging_utils import setup_logging
+from backend.core.image_jobs import image_jobs
+from backend.core.image_worker import image_batcher, image_pool
 from backend.core.observability import setup_metrics, setup_tracing
+from backend.core.password_pool import shutdown_password_pool
 from backend.db.session import create_database
-from backend.middleware.rate_limit import RateLimitMiddleware
+from backend.middleware.rate_limit import RateLimitMiddleware, RateLimitPolicy
+from backend.middleware.request_context import RequestContextMiddleware
 from backend.middleware.security_headers import SecurityHeadersMiddleware
 
 settings = get_settings()
 setup_logging(settings.log_level)
-logger = logging.getLogger("backend.request")
-
-class RequestContextMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        request_id = str(uuid.uuid4())
-        start = time.time()
-        request.state.request_id = request_id
-        token = request_id_ctx_var.set(request_id)
-        try:
-            response = await call_next(request)
-        except Exception:
-            logging.exception("Unhandled exception")
-            response = JSONResponse(status_code=500, content={
-                "error": {"code": "internal_error", "message": "Internal Server Error"},
-                "request_id": request_id,
-            })
-        finally:
-            duration_ms = int((time.time() - start) * 1000)
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Response-Time"] = str(duration_ms)
-            logger.info(
-                "%s %s -> %s (%sms)",
-                request.method,
-                request.url.path,
-                response.status_code,
-                duration_ms,
-            )
-            request_id_ctx_var.reset(token)
-        return response
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -60,11 +31,17 @@ async def lifespan(app: FastAPI):
             decode_responses=False,
         )
         app.state.redis_client = redis_client
+    if settings.image_generation_enabled:
+        image_jobs.start()
     try:
         yield
     finally:
         if redis_client:
             await redis_client.close()
+        shutdown_password_pool()
+        image_jobs.stop()
+        image_batcher.shutdown()
+        image_pool.shutdown()
         tracer_provider = getattr(app.state, "tracer_provider", None)
         if tracer_provider:
             tracer_provider.shutdown()
@@ -91,6 +68,8 @@ app.add_middleware(
     RateLimitMiddleware,
     limit_per_minute=settings.rate_limit_per_minute,
     window_seconds=settings.rate_limit_window_seconds,
+    max_keys=settings.rate_limit_max_keys,
+    policy=RateLimitPolicy.from_settings(settings),
 )
 
 # Security headers
@@ -122,6 +101,7 @@ app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(chat.router, prefix="/chat", tags=["Chat"])
 app.include_router(image.router, prefix="/image", tags=["Image"])
 app.include_router(translate.router, prefix="/translate", tags=["Translate"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 
 
 @app.get("/")
@@ -0,0 +1,38 @@
+"""Operator commands that change stored account state.
+
+Admin rights live in the ``user.is_admin`` column rather than in configuration:
+signup is open and emails are not verified, so trusting a configured address
+would hand admin to whoever registers it first. Grant it here, to an account
+you know belongs to the right person. Run from the repo root::
+
+    python -m backend.manage grant-admin ops@example.com
+    python -m backend.manage revoke-admin ops@example.com
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+
+from sqlmodel import Session
+
+from backend.db import crud
+from backend.db.session import engine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("grant-admin", "revoke-admin"):
+        command = commands.add_parser(name)
+        command.add_argument("email")
+    args = parser.parse_args()
+
+    with Session(engine) as db:
+        user = crud.set_user_admin(db, args.email.lower(), args.command == "grant-admin")
+    if user is None:
+        sys.exit(f"No account with email {args.email}")
+    print(f"{user.email}: is_admin={user.is_admin}")
+
+
+if __name__ == "__main__":
+    main()
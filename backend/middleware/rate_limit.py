@@ -1,86 +1,291 @@
 import logging
-import secrets
+import math
+import threading
 import time
-from collections import defaultdict, deque
-from typing import Deque, Dict, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Optional, Tuple
 
-from fastapi import Request
 from redis.asyncio import Redis
-from starlette.middleware.base import BaseHTTPMiddleware
+from redis.commands.core import AsyncScript
+from starlette.requests import Request
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from backend.config.settings import Settings
+from backend.core.security import decode_token
 
 LOGGER = logging.getLogger(__name__)
 
+# Generic cell rate algorithm: one key per client holding the theoretical arrival time
+# (TAT). Requests are spaced ``emission_us`` apart with a burst allowance of
+# ``burst_us``, so up to ``limit`` requests fit in a window. Redis server time keeps
+# replicas with skewed clocks consistent. Everything is in integer microseconds, which
+# Lua's doubles hold exactly, so a request costing the whole burst is always admitted.
+GCRA_LUA = """
+local emission = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000000 + tonumber(clock[2])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+  tat = now
+end
+local new_tat = tat + emission * cost
+local allow_at = new_tat - burst
+if allow_at > now then
+  return {0, allow_at - now}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil((new_tat - now) / 1000))
+return {1, 0}
+"""
+
+
+class InMemoryRateLimiter:
+    """Process-local GCRA store mirroring ``GCRA_LUA``.
+
+    Each key holds a single integer (its theoretical arrival time) in an LRU capped at
+    ``max_keys``. Keys whose TAT has passed carry no state worth keeping and are swept
+    from the cold end of the LRU, so memory stays flat regardless of how many distinct
+    clients show up. Evicting a live key under pressure only resets that client's budget.
+
+    Times are kept in integer nanoseconds, as the Lua script keeps microseconds, so a
+    request costing the whole burst is compared exactly rather than through float
+    rounding. ``now`` and the returned retry delay are still in seconds.
+    """
+
+    def __init__(self, limit: int, window_seconds: int, max_keys: int = 100_000, sweep_every: int = 1024) -> None:
+        # Rounded down so ``limit`` emissions never exceed the burst.
+        self.emission_ns = window_seconds * 1_000_000_000 // limit
+        self.burst_ns = window_seconds * 1_000_000_000
+        self.max_keys = max_keys
+        self.sweep_every = sweep_every
+        self._tats: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+    def check(self, key: str, cost: int = 1, now: Optional[float] = None) -> Tuple[bool, float]:
+        now_ns = time.monotonic_ns() if now is None else round(now * 1_000_000_000)
+        with self._lock:
+            self._calls += 1
+            if self._calls % self.sweep_every == 0:
+                self._sweep(now_ns)
+
+            tat = max(self._tats.get(key, now_ns), now_ns)
+            new_tat = tat + self.emission_ns * cost
+            allow_at = new_tat - self.burst_ns
+            if allow_at > now_ns:
+                return False, (allow_at - now_ns) / 1_000_000_000
+
+            self._tats[key] = new_tat
+            self._tats.move_to_end(key)
+            while len(self._tats) > self.max_keys:
+                self._tats.popitem(last=False)
+            return True, 0.0
+
+    def _sweep(self, now_ns: int) -> None:
+        while self._tats:
+            key, tat = next(iter(self._tats.items()))
+            if tat > now_ns:
+                break
+            del self._tats[key]
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, limit_per_minute: int = 60, window_seconds: int = 60):
-        super().__init__(app)
+
+# Budget units charged per request. Generation endpoints cost more because one call
+# ties up the model for seconds; anything not listed costs ``default_cost``. Keys are a
+# path, or "METHOD path" when only one method on that path generates.
+DEFAULT_ROUTE_COSTS: Dict[str, int] = {
+    "/chat/": 5,
+    "/chat/stream": 5,
+    "/image/generate": 20,
+    "POST /image/jobs": 20,
+    "/translate/translate": 2,
+}
+DEFAULT_GENERATION_PATHS = frozenset({"/chat/", "/chat/stream", "/image/generate", "POST /image/jobs"})
+
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    cost: int = 1
+    concurrency_limited: bool = False
+
+
+@dataclass
+class RateLimitPolicy:
+    route_costs: Dict[str, int] = field(default_factory=dict)
+    exempt_paths: FrozenSet[str] = frozenset()
+    generation_paths: FrozenSet[str] = frozenset()
+    max_concurrent_generations: int = 0
+    default_cost: int = 1
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "RateLimitPolicy":
+        route_costs = dict(DEFAULT_ROUTE_COSTS)
+        route_costs.update(settings.rate_limit_route_costs_dict)
+        return cls(
+            route_costs=route_costs,
+            exempt_paths=frozenset({"/healthz", "/readyz", settings.metrics_endpoint}),
+            generation_paths=DEFAULT_GENERATION_PATHS,
+            max_concurrent_generations=settings.rate_limit_max_concurrent_generations,
+        )
+
+    def resolve(self, path: str, method: str = "GET") -> Optional[RoutePolicy]:
+        """Return the policy for ``method path`` or ``None`` when the path is exempt."""
+        if path in self.exempt_paths:
+            return None
+        route = f"{method} {path}"
+        generation = route in self.generation_paths or path in self.generation_paths
+        return RoutePolicy(
+            cost=self.route_costs.get(route, self.route_costs.get(path, self.default_cost)),
+            concurrency_limited=self.max_concurrent_generations > 0 and generation,
+        )
+
+
+class InFlightLimiter:
+    """Per-key cap on concurrently running generations within this process."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> bool:
+        with self._lock:
+            current = self._counts.get(key, 0)
+            if current >= self.limit:
+                return False
+            self._counts[key] = current + 1
+            return True
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            remaining = self._counts.get(key, 0) - 1
+            if remaining > 0:
+                self._counts[key] = remaining
+            else:
+                self._counts.pop(key, None)
+
+
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        limit_per_minute: int = 60,
+        window_seconds: int = 60,
+        max_keys: int = 100_000,
+        policy: Optional[RateLimitPolicy] = None,
+    ):
+        self.app = app
         self.limit_per_minute = limit_per_minute
         self.window_seconds = window_seconds
-        self.hits: Dict[str, Deque[float]] = defaultdict(deque)
+        self.policy = policy or RateLimitPolicy()
+        self.memory = InMemoryRateLimiter(limit_per_minute, window_seconds, max_keys=max_keys)
+        self.in_flight = InFlightLimiter(self.policy.max_concurrent_generations)
+        self._script: Optional[AsyncScript] = None
+        self._script_client: Optional[Redis] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self.policy.resolve(scope["path"], scope["method"])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        key = self._principal_key(request)
+        allowed, retry_after = await self._check(request, key, min(route.cost, self.limit_per_minute))
+        if not allowed:
+            await self._reject(request, retry_after)(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next):
+        if not route.concurrency_limited:
+            await self.app(scope, receive, send)
+            return
+
+        if not self.in_flight.acquire(key):
+            await self._reject(
+                request,
+                1,
+                code="too_many_concurrent",
+                message="Too many generations in progress, please wait for one to finish.",
+            )(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight.release(key)
+
+    def _principal_key(self, request: Request) -> str:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                payload = decode_token(token)
+            except Exception:
+                payload = None
+            if payload and payload.get("sub"):
+                # Shared with get_token_payload so the dependency does not decode again.
+                request.state.token = token
+                request.state.token_payload = payload
+                return f"user:{payload['sub']}"
         client_ip = request.client.host if request.client else "unknown"
-        key = f"ip:{client_ip}"
+        return f"ip:{client_ip}"
 
-        redis_client: Optional[Redis] = getattr(request.app.state, "redis_client", None)
+    async def _check(self, request: Request, key: str, cost: int) -> Tuple[bool, int]:
+        app = request.scope.get("app")
+        redis_client: Optional[Redis] = getattr(app.state, "redis_client", None) if app else None
         if redis_client:
-            result = await self._check_redis(redis_client, key)
+            result = await self._check_redis(redis_client, key, cost)
             if result is not None:
-                allowed, retry_after = result
-                if allowed:
-                    return await call_next(request)
-                return self._reject(request, retry_after)
-
-        if not self._allow_in_memory(key):
-            return self._reject(request, self.window_seconds)
-        return await call_next(request)
-
-    async def _check_redis(self, redis_client: Redis, key: str) -> Optional[Tuple[bool, int]]:
-        now_ms = int(time.time() * 1000)
-        window_ms = self.window_seconds * 1000
-        redis_key = f"zgpt:rl:{key}"
-        member = f"{now_ms}-{secrets.token_hex(2)}"
+                return result
+
+        allowed, retry_after = self.memory.check(key, cost)
+        return allowed, math.ceil(retry_after)
+
+    async def _check_redis(self, redis_client: Redis, key: str, cost: int = 1) -> Optional[Tuple[bool, int]]:
+        emission_us = self.window_seconds * 1_000_000 // self.limit_per_minute
+        burst_us = emission_us * self.limit_per_minute
         try:
-            pipeline = redis_client.pipeline()
-            pipeline.zremrangebyscore(redis_key, 0, now_ms - window_ms)
-            pipeline.zadd(redis_key, {member: now_ms})
-            pipeline.zcard(redis_key)
-            pipeline.expire(redis_key, self.window_seconds)
-            _, _, count, _ = await pipeline.execute()
+            script = self._gcra_script(redis_client)
+            allowed, retry_after_us = await script(
+                keys=[f"zgpt:rl:gcra:{key}"],
+                args=[emission_us, burst_us, cost],
+            )
         except Exception as exc:  # pragma: no cover - fallback path
             LOGGER.warning("Redis rate limiter unavailable, falling back to memory: %s", exc)
             return None
 
-        if count > self.limit_per_minute:
-            retry_after = self.window_seconds
-            try:
-                oldest = await redis_client.zrange(redis_key, 0, 0, withscores=True)
-            except Exception:
-                oldest = []
-            if oldest:
-                retry_after = max(1, int((oldest[0][1] + window_ms - now_ms) / 1000))
-            return False, retry_after
+        if not int(allowed):
+            return False, max(1, math.ceil(int(retry_after_us) / 1_000_000))
         return True, 0
 
-    def _allow_in_memory(self, key: str) -> bool:
-        now = time.time()
-        window_start = now - float(self.window_seconds)
-        dq = self.hits[key]
-        while dq and dq[0] < window_start:
-            dq.popleft()
-        if len(dq) >= self.limit_per_minute:
-            return False
-        dq.append(now)
-        return True
-
-    def _reject(self, request: Request, retry_after: int) -> JSONResponse:
+    def _gcra_script(self, redis_client: Redis) -> AsyncScript:
+        # register_script issues EVALSHA and only falls back to SCRIPT LOAD when the cache is cold.
+        if self._script is None or self._script_client is not redis_client:
+            self._script = redis_client.register_script(GCRA_LUA)
+            self._script_client = redis_client
+        return self._script
+
+    def _reject(
+        self,
+        request: Request,
+        retry_after: int,
+        *,
+        code: str = "rate_limited",
+        message: str = "Too many requests, please try again later.",
+    ) -> JSONResponse:
         return JSONResponse(
             status_code=429,
             content={
                 "error": {
-                    "code": "rate_limited",
-                    "message": "Too many requests, please try again later.",
+                    "code": code,
+                    "message": message,
                 },
                 "request_id": getattr(request.state, "request_id", None),
             },
@@ -0,0 +1,62 @@
+import logging
+import time
+import uuid
+
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.core.logging_utils import request_id_ctx_var
+
+logger = logging.getLogger("backend.request")
+
+
+class RequestContextMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = str(uuid.uuid4())
+        start = time.time()
+        scope.setdefault("state", {})["request_id"] = request_id
+        token = request_id_ctx_var.set(request_id)
+        status_code = 500
+        duration_ms = 0
+        response_started = False
+
+        async def send_with_context(message: Message) -> None:
+            nonlocal status_code, duration_ms, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                duration_ms = int((time.time() - start) * 1000)
+                message["headers"] = list(message.get("headers", []))
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                headers["X-Response-Time"] = str(duration_ms)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_context)
+        except Exception:
+            logging.exception("Unhandled exception")
+            if response_started:
+                raise
+            response = JSONResponse(status_code=500, content={
+                "error": {"code": "internal_error", "message": "Internal Server Error"},
+                "request_id": request_id,
+            })
+            await response(scope, receive, send_with_context)
+        finally:
+            logger.info(
+                "%s %s -> %s (%sms)",
+                scope["method"],
+                scope["path"],
+                status_code,
+                duration_ms,
+            )
+            request_id_ctx_var.reset(token)
@@ -1,23 +1,22 @@
 from __future__ import annotations
 
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+class SecurityHeadersMiddleware:
     """Attach opinionated security headers to every response."""
 
     def __init__(
         self,
-        app,
+        app: ASGIApp,
         *,
         csp: str | None = None,
         hsts_max_age: int = 63072000,
         include_subdomains: bool = True,
         preload: bool = True,
     ) -> None:
-        super().__init__(app)
+        self.app = app
         self.csp = csp or (
             "default-src 'self'; "
             "frame-ancestors 'none'; "
@@ -46,8 +45,17 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
             "Cross-Origin-Embedder-Policy": "require-corp",
         }
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        response = await call_next(request)
-        for header, value in self.static_headers.items():
-            response.headers.setdefault(header, value)
-        return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", []))
+                headers = MutableHeaders(scope=message)
+                for header, value in self.static_headers.items():
+                    headers.setdefault(header, value)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,206 @@
+"""Pre-fork launcher that can share model weights across worker processes.
+
+``uvicorn --workers N`` spawns fresh interpreters, so every worker loads its own
+copy of the chat model, language detector and diffusion pipeline. This launcher
+binds the socket once, optionally loads the models in the master (``--preload``)
+and then forks the workers: weight pages are shared copy-on-write, and with
+memory-mapped safetensors (``MODEL_MMAP_WEIGHTS``) they stay backed by the page
+cache. Without ``--preload`` each worker loads the models after the fork, before
+it starts accepting requests. ``--preload`` is refused for models that would land on
+a GPU (``CHAT_DEVICE=auto`` on a CUDA host, ``IMAGE_DEVICE=cuda``), because CUDA
+does not survive fork. POSIX only. Run from the repo root::
+
+    python -m backend.serve --workers 4 --preload
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+LOGGER = logging.getLogger("backend.serve")
+
+MODEL_LOADERS = ("chat", "detector", "image")
+
+
+def preload_models(names: list[str]) -> None:
+    """Load the named models into this process's module-level singletons."""
+    from backend.config.settings import get_settings
+
+    settings = get_settings()
+    for name in names:
+        started = time.perf_counter()
+        if name == "chat":
+            from backend.core import llm_handler
+
+            llm_handler._load_model()
+        elif name == "detector":
+            from backend.utils import language_tools
+
+            language_tools._lang_detect_pipeline()
+        elif name == "image":
+            if not settings.image_generation_enabled or settings.image_worker_mode != "thread":
+                continue
+            from backend.core import image_worker
+
+            image_worker._get_pipe()
+        LOGGER.info("Loaded %s model in %.1fs (pid %d)", name, time.perf_counter() - started, os.getpid())
+
+
+def resolved_device(name: str) -> str:
+    """Device ``name`` would load onto, with ``auto`` resolved the way the loaders resolve it."""
+    from backend.config.settings import get_settings
+
+    settings = get_settings()
+    if name == "chat":
+        device = settings.chat_device
+    elif name == "image":
+        device = settings.image_device
+    else:
+        return "cpu"  # the language detector pipeline is created without a device
+    if device != "auto":
+        return device
+    # Ask NVML rather than the CUDA runtime so the check itself leaves no CUDA context behind.
+    os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, args: argparse.Namespace) -> None:
+    import uvicorn
+
+    from backend.db.session import engine
+
+    # Connections opened by the master must not be shared with the children.
+    engine.dispose(close=False)
+    if "torch" in sys.modules:
+        # One intra-op thread pool per worker would oversubscribe the CPU. Thread pools do
+        # not survive fork: a child inheriting a started OpenMP pool (GNU libgomp) can hang
+        # on its first parallel op. The master therefore preloads with one thread, which
+        # never starts the pool, and each worker sizes its own here, after the fork.
+        sys.modules["torch"].set_num_threads(max(1, (os.cpu_count() or 1) // args.workers))
+    if not args.preload:
+        preload_models(args.models)
+
+    from backend.main import app
+
+    config = uvicorn.Config(app, log_level=args.log_level, proxy_headers=True, timeout_keep_alive=5)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _fork_worker(sock: socket.socket, args: argparse.Namespace) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            _run_worker(sock, args)
+        except Exception:
+            LOGGER.exception("Worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--preload", action="store_true", help="load models in the master before forking")
+    parser.add_argument(
+        "--models",
+        default="chat,detector",
+        help=f"comma-separated models to load ahead of serving: {', '.join(MODEL_LOADERS)}",
+    )
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    args.models = [name for name in args.models.split(",") if name]
+    unknown = set(args.models) - set(MODEL_LOADERS)
+    if unknown:
+        parser.error(f"unknown models: {', '.join(sorted(unknown))}")
+
+    if os.getenv("INFERENCE_SOCKET"):
+        # Models live in backend.inference_server; the HTTP workers load none.
+        args.models = []
+
+    if args.preload:
+        # CUDA cannot be used in a child forked after the parent initialised it.
+        on_gpu = {name: device for name in args.models if (device := resolved_device(name)) != "cpu"}
+        if on_gpu:
+            parser.error(
+                "--preload needs CPU models, since CUDA initialised before fork is unusable in the workers; "
+                + ", ".join(f"{name} resolves to {device}" for name, device in on_gpu.items())
+                + ". Drop --preload so each worker loads its own copy, or leave those models out of --models."
+            )
+
+    logging.basicConfig(level=args.log_level.upper())
+    sock = _bind(args.host, args.port)
+    if args.preload:
+        try:
+            import torch
+        except ImportError:
+            pass
+        else:
+            torch.set_num_threads(1)
+        preload_models(args.models)
+    import backend.main  # noqa: F401 - import the app once so workers share its pages
+    from backend.db.session import create_database
+
+    # Every worker's lifespan runs create_all; doing it once here stops them racing on a fresh DB.
+    create_database()
+
+    # Keep the collector from touching (and so copying) every preloaded object in each child.
+    gc.collect()
+    gc.freeze()
+
+    stopping = False
+    workers = {_fork_worker(sock, args) for _ in range(args.workers)}
+    LOGGER.info("Serving on %s:%d with %d workers (preload=%s)", args.host, args.port, args.workers, args.preload)
+
+    def _stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            LOGGER.warning("Worker %d exited with status %d; restarting", pid, status)
+            time.sleep(1)
+            workers.add(_fork_worker(sock, args))
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ os.environ.setdefault("IMAGE_ENABLED", "false")
 os.environ.setdefault("CHAT_DEVICE", "cpu")
 os.environ.setdefault("CHAT_PRECISION", "float32")
 os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "1000")
 
 
 @pytest.fixture(scope="session")
@@ -57,3 +58,25 @@ def client(test_app, monkeypatch):
     tokens = resp.json()
     client.headers.update({"Authorization": f"Bearer {tokens['access_token']}"})
     return client
+
+
+_SPAN_EXPORTER = None
+
+
+@pytest.fixture()
+def span_exporter():
+    """In-memory exporter behind the global tracer provider, cleared for each test."""
+    global _SPAN_EXPORTER
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    if _SPAN_EXPORTER is None:
+        # The global provider can only be set once per process.
+        _SPAN_EXPORTER = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(_SPAN_EXPORTER))
+        trace.set_tracer_provider(provider)
+    _SPAN_EXPORTER.clear()
+    return _SPAN_EXPORTER
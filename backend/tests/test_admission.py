@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.core.admission import AdmissionController, AdmissionRejected, Priority
+
+
+def test_rejects_when_queue_is_full():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=0, queue_timeout=1)
+    slot = controller.acquire()
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.acquire()
+    assert excinfo.value.reason == "queue_full"
+    slot.release()
+    controller.acquire().release()
+    assert controller.in_flight == 0
+
+
+def test_queued_caller_times_out():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=1, queue_timeout=0.05)
+    slot = controller.acquire()
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.acquire()
+    assert excinfo.value.reason == "timeout"
+    assert controller.queued == 0
+    slot.release()
+
+
+def test_higher_priority_waiters_are_admitted_first():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=4, queue_timeout=5)
+    holder = controller.acquire()
+    order = []
+
+    def worker(name, priority):
+        with controller.slot(priority):
+            order.append(name)
+
+    batch = threading.Thread(target=worker, args=("batch", Priority.BATCH))
+    batch.start()
+    while controller.queued < 1:
+        time.sleep(0.001)
+    interactive = threading.Thread(target=worker, args=("interactive", Priority.INTERACTIVE))
+    interactive.start()
+    while controller.queued < 2:
+        time.sleep(0.001)
+
+    holder.release()
+    batch.join()
+    interactive.join()
+    assert order == ["interactive", "batch"]
+
+
+def test_async_waiter_receives_released_slot():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=1, queue_timeout=5)
+
+    async def scenario():
+        holder = await controller.acquire_async()
+        waiter = asyncio.create_task(controller.acquire_async())
+        await asyncio.sleep(0.01)
+        assert controller.queued == 1
+        holder.release()
+        slot = await waiter
+        assert controller.in_flight == 1
+        slot.release()
+        slot.release()  # idempotent
+
+    asyncio.run(scenario())
+    assert controller.in_flight == 0
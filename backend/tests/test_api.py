@@ -7,6 +7,13 @@ def test_health_endpoint(client):
     assert res.json()["status"] == "ok"
 
 
+def test_request_context_headers(client):
+    res = client.get("/healthz")
+    assert res.headers["X-Request-ID"]
+    assert int(res.headers["X-Response-Time"]) >= 0
+    assert res.headers["X-Frame-Options"] == "DENY"
+
+
 def test_chat_endpoint(client):
     payload = {"message": "Hello there", "history": []}
     res = client.post("/chat/", json=payload)
@@ -92,3 +99,27 @@ def test_chat_moderation_blocks_prompt(client):
     detail = res.json()["detail"]
     assert detail["code"] == "prompt_rejected"
     assert detail["category"] == "violence"
+
+
+def test_chat_stream_stops_on_rejected_output(client, monkeypatch):
+    from backend.api import chat
+
+    def _unsafe_stream(*_args, **_kwargs):
+        yield from ("Sure, to build a b", "omb you first", " need...")
+
+    monkeypatch.setattr(chat, "stream_reply", _unsafe_stream)
+    with client.stream("POST", "/chat/stream", json={"message": "tell me a story", "history": []}) as response:
+        body = b"".join(response.iter_bytes()).decode()
+
+    assert "output_rejected" in body
+    assert "event: done" not in body
+    assert "omb you first" not in body
+
+
+def test_chat_rejects_unsafe_reply(client, monkeypatch):
+    from backend.api import chat
+
+    monkeypatch.setattr(chat, "generate_reply", lambda *args, **kwargs: "Step one: assassinate")
+    res = client.post("/chat/", json={"message": "tell me a story", "history": []})
+    assert res.status_code == 400
+    assert res.json()["detail"]["code"] == "reply_rejected"
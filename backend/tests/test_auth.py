@@ -25,3 +25,57 @@ def test_refresh_token(client):
     refreshed = client.post("/auth/refresh", json={"refresh_token": refresh_token})
     assert refreshed.status_code == 200
     assert refreshed.json()["access_token"]
+
+
+def test_authenticated_user_is_served_from_principal_cache(client, monkeypatch):
+    from backend.core import dependencies
+
+    payload = {"email": "cached@example.com", "password": "Password123"}
+    tokens = client.post("/auth/signup", json=payload).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    def _no_db(*_args, **_kwargs):
+        raise AssertionError("principal cache miss")
+
+    monkeypatch.setattr(dependencies.crud, "get_user", _no_db)
+    me = client.get("/auth/me", headers=headers)
+    assert me.status_code == 200
+    assert me.json()["email"] == payload["email"]
+
+
+def test_deactivated_user_is_evicted_from_principal_cache(client):
+    from backend.db import crud
+    from backend.db.session import engine
+    from sqlmodel import Session
+
+    payload = {"email": "deactivated@example.com", "password": "Password123"}
+    tokens = client.post("/auth/signup", json=payload).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+
+    with Session(engine) as db:
+        crud.set_user_active(db, user_id, False)
+
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_login_rehashes_password_with_outdated_cost_factor(client):
+    from passlib.context import CryptContext
+    from sqlmodel import Session
+
+    from backend.core.security import settings as security_settings
+    from backend.db import crud
+    from backend.db.session import engine
+
+    legacy_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("Password123")
+    with Session(engine) as db:
+        crud.create_user(db, email="legacy@example.com", full_name=None, hashed_password=legacy_hash)
+
+    login = client.post("/auth/login", json={"email": "legacy@example.com", "password": "Password123"})
+    assert login.status_code == 200
+
+    with Session(engine) as db:
+        stored = crud.get_user_by_email(db, "legacy@example.com").hashed_password
+    assert stored != legacy_hash
+    assert stored.startswith(f"$2b${security_settings.bcrypt_rounds:02d}$")
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import threading
+import time
+
+from backend.core.admission import chat_admission
+
+
+def _endless_stream(cancelled):
+    def _stream(prompt, history=None, max_new_tokens=300, temperature=0.7, cancel_event=None):
+        for index in range(500):
+            if cancel_event.is_set():
+                cancelled.set()
+                return
+            yield f"w{index} "
+            time.sleep(0.01)
+
+    return _stream
+
+
+def test_generation_stops_when_the_client_disconnects(monkeypatch):
+    from backend.api import chat
+
+    def _generate(prompt, history=None, cancel_event=None):
+        assert cancel_event.wait(5)
+        return "partial reply"
+
+    class _GoneRequest:
+        async def is_disconnected(self):
+            return True
+
+    monkeypatch.setattr(chat, "_DISCONNECT_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(chat, "generate_reply", _generate)
+
+    reply, cancelled = asyncio.run(chat._generate_until_disconnect(_GoneRequest(), "hi", []))
+
+    assert (reply, cancelled) == ("partial reply", True)
+
+
+def test_stream_disconnect_cancels_generation_and_keeps_partial_reply(client, test_app, monkeypatch):
+    from backend.api import chat
+
+    cancelled = threading.Event()
+    monkeypatch.setattr(chat, "stream_reply", _endless_stream(cancelled))
+    message = "write forever then get cut off"
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/chat/stream",
+        "raw_path": b"/chat/stream",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"authorization", client.headers["Authorization"].encode()),
+        ],
+        "client": ("127.0.0.1", 5000),
+        "server": ("testserver", 80),
+    }
+    body = json.dumps({"message": message}).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    delivered = []
+
+    async def send(event):
+        # The first event gets through; the client hangs up on the second.
+        if event["type"] == "http.response.body" and b"event: message" in event.get("body", b""):
+            if delivered:
+                raise OSError("connection reset")
+            delivered.append(event["body"].decode())
+
+    async def run():
+        try:
+            await test_app(scope, receive, send)
+        except Exception:  # ClientDisconnect surfaces from the response
+            pass
+
+    asyncio.run(run())
+
+    assert cancelled.wait(5)
+    assert chat_admission.in_flight == 0
+    session = next(s for s in client.get("/chat/sessions").json() if s["title"] == message[:60])
+    messages = client.get(f"/chat/sessions/{session['id']}").json()["messages"]
+    assert [m["role"] for m in messages] == ["user", "assistant"]
+    # Only the text the client actually received is kept, not what was generated after it.
+    assert delivered == ["event: message\ndata: w0 \n\n"]
+    assert messages[-1]["content"] == "w0"
@@ -0,0 +1,129 @@
+import threading
+
+import pytest
+
+from backend.core import image_worker
+from backend.core.admission import AdmissionRejected, image_admission
+from backend.core.image_cache import CachedImageRenderer, ImageCache, cache_key, image_renderer
+from backend.core.image_profiles import PROFILES
+from backend.core.image_worker import ImageBatcher, ImageGenerationCancelled, ImageWorkerPool
+
+
+@pytest.fixture()
+def renderer(monkeypatch, tmp_path):
+    calls = []
+    release = threading.Event()
+
+    def _fake_batch(prompts, profile, progress=None, negative_prompts=None, seeds=None, *, cancel_event=None):
+        calls.append(list(zip(prompts, seeds)))
+        assert release.wait(5)
+        if cancel_event.is_set():
+            raise ImageGenerationCancelled("cancelled")
+        return [f"{prompt}#{seed}".encode() for prompt, seed in zip(prompts, seeds)]
+
+    monkeypatch.setattr(image_worker, "render_png_batch", _fake_batch)
+    pool = ImageWorkerPool("thread", workers=1)
+    batcher = ImageBatcher(pool, max_batch=1, window=0)
+    cached = CachedImageRenderer(batcher, ImageCache(tmp_path, 1024), model="sd-test")
+    cached.calls = calls
+    cached.release = release
+    yield cached
+    release.set()
+    batcher.shutdown()
+    pool.shutdown()
+
+
+def test_identical_requests_share_one_render_then_hit_the_cache(renderer):
+    profile = PROFILES["draft"]
+    first, _ = renderer.submit("moon", profile, seed=7)
+    second, _ = renderer.submit("moon", profile, seed=7)
+    renderer.release.set()
+
+    assert first.result(5) == second.result(5) == b"moon#7"
+    assert renderer.calls == [[("moon", 7)]]
+
+    cached, _ = renderer.submit("moon", profile, seed=7)
+    assert cached.done() and cached.result() == b"moon#7"
+    other_seed, _ = renderer.submit("moon", profile, seed=8)
+    assert other_seed.result(5) == b"moon#8"
+    assert len(renderer.calls) == 2
+
+
+def test_one_sharer_cancelling_does_not_abort_the_others(renderer):
+    profile = PROFILES["draft"]
+    leaver, leaver_cancel = renderer.submit("sun", profile, seed=1)
+    stayer, _ = renderer.submit("sun", profile, seed=1)
+    leaver_cancel.set()
+    leaver.cancel()
+    renderer.release.set()
+
+    assert stayer.result(5) == b"sun#1"
+
+
+def test_on_done_waits_for_the_shared_render_not_the_leaving_caller(renderer):
+    profile = PROFILES["draft"]
+    released = []
+    leaver, leaver_cancel = renderer.submit("star", profile, seed=2, on_done=lambda: released.append("leaver"))
+    stayer, _ = renderer.submit("star", profile, seed=2, on_done=lambda: released.append("stayer"))
+    leaver_cancel.set()
+    leaver.cancel()
+    assert released == []
+
+    renderer.release.set()
+    assert stayer.result(5) == b"star#2"
+    assert sorted(released) == ["leaver", "stayer"]
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", b"cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert len(ImageCache(tmp_path, max_bytes=10)) == 2
+
+
+def test_cache_key_covers_every_generation_parameter():
+    base = cache_key("sd", "moon", None, 1, PROFILES["draft"])
+    assert base == cache_key("sd", "moon", "", 1, PROFILES["draft"])
+    assert base != cache_key("sd", "moon", "blurry", 1, PROFILES["draft"])
+    assert base != cache_key("sd", "moon", None, 2, PROFILES["draft"])
+    assert base != cache_key("sd", "moon", None, 1, PROFILES["standard"])
+    assert base != cache_key("sd2", "moon", None, 1, PROFILES["draft"])
+
+
+def test_unseeded_renders_are_neither_shared_nor_cached(renderer):
+    profile = PROFILES["draft"]
+    first, _ = renderer.submit("moon", profile, seed=7, cacheable=False)
+    second, _ = renderer.submit("moon", profile, seed=7, cacheable=False)
+    renderer.release.set()
+
+    assert first.result(5) == second.result(5) == b"moon#7"
+    assert len(renderer.calls) == 2
+    assert len(renderer.cache) == 0
+
+
+def test_generate_serves_cache_hits_without_admission(client, monkeypatch, tmp_path):
+    from backend.api import image
+
+    def _fake_render(prompts, profile, progress=None, negative_prompts=None, seeds=None, *, cancel_event=None):
+        return [f"{prompt}#{seed}".encode() for prompt, seed in zip(prompts, seeds)]
+
+    monkeypatch.setattr(image.settings, "image_generation_enabled", True)
+    monkeypatch.setattr(image_worker, "render_png_batch", _fake_render)
+    monkeypatch.setattr(image_renderer, "cache", ImageCache(tmp_path, 1024 * 1024))
+
+    seeded = client.post("/image/generate", json={"prompt": "moon", "seed": 7})
+    assert seeded.status_code == 200
+
+    async def _busy(priority):
+        raise AdmissionRejected("image", "queue_full")
+
+    monkeypatch.setattr(image_admission, "acquire_async", _busy)
+    again = client.post("/image/generate", json={"prompt": "moon", "seed": 7})
+    assert again.status_code == 200
+    assert again.json() == seeded.json()
+    assert client.post("/image/generate", json={"prompt": "moon"}).status_code == 503
@@ -0,0 +1,98 @@
+import time
+from io import BytesIO
+
+import pytest
+
+from backend.core import image_worker
+from backend.core.image_cache import ImageCache, image_renderer
+from backend.core.image_encoding import encode_image, negotiate_format
+
+
+def _png() -> bytes:
+    from PIL import Image
+
+    buffered = BytesIO()
+    Image.new("RGB", (16, 16), (200, 80, 40)).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+@pytest.fixture()
+def render_client(client, monkeypatch, tmp_path):
+    from backend.api import image
+
+    png = _png()
+
+    def _fake_render(prompts, profile, progress=None, negative_prompts=None, seeds=None, *, cancel_event=None):
+        return [png for _ in prompts]
+
+    monkeypatch.setattr(image.settings, "image_generation_enabled", True)
+    monkeypatch.setattr(image_worker, "render_png_batch", _fake_render)
+    monkeypatch.setattr(image_renderer, "cache", ImageCache(tmp_path, 1024 * 1024))
+    return client
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        (None, None),
+        ("*/*", None),
+        ("application/json", None),
+        ("image/webp,image/png;q=0.9", "webp"),
+        ("image/png;q=0.5, image/jpeg", "jpeg"),
+        ("image/*", "png"),
+        ("image/webp;q=0, application/json", None),
+    ],
+)
+def test_negotiate_format(accept, expected):
+    assert negotiate_format(accept) == expected
+
+
+def test_encode_image_transcodes_lossy_formats():
+    png = _png()
+    assert encode_image(png, "png", 80) is png
+    assert encode_image(png, "webp", 80)[8:12] == b"WEBP"
+    assert encode_image(png, "jpeg", 80)[:3] == b"\xff\xd8\xff"
+
+
+def test_generate_keeps_base64_json_by_default(render_client):
+    res = render_client.post("/image/generate", json={"prompt": "a red square"})
+    assert res.status_code == 200
+    assert set(res.json()) == {"image_base64", "seed"}
+
+
+def test_generate_returns_binary_without_conditional_handling(render_client):
+    res = render_client.post(
+        "/image/generate?quality=60",
+        json={"prompt": "a red square", "seed": 3},
+        headers={"Accept": "image/webp", "If-None-Match": "*"},
+    )
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "image/webp"
+    assert res.headers["X-Image-Seed"] == "3"
+    assert "ETag" not in res.headers
+    assert res.content[8:12] == b"WEBP"
+
+
+def test_job_result_negotiates_format_with_per_format_etags(render_client, monkeypatch, tmp_path):
+    from backend.core.image_jobs import image_jobs
+
+    monkeypatch.setattr(image_jobs, "results_dir", tmp_path)
+    job = render_client.post("/image/jobs", json={"prompt": "a red square", "seed": 4}).json()
+    deadline = time.time() + 5
+    while render_client.get(job["status_url"]).json()["status"] != "succeeded" and time.time() < deadline:
+        time.sleep(0.05)
+
+    png = render_client.get(job["result_url"])
+    jpeg = render_client.get(job["result_url"], headers={"Accept": "image/jpeg"})
+    assert png.headers["content-type"] == "image/png"
+    assert jpeg.headers["content-type"] == "image/jpeg"
+    assert jpeg.content[:3] == b"\xff\xd8\xff"
+    assert "Accept" in png.headers["Vary"] and "Accept" in jpeg.headers["Vary"]
+    assert png.headers["ETag"] != jpeg.headers["ETag"]
+
+    revalidated = render_client.get(
+        job["result_url"], headers={"Accept": "image/jpeg", "If-None-Match": jpeg.headers["ETag"]}
+    )
+    assert revalidated.status_code == 304
+    stale = render_client.get(job["result_url"], headers={"Accept": "image/jpeg", "If-None-Match": png.headers["ETag"]})
+    assert stale.status_code == 200
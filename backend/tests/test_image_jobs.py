@@ -0,0 +1,111 @@
+import os
+import time
+
+import pytest
+
+from backend.core import image_jobs as image_jobs_module
+from backend.core import image_worker
+from backend.core.image_cache import ImageCache, image_renderer
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\nstub"
+
+
+@pytest.fixture()
+def image_client(client, monkeypatch, tmp_path):
+    from backend.api import image
+
+    def _fake_render(prompts, profile, progress=None, negative_prompts=None, seeds=None, *, cancel_event=None):
+        for tracker in progress or ():
+            if tracker is not None:
+                tracker["step"] = 2
+                tracker["total"] = 2
+        return [PNG_BYTES for _ in prompts]
+
+    monkeypatch.setattr(image.settings, "image_generation_enabled", True)
+    monkeypatch.setattr(image_worker, "render_png_batch", _fake_render)
+    monkeypatch.setattr(image_jobs_module.image_jobs, "results_dir", tmp_path)
+    monkeypatch.setattr(image_renderer, "cache", ImageCache(tmp_path / "cache", 1024 * 1024))
+    return client
+
+
+def _wait_for(client, url, status, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        body = client.get(url).json()
+        if body["status"] == status:
+            return body
+        time.sleep(0.05)
+    raise AssertionError(f"job did not reach {status}: {body}")
+
+
+def test_image_job_lifecycle(image_client):
+    res = image_client.post("/image/jobs", json={"prompt": "a crescent moon"})
+    assert res.status_code == 202
+    job = res.json()
+    assert job["status"] in {"queued", "running", "succeeded"}
+    assert job["profile"] == "standard"
+    assert isinstance(job["seed"], int)
+
+    done = _wait_for(image_client, job["status_url"], "succeeded")
+    assert done["step"] == done["total_steps"] == 2
+
+    result = image_client.get(job["result_url"])
+    assert result.status_code == 200
+    assert result.headers["content-type"] == "image/png"
+    assert result.content == PNG_BYTES
+    assert image_client.get(job["result_url"], headers={"If-None-Match": result.headers["ETag"]}).status_code == 304
+
+    with image_client.stream("GET", job["events_url"]) as events:
+        body = b"".join(events.iter_bytes())
+    assert b"event: done" in body
+
+
+def test_image_job_is_private_to_its_owner(image_client):
+    job = image_client.post("/image/jobs", json={"prompt": "private"}).json()
+    other = image_client.post("/auth/signup", json={"email": "other-img@example.com", "password": "Password123"})
+    headers = {"Authorization": f"Bearer {other.json()['access_token']}"}
+    assert image_client.get(job["status_url"], headers=headers).status_code == 404
+
+
+def test_image_job_rejects_over_budget_overrides(image_client):
+    res = image_client.post("/image/jobs", json={"prompt": "x", "profile": "draft", "steps": 40, "size": 512})
+    assert res.status_code == 422
+    assert "budget" in res.json()["detail"]
+
+
+def test_sweep_forgets_expired_jobs_and_their_results(image_client, monkeypatch):
+    jobs = image_jobs_module.image_jobs
+    job = image_client.post("/image/jobs", json={"prompt": "an old moon"}).json()
+    _wait_for(image_client, job["status_url"], "succeeded")
+    fresh = image_client.post("/image/jobs", json={"prompt": "a new moon"}).json()
+    _wait_for(image_client, fresh["status_url"], "succeeded")
+
+    old_path = jobs.result_path(job["job_id"])
+    stale = time.time() - jobs.ttl_seconds - 60
+    os.utime(old_path, (stale, stale))
+    jobs.store.update(job["job_id"], finished_at="2000-01-01T00:00:00+00:00")
+
+    assert jobs.sweep() == 1
+    assert not old_path.exists()
+    assert image_client.get(job["status_url"]).status_code == 404
+    assert image_client.get(fresh["result_url"]).status_code == 200
+
+
+def test_started_dispatchers_consume_jobs_queued_elsewhere(image_client, tmp_path):
+    from backend.core.image_profiles import PROFILES
+
+    # A store shared with a replica that took the POST; this one never called submit().
+    store = image_jobs_module.LocalImageJobStore(max_queue=4, ttl_seconds=60)
+    jobs = image_jobs_module.ImageJobQueue(store, image_renderer, tmp_path, dispatchers=1, ttl_seconds=60)
+    store.create({"id": "remote", "prompt": "a distant moon", "seed": 7, "profile": PROFILES["draft"].to_dict()})
+    store.enqueue("remote")
+
+    jobs.start()
+    try:
+        deadline = time.time() + 5
+        while store.get("remote").get("status") != "succeeded" and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        jobs.stop()
+    assert store.get("remote")["status"] == "succeeded"
+    assert jobs.result_path("remote").read_bytes() == PNG_BYTES
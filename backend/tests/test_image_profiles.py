@@ -0,0 +1,33 @@
+import pytest
+
+from backend.core.image_profiles import PROFILES, ImageProfileError, resolve_profile
+
+
+def test_falls_back_to_the_server_default():
+    assert resolve_profile(None, "draft") == PROFILES["draft"]
+    assert resolve_profile("Quality", "draft") == PROFILES["quality"]
+
+
+def test_overrides_within_budget_are_applied():
+    profile = resolve_profile("standard", "draft", steps=10, size=640)
+    assert (profile.name, profile.steps, profile.size) == ("standard", 10, 640)
+    assert profile.scheduler == PROFILES["standard"].scheduler
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"steps": 60},
+        {"size": 500},
+        {"size": 2048},
+        {"steps": 0},
+    ],
+)
+def test_rejects_invalid_or_over_budget_overrides(kwargs):
+    with pytest.raises(ImageProfileError):
+        resolve_profile("standard", "standard", **kwargs)
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ImageProfileError):
+        resolve_profile("ultra", "standard")
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+from dataclasses import replace
+
+import pytest
+
+from backend.core import image_worker
+from backend.core.image_profiles import PROFILES
+from backend.core.image_worker import ImageBatcher, ImageGenerationCancelled, ImageWorkerPool
+
+
+def _echo(value, cancel_event=None):
+    return f"rendered {value} on {threading.current_thread().name}"
+
+
+def _wait_for_cancel(started, cancel_event=None):
+    started.set()
+    assert cancel_event.wait(5)
+    raise ImageGenerationCancelled("cancelled")
+
+
+def test_runs_job_off_the_event_loop():
+    pool = ImageWorkerPool("thread", workers=1)
+    released = threading.Event()
+
+    result = asyncio.run(pool.run(_echo, "cat", on_done=released.set))
+
+    assert result.startswith("rendered cat on image-worker")
+    assert released.wait(1)
+    pool.shutdown()
+
+
+def test_disconnect_sets_cancel_event_and_releases_after_worker_exits():
+    pool = ImageWorkerPool("thread", workers=1)
+    started = threading.Event()
+    released = threading.Event()
+
+    async def disconnected():
+        return started.is_set()
+
+    with pytest.raises(ImageGenerationCancelled):
+        asyncio.run(pool.run(_wait_for_cancel, started, is_disconnected=disconnected, on_done=released.set))
+
+    assert released.wait(5)
+    pool.shutdown()
+
+
+def test_batcher_groups_compatible_prompts(monkeypatch):
+    calls = []
+
+    def _fake_batch(prompts, profile, progress=None, negative_prompts=None, seeds=None, *, cancel_event=None):
+        calls.append((list(prompts), profile.name))
+        return [f"{prompt}@{profile.name}".encode() for prompt in prompts]
+
+    monkeypatch.setattr(image_worker, "render_png_batch", _fake_batch)
+    pool = ImageWorkerPool("thread", workers=1)
+    batcher = ImageBatcher(pool, max_batch=4, window=0.2)
+
+    futures = [batcher.submit(prompt, PROFILES["draft"])[0] for prompt in ("fox", "owl", "elk")]
+    odd_one_out, _ = batcher.submit("bat", PROFILES["quality"])
+
+    assert [future.result(5) for future in futures] == [b"fox@draft", b"owl@draft", b"elk@draft"]
+    assert odd_one_out.result(5) == b"bat@quality"
+    assert calls == [(["fox", "owl", "elk"], "draft"), (["bat"], "quality")]
+    batcher.shutdown()
+    pool.shutdown()
+
+
+def test_batch_is_interrupted_only_when_every_member_cancels(monkeypatch):
+    started = threading.Event()
+
+    def _blocking_batch(prompts, profile, progress=None, negative_prompts=None, seeds=None, *, cancel_event=None):
+        started.set()
+        assert cancel_event.wait(5)
+        raise ImageGenerationCancelled("cancelled")
+
+    monkeypatch.setattr(image_worker, "render_png_batch", _blocking_batch)
+    pool = ImageWorkerPool("thread", workers=1)
+    batcher = ImageBatcher(pool, max_batch=2, window=0.2)
+
+    first, first_cancel = batcher.submit("a", PROFILES["draft"])
+    second, second_cancel = batcher.submit("b", PROFILES["draft"])
+    assert started.wait(5)
+    first_cancel.set()
+    assert not second.done()
+    second_cancel.set()
+
+    with pytest.raises(ImageGenerationCancelled):
+        first.result(5)
+    batcher.shutdown()
+    pool.shutdown()
+
+
+class _FakeVae:
+    def __init__(self):
+        self.weights = object()
+        self.use_slicing = False
+        self.use_tiling = False
+
+    def enable_slicing(self):
+        self.use_slicing = True
+
+    def enable_tiling(self):
+        self.use_tiling = True
+
+
+class _FakeScheduler:
+    config = {}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+
+class _FakePipe:
+    def __init__(self, vae, scheduler):
+        self.vae = vae
+        self.scheduler = scheduler
+
+    @property
+    def components(self):
+        return {"vae": self.vae, "scheduler": self.scheduler}
+
+    def set_progress_bar_config(self, **_kwargs):
+        pass
+
+
+def test_profile_pipes_configure_their_own_vae_once(monkeypatch):
+    base = _FakePipe(_FakeVae(), _FakeScheduler())
+    monkeypatch.setattr(image_worker, "_get_pipe", lambda: base)
+    monkeypatch.setattr(image_worker, "_variant_pipes", {})
+    tiled = replace(PROFILES["quality"], vae_tiling=True)
+    plain = replace(PROFILES["quality"], vae_tiling=False)
+
+    tiled_pipe = image_worker._get_profile_pipe(tiled)
+
+    assert image_worker._get_profile_pipe(tiled) is tiled_pipe
+    assert image_worker._get_profile_pipe(plain) is base
+    assert tiled_pipe.vae.use_tiling and not base.vae.use_tiling
+    assert tiled_pipe.vae.weights is base.vae.weights
+    assert tiled_pipe.scheduler is not base.scheduler
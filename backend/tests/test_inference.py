@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+
+from backend import inference_server
+from backend.core import image_worker, inference, llm_handler
+from backend.core.image_profiles import PROFILES
+from backend.core.image_worker import ImageGenerationCancelled
+from backend.core.inference import InferenceClient, InferenceError
+from backend.utils import language_tools
+
+
+@pytest.fixture()
+def server(tmp_path, monkeypatch):
+    def _fake_stream(prompt, history=None, max_new_tokens=300, temperature=0.7, cancel_event=None):
+        yield from ("hello ", "from ", prompt)
+
+    def _fake_generate(prompt, history=None, max_new_tokens=300, temperature=0.7, cancel_event=None):
+        if prompt == "boom":
+            raise RuntimeError("LLM inference failed: boom")
+        if prompt == "slow":
+            deadline = time.monotonic() + 5
+            while not cancel_event.is_set():
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            return "partial"
+        return f"{prompt} after {len(history or [])} turns"
+
+    monkeypatch.setattr(llm_handler, "generate_reply", _fake_generate)
+    monkeypatch.setattr(llm_handler, "stream_reply", _fake_stream)
+    monkeypatch.setattr(language_tools, "detect_language", lambda text: "ur")
+
+    path = str(tmp_path / "inference.sock")
+    instance = inference_server.InferenceServer(path, inference_server._Handler)
+    thread = threading.Thread(target=instance.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    instance.shutdown()
+    instance.server_close()
+
+
+def test_calls_reach_the_server_over_one_reused_connection(server):
+    client = InferenceClient(server, timeout=5)
+
+    assert client.call("detect_language", text="سلام") == "ur"
+    history = inference._plain_history([{"role": "user", "content": "hi"}])
+    assert client.call("generate_reply", prompt="ping", history=history, max_new_tokens=8, temperature=0.1) == (
+        "ping after 1 turns"
+    )
+    assert list(client.stream("stream_reply", prompt="z", history=None, max_new_tokens=8, temperature=0.1)) == [
+        "hello ", "from ", "z",
+    ]
+    assert len(client._idle) == 1
+
+
+def test_errors_surface_as_inference_errors(server, tmp_path):
+    client = InferenceClient(server, timeout=5)
+
+    with pytest.raises(InferenceError, match="boom"):
+        client.call("generate_reply", prompt="boom", history=None, max_new_tokens=8, temperature=0.1)
+    with pytest.raises(InferenceError, match="Unknown inference method"):
+        client.call("format_disk")
+    assert client.call("detect_language", text="still usable") == "ur"
+
+    with pytest.raises(InferenceError, match="unavailable"):
+        InferenceClient(str(tmp_path / "missing.sock"), timeout=1).call("detect_language", text="x")
+
+
+def test_render_relays_progress_and_images(server, monkeypatch):
+    def _fake_batch(prompts, profile, progress=None, negative_prompts=None, seeds=None, *, cancel_event=None):
+        for tracker in progress or ():
+            if tracker is not None:
+                tracker["step"] = profile.steps
+                tracker["total"] = profile.steps
+        return [f"{prompt}:{seed}".encode() for prompt, seed in zip(prompts, seeds)]
+
+    monkeypatch.setattr(image_worker, "render_png_batch", _fake_batch)
+    client = InferenceClient(server, timeout=5)
+    progress = [{}, {}]
+
+    images = client.render_png_batch(["fox", "owl"], PROFILES["draft"], progress, [None, "blur"], [1, 2])
+
+    assert images == [b"fox:1", b"owl:2"]
+    assert progress == [{"step": 12, "total": 12}] * 2
+
+
+def test_cancelled_render_interrupts_the_server(server, monkeypatch):
+    started = threading.Event()
+
+    def _slow_batch(prompts, profile, progress=None, negative_prompts=None, seeds=None, *, cancel_event=None):
+        started.set()
+        deadline = time.monotonic() + 5
+        while not cancel_event.is_set():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        raise ImageGenerationCancelled("Image generation cancelled")
+
+    monkeypatch.setattr(image_worker, "render_png_batch", _slow_batch)
+    client = InferenceClient(server, timeout=5)
+    cancel_event = threading.Event()
+    threading.Thread(target=lambda: started.wait(5) and cancel_event.set(), daemon=True).start()
+
+    with pytest.raises(ImageGenerationCancelled):
+        client.render_png_batch(["fox"], PROFILES["draft"], seeds=[1], cancel_event=cancel_event)
+    assert client._idle == []
+
+
+def test_cancelled_generation_returns_the_partial_reply(server):
+    client = InferenceClient(server, timeout=5)
+    cancel_event = threading.Event()
+    threading.Timer(0.3, cancel_event.set).start()
+
+    reply = client.call(
+        "generate_reply", cancel_event=cancel_event, prompt="slow", history=None, max_new_tokens=8, temperature=0.1
+    )
+
+    assert reply == "partial"
+    assert client._idle == []
+
+
+def test_facade_switches_to_the_socket_when_configured(server, monkeypatch):
+    assert inference.detect_language("hello") == "ur"  # in-process, same stub
+
+    monkeypatch.setattr(inference.settings, "inference_socket", server)
+    monkeypatch.setattr(inference, "_client", None)
+    monkeypatch.setattr(language_tools, "translate_text", lambda text, from_lang, to_lang: f"{text}-{to_lang}")
+
+    assert inference.translate_text("hi", from_lang="en", to_lang="ur") == "hi-ur"
+    assert list(inference.stream_reply("q")) == ["hello ", "from ", "q"]
+    assert isinstance(inference.get_client(), InferenceClient)
@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event, text
+
+from backend.db import compression
+
+
+def test_small_content_is_stored_uncompressed():
+    payload = compression.compress_text("hello", codec="zlib", min_bytes=1024)
+    assert payload == compression.CODEC_RAW + b"hello"
+    assert compression.decompress_text(payload) == "hello"
+
+
+def test_large_content_round_trips_compressed():
+    text_value = "pasted log line with some repetition\n" * 200
+    payload = compression.compress_text(text_value, codec="zlib", min_bytes=1024)
+    assert payload[:1] == compression.CODEC_ZLIB
+    assert len(payload) < len(text_value) // 4
+    assert compression.decompress_text(payload) == text_value
+
+
+def test_legacy_text_rows_are_passed_through():
+    assert compression.decompress_text("already text") == "already text"
+
+
+def test_long_messages_are_compressed_at_rest(client):
+    long_message = "please summarise this paste " * 250
+    res = client.post("/chat/", json={"message": long_message[:8000]})
+    assert res.status_code == 200
+    session_id = res.json()["session_id"]
+
+    from backend.db.session import engine
+
+    with engine.connect() as conn:
+        stored = conn.execute(
+            text("SELECT content FROM chatmessage WHERE session_id = :sid AND role = 'user'"),
+            {"sid": session_id},
+        ).scalar_one()
+    assert bytes(stored)[:1] == compression.CODEC_ZLIB
+
+    detail = client.get(f"/chat/sessions/{session_id}").json()
+    assert detail["messages"][0]["content"] == long_message[:8000]
+
+
+def test_content_is_only_decompressed_when_read(client, monkeypatch):
+    res = client.post("/chat/", json={"message": "lazy " * 400})
+    session_id = res.json()["session_id"]
+
+    from sqlmodel import Session
+
+    from backend.db import crud
+    from backend.db.session import engine
+
+    calls = []
+    real_decompress = compression.decompress_text
+    monkeypatch.setattr(compression, "decompress_text", lambda payload: calls.append(1) or real_decompress(payload))
+
+    with Session(engine) as db:
+        messages = crud.list_messages(db, session_id)
+        assert [m.role for m in messages] == ["user", "assistant"]
+        assert calls == []
+        assert messages[0].content == "lazy " * 400
+        assert calls == [1]
+
+
+
+@contextmanager
+def _statements(engine):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def test_session_list_loads_each_preview_in_the_same_query(client):
+    first = client.post("/chat/", json={"message": "first session"}).json()["session_id"]
+    client.post("/chat/", json={"message": "follow-up", "session_id": first})
+    client.post("/chat/", json={"message": "second session"})
+
+    from sqlmodel import Session
+
+    from backend.db import crud
+    from backend.db.session import engine
+
+    with Session(engine) as db:
+        user = crud.get_user_by_email(db, "tester@example.com")
+        with _statements(engine) as statements:
+            rows = crud.list_sessions_with_last_message(db, user.id)
+            previews = {chat_session.title: message.content for chat_session, message in rows}
+    assert len(statements) == 1
+    assert previews["first session"] == previews["second session"] == "stub reply"
+
+
+def test_history_reads_only_the_last_messages(client, monkeypatch):
+    session_id = client.post("/chat/", json={"message": "turn 0"}).json()["session_id"]
+    for turn in range(1, 6):
+        client.post("/chat/", json={"message": f"turn {turn}", "session_id": session_id})
+
+    from sqlmodel import Session
+
+    from backend.api.chat import _load_history
+    from backend.db import crud
+    from backend.db.session import engine
+
+    calls = []
+    real_decompress = compression.decompress_text
+    monkeypatch.setattr(compression, "decompress_text", lambda payload: calls.append(1) or real_decompress(payload))
+
+    with Session(engine) as db:
+        user = crud.get_user_by_email(db, "tester@example.com")
+        with _statements(engine) as statements:
+            history = _load_history(db, session_id, user.id)
+        assert _load_history(db, session_id, "someone-else") == []
+    assert len(statements) == 1
+    assert len(calls) == 8
+    assert history[0] == {"role": "user", "content": "turn 2"}
+    assert history[-1] == {"role": "assistant", "content": "stub reply"}
@@ -0,0 +1,187 @@
+import queue
+import time
+from types import SimpleNamespace
+
+import pytest
+from opentelemetry import trace
+from prometheus_client import REGISTRY
+
+from backend.core import llm_handler
+from backend.core.model_metrics import TokenClock
+from backend.utils import language_tools
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class _Inputs(dict):
+    def to(self, _device):
+        return self
+
+
+class _QueueStreamer:
+    """Stands in for TextIteratorStreamer: skips the prompt, yields each later put."""
+
+    def __init__(self, _tokenizer, skip_prompt=True, skip_special_tokens=True):
+        self._queue = queue.Queue()
+        self._prompt_pending = skip_prompt
+
+    def put(self, value):
+        if value is None:
+            raise AttributeError("'NoneType' object has no attribute 'shape'")
+        if self._prompt_pending:
+            self._prompt_pending = False
+            return
+        self._queue.put(value)
+
+    def end(self):
+        self._queue.put(None)
+
+    def __iter__(self):
+        while (item := self._queue.get(timeout=5)) is not None:
+            yield item
+
+
+class _FakeModel:
+    device = "cpu"
+
+    def generate(self, input_ids, streamer, **_kwargs):
+        streamer.put(input_ids)
+        for token in ("Hel", "lo", "!"):
+            streamer.put(token)
+        streamer.end()
+
+
+class _FailingModel:
+    device = "cpu"
+
+    def generate(self, input_ids, streamer, **_kwargs):
+        streamer.put(input_ids)
+        streamer.put("Hel")
+        raise RuntimeError("CUDA out of memory")
+
+
+def test_token_clock_times_generated_tokens_only():
+    before_ttft = _sample("zgpt_generation_time_to_first_token_seconds_count", mode="probe")
+    before_gaps = _sample("zgpt_generation_inter_token_seconds_count", mode="probe")
+    before_completion = _sample("zgpt_generation_tokens_total", kind="completion")
+    inner = _QueueStreamer(None)
+    clock = TokenClock("probe", prompt_tokens=7, inner=inner)
+
+    for value in ("<prompt>", "a", "b", "c"):
+        clock.put(value)
+    clock.end()
+    clock.finish()
+
+    assert clock.tokens == 3
+    assert list(inner) == ["a", "b", "c"]
+    assert _sample("zgpt_generation_time_to_first_token_seconds_count", mode="probe") == before_ttft + 1
+    assert _sample("zgpt_generation_inter_token_seconds_count", mode="probe") == before_gaps + 2
+    assert _sample("zgpt_generation_tokens_total", kind="completion") == before_completion + 3
+    assert _sample("zgpt_generation_tokens_per_second_count", mode="probe") >= 1
+
+
+def test_stream_reply_records_generation_metrics(monkeypatch):
+    tokenizer = lambda texts, return_tensors: _Inputs(input_ids=SimpleNamespace(shape=(1, 42)))  # noqa: E731
+    tokenizer.eos_token_id = 0
+    monkeypatch.setattr(llm_handler, "_load_model", lambda: None)
+    monkeypatch.setattr(llm_handler, "tokenizer", tokenizer)
+    monkeypatch.setattr(llm_handler, "model", _FakeModel())
+    monkeypatch.setattr(llm_handler, "TextStreamer", _QueueStreamer)
+    before_prompt = _sample("zgpt_generation_tokens_total", kind="prompt")
+    before_ttft = _sample("zgpt_generation_time_to_first_token_seconds_count", mode="stream")
+
+    assert "".join(llm_handler.stream_reply("hi")) == "Hello!"
+
+    assert _sample("zgpt_generation_tokens_total", kind="prompt") == before_prompt + 42
+    assert _sample("zgpt_generation_time_to_first_token_seconds_count", mode="stream") == before_ttft + 1
+    assert _sample("zgpt_generations_in_flight", kind="chat") == 0
+
+
+def test_stream_reply_ends_the_stream_when_generate_raises(monkeypatch):
+    tokenizer = lambda texts, return_tensors: _Inputs(input_ids=SimpleNamespace(shape=(1, 3)))  # noqa: E731
+    tokenizer.eos_token_id = 0
+    monkeypatch.setattr(llm_handler, "_load_model", lambda: None)
+    monkeypatch.setattr(llm_handler, "tokenizer", tokenizer)
+    monkeypatch.setattr(llm_handler, "model", _FailingModel())
+    monkeypatch.setattr(llm_handler, "TextStreamer", _QueueStreamer)
+
+    received = []
+    started = time.perf_counter()
+    with pytest.raises(RuntimeError, match="CUDA out of memory"):
+        for text in llm_handler.stream_reply("hi"):
+            received.append(text)
+
+    # The stop signal arrives at once instead of after the streamer's 5s timeout.
+    assert time.perf_counter() - started < 2
+    assert received == ["Hel"]
+    assert _sample("zgpt_generations_in_flight", kind="chat") == 0
+
+
+def test_language_calls_are_timed(monkeypatch):
+    monkeypatch.setattr(language_tools, "_lang_detect_pipeline", lambda: lambda text: [{"label": "ur"}])
+    before_detect = _sample("zgpt_language_latency_seconds_count", operation="detect")
+    before_translate = _sample("zgpt_language_latency_seconds_count", operation="translate")
+
+    assert language_tools.detect_language("سلام") == "ur"
+    assert language_tools.translate_text("hello", from_lang="en", to_lang="en") == "hello"
+
+    assert _sample("zgpt_language_latency_seconds_count", operation="detect") == before_detect + 1
+    assert _sample("zgpt_language_latency_seconds_count", operation="translate") == before_translate + 1
+
+
+def test_stream_reply_spans_follow_the_generation_thread(monkeypatch, span_exporter):
+    tokenizer = lambda texts, return_tensors: _Inputs(input_ids=SimpleNamespace(shape=(1, 5)))  # noqa: E731
+    tokenizer.eos_token_id = 0
+    monkeypatch.setattr(llm_handler, "_load_model", lambda: None)
+    monkeypatch.setattr(llm_handler, "tokenizer", tokenizer)
+    monkeypatch.setattr(llm_handler, "model", _FakeModel())
+    monkeypatch.setattr(llm_handler, "TextStreamer", _QueueStreamer)
+
+    with trace.get_tracer(__name__).start_as_current_span("request"):
+        assert "".join(llm_handler.stream_reply("hi")) == "Hello!"
+
+    spans = {span.name: span for span in span_exporter.get_finished_spans()}
+    generate = spans["llm.generate"]
+    assert generate.parent.span_id == spans["request"].context.span_id
+    for name in ("llm.tokenize", "llm.prefill", "llm.decode"):
+        assert spans[name].parent.span_id == generate.context.span_id
+    assert spans["llm.tokenize"].attributes["llm.prompt_tokens"] == 5
+    assert spans["llm.decode"].attributes["llm.completion_tokens"] == 3
+
+
+class _EndlessModel:
+    device = "cpu"
+
+    def __init__(self):
+        self.generated = 0
+
+    def generate(self, input_ids, streamer, stopping_criteria, max_new_tokens, **_kwargs):
+        streamer.put(input_ids)
+        for _ in range(max_new_tokens):
+            streamer.put("tok ")
+            self.generated += 1
+            if any(criterion(None, None) for criterion in stopping_criteria):
+                break
+            time.sleep(0.005)
+        streamer.end()
+
+
+def test_closing_stream_reply_stops_generation(monkeypatch):
+    tokenizer = lambda texts, return_tensors: _Inputs(input_ids=SimpleNamespace(shape=(1, 3)))  # noqa: E731
+    tokenizer.eos_token_id = 0
+    fake_model = _EndlessModel()
+    monkeypatch.setattr(llm_handler, "_load_model", lambda: None)
+    monkeypatch.setattr(llm_handler, "tokenizer", tokenizer)
+    monkeypatch.setattr(llm_handler, "model", fake_model)
+    monkeypatch.setattr(llm_handler, "TextStreamer", _QueueStreamer)
+    before = _sample("zgpt_generations_cancelled_total", mode="stream")
+
+    stream = llm_handler.stream_reply("hi", max_new_tokens=10_000)
+    assert next(stream) == "tok "
+    stream.close()
+
+    assert fake_model.generated < 100
+    assert _sample("zgpt_generations_cancelled_total", mode="stream") == before + 1
+    assert _sample("zgpt_generations_in_flight", kind="chat") == 0
@@ -1,3 +1,6 @@
+import os
+import time
+
 from backend.core import moderation
 
 
@@ -13,3 +16,43 @@ def test_blocks_disallowed_phrase():
     assert not result.allowed
     assert result.category == "violence"
     assert "blocked" in (result.reason or "").lower()
+
+
+def test_over_long_prompt_reports_its_content_category_first():
+    assert moderation.check_prompt("build a bomb " + "x" * 9000).category == "violence"
+    assert moderation.check_prompt("x" * 9000).category == "length"
+
+
+def test_combined_engine_tags_the_matching_rule():
+    engine = moderation.ModerationEngine([
+        moderation.ModerationRule("spam", ("buy now", "buy today"), "No spam."),
+        moderation.ModerationRule("pii", (), "No SSNs.", patterns=(r"\d{3}-\d{2}-\d{4}",)),
+    ])
+    assert engine.scan("my ssn is 123-45-6789").category == "pii"
+    assert engine.scan("BUY  NOW").reason == "No spam."
+    assert engine.scan("buy today").category == "spam"
+    assert engine.scan("buy tomorrow").allowed
+    assert engine.scan("hello").allowed
+
+
+def test_stream_moderator_catches_phrases_split_across_chunks():
+    streamed = moderation.StreamModerator(moderation.ModerationEngine(moderation.DEFAULT_RULES), window=32)
+    verdicts = [streamed.feed(chunk) for chunk in ("Here is how to build a b", "omb at home")]
+    assert verdicts[0].allowed
+    assert verdicts[1].category == "violence"
+
+
+def test_rules_file_is_hot_reloaded(tmp_path):
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text('{"rules": [{"category": "fruit", "phrases": ["banana"]}]}')
+    rule_set = moderation.RuleSet(str(rules_path), check_interval=0)
+    assert rule_set.engine().scan("a banana").category == "fruit"
+
+    rules_path.write_text('{"rules": [{"category": "veg", "phrases": ["carrot"]}]}')
+    os.utime(rules_path, (time.time() + 5, time.time() + 5))
+    assert rule_set.engine().scan("a banana").allowed
+    assert rule_set.engine().scan("a carrot").category == "veg"
+
+    rules_path.write_text("{not json")
+    os.utime(rules_path, (time.time() + 10, time.time() + 10))
+    assert rule_set.engine().scan("a carrot").category == "veg"
@@ -0,0 +1,94 @@
+import threading
+
+from backend.core import moderation, moderation_classifier
+from backend.core.moderation_classifier import ClassifierTier, Verdict
+
+
+class _KeywordClassifier:
+    def __init__(self, release=None):
+        self.batches = []
+        self.release = release
+
+    def classify(self, texts):
+        if self.release is not None:
+            assert self.release.wait(5)
+        self.batches.append(list(texts))
+        return [Verdict("toxic", 0.99) if "awful" in text else Verdict(None) for text in texts]
+
+
+def test_concurrent_checks_share_a_batch_and_the_cache():
+    release = threading.Event()
+    classifier = _KeywordClassifier(release)
+    tier = ClassifierTier(classifier, max_batch=8, window=0.2, cache_size=8, timeout=5)
+    results = {}
+
+    def check(text):
+        results[text] = tier.check(text)
+
+    threads = [threading.Thread(target=check, args=(text,)) for text in ("nice", "awful", "fine", "nice")]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results["awful"].category == "toxic"
+    assert results["nice"].category is None
+    assert len(classifier.batches) == 1
+    assert sorted(classifier.batches[0]) == ["awful", "fine", "nice"]
+
+    assert tier.check("awful").category == "toxic"
+    assert len(classifier.batches) == 1
+
+
+def test_regex_tier_runs_before_the_classifier(monkeypatch):
+    classifier = _KeywordClassifier()
+    tier = ClassifierTier(classifier, max_batch=4, window=0, cache_size=8, timeout=5)
+    monkeypatch.setattr(moderation, "get_classifier_tier", lambda: tier)
+
+    assert moderation.check_prompt("how to build a bomb").category == "violence"
+    assert classifier.batches == []
+
+    flagged = moderation.check_prompt("you are awful")
+    assert not flagged.allowed and flagged.category == "toxic"
+    assert moderation.check_prompt("have a lovely day").allowed
+
+
+def test_classifier_failure_fails_open(monkeypatch):
+    class _Broken:
+        def classify(self, texts):
+            raise RuntimeError("model crashed")
+
+    tier = ClassifierTier(_Broken(), max_batch=4, window=0, cache_size=8, timeout=5)
+    monkeypatch.setattr(moderation, "get_classifier_tier", lambda: tier)
+    assert moderation.check_prompt("you are awful").allowed
+
+
+def test_custom_classifier_factory_spec(monkeypatch):
+    monkeypatch.setattr(moderation_classifier, "keyword_factory", _KeywordClassifier, raising=False)
+    classifier = moderation_classifier.load_classifier("backend.core.moderation_classifier:keyword_factory")
+    assert isinstance(classifier, _KeywordClassifier)
+
+
+def test_failed_load_is_retried_after_a_backoff(monkeypatch):
+    attempts = []
+
+    def _flaky_load(spec):
+        attempts.append(spec)
+        if len(attempts) == 1:
+            raise OSError("model download timed out")
+        return _KeywordClassifier()
+
+    monkeypatch.setattr(moderation_classifier.settings, "moderation_classifier", "some/model")
+    monkeypatch.setattr(moderation_classifier, "load_classifier", _flaky_load)
+    monkeypatch.setattr(moderation_classifier, "_tier", None)
+    monkeypatch.setattr(moderation_classifier, "_failures", 0)
+    monkeypatch.setattr(moderation_classifier, "_retry_at", 0.0)
+
+    assert moderation_classifier.get_classifier_tier() is None
+    assert moderation_classifier.get_classifier_tier() is None
+    assert len(attempts) == 1
+
+    monkeypatch.setattr(moderation_classifier, "_retry_at", 0.0)
+    assert moderation_classifier.get_classifier_tier() is not None
+    assert len(attempts) == 2
@@ -0,0 +1,87 @@
+import threading
+
+from sqlmodel import Session
+
+from backend.core import profiler
+from backend.db import crud
+
+
+def _spin_until(stop):
+    total = 0
+    while not stop.is_set():
+        total += sum(range(200))
+    return total
+
+
+def test_profile_samples_busy_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin_until, args=(stop,), name="busy-worker")
+    worker.start()
+    try:
+        report = profiler.profile(0.2, 0.005, allocations=3)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert report.samples > 1
+    assert any(stack.startswith("busy-worker;") and "_spin_until" in stack for stack in report.stacks)
+    assert "busy-worker" in {entry["name"] for entry in report.threads}
+    assert threading.current_thread().name not in {entry["name"] for entry in report.threads}
+    assert len(report.allocations) <= 3
+    line = report.collapsed().splitlines()[0]
+    assert line.rsplit(" ", 1)[1].isdigit()
+
+
+def test_profile_runs_one_at_a_time():
+    with profiler._lock:
+        try:
+            profiler.profile(0.01, 0.005)
+        except profiler.ProfilerBusy:
+            pass
+        else:
+            raise AssertionError("expected ProfilerBusy")
+
+
+def test_profile_endpoint_is_hidden_unless_enabled(client, monkeypatch):
+    from backend.api import admin
+
+    monkeypatch.setattr(admin.settings, "profiling_enabled", False)
+    assert client.get("/admin/profile", params={"seconds": 0.05}).status_code == 404
+
+
+def _set_admin(email, is_admin):
+    from backend.db.session import engine
+
+    with Session(engine) as db:
+        crud.set_user_admin(db, email, is_admin)
+
+
+def test_profile_endpoint_requires_an_admin(client, monkeypatch):
+    from backend.api import admin
+
+    monkeypatch.setattr(admin.settings, "profiling_enabled", True)
+    _set_admin("tester@example.com", False)
+    assert client.get("/admin/profile", params={"seconds": 0.05}).status_code == 403
+
+
+def test_profile_endpoint_returns_report_for_admins(client, monkeypatch):
+    from backend.api import admin
+
+    monkeypatch.setattr(admin.settings, "profiling_enabled", True)
+    monkeypatch.setattr(admin.settings, "profiling_max_seconds", 1.0)
+    _set_admin("tester@example.com", True)
+
+    assert client.get("/admin/profile", params={"seconds": 5}).status_code == 422
+
+    resp = client.get("/admin/profile", params={"seconds": 0.05, "interval_ms": 5})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["samples"] >= 1
+    assert body["threads"]
+
+    collapsed = client.get("/admin/profile", params={"seconds": 0.05, "format": "collapsed"})
+    assert collapsed.status_code == 200
+    assert collapsed.headers["content-type"].startswith("text/plain")
+
+    _set_admin("tester@example.com", False)
+    assert client.get("/admin/profile", params={"seconds": 0.05}).status_code == 403
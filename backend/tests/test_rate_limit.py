@@ -1,7 +1,16 @@
+import asyncio
+from types import SimpleNamespace
+
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
-from backend.middleware.rate_limit import RateLimitMiddleware
+from backend.config.settings import get_settings
+from backend.middleware.rate_limit import (
+    InFlightLimiter,
+    InMemoryRateLimiter,
+    RateLimitMiddleware,
+    RateLimitPolicy,
+)
 
 
 def test_rate_limit_blocks_excess_requests():
@@ -18,3 +27,107 @@ def test_rate_limit_blocks_excess_requests():
     blocked = client.get("/ping")
     assert blocked.status_code == 429
     assert blocked.json()["error"]["code"] == "rate_limited"
+
+
+def test_in_memory_store_stays_bounded():
+    limiter = InMemoryRateLimiter(limit=5, window_seconds=60, max_keys=100)
+    for i in range(10_000):
+        assert limiter.check(f"ip:{i}", now=1000.0)[0]
+    assert len(limiter) == 100
+
+
+def test_in_memory_store_sweeps_idle_keys_and_reports_retry_after():
+    limiter = InMemoryRateLimiter(limit=2, window_seconds=60, sweep_every=1)
+    assert limiter.check("ip:a", now=0.0)[0]
+    assert limiter.check("ip:a", now=0.0)[0]
+    allowed, retry_after = limiter.check("ip:a", now=0.0)
+    assert not allowed
+    assert retry_after == 30.0
+
+    assert limiter.check("ip:b", now=120.0)[0]
+    assert len(limiter) == 1
+
+
+def test_in_memory_store_admits_a_full_burst_at_any_clock_value():
+    limiter = InMemoryRateLimiter(limit=60, window_seconds=60)
+    # With float TATs, (now + 60.0) - 60.0 > now at this clock value and a fresh key was rejected.
+    assert limiter.check("ip:a", cost=60, now=2040.389256219524)[0]
+    assert not limiter.check("ip:a", now=2040.389256219524)[0]
+
+
+def test_redis_store_admits_a_request_costing_the_whole_limit(monkeypatch):
+    from fakeredis import FakeAsyncRedis
+    from fakeredis.commands_mixins import server_mixin
+
+    # 60s / 11 is not a whole number of milliseconds, and a float emission * 11 overshot
+    # the burst; an early server clock keeps that rounding error visible.
+    monkeypatch.setattr(server_mixin, "time", SimpleNamespace(time=lambda: 1.0))
+
+    async def run():
+        redis_client = FakeAsyncRedis()
+        limiter = RateLimitMiddleware(app=None, limit_per_minute=11)
+        first = await limiter._check_redis(redis_client, "user:a", cost=11)
+        second = await limiter._check_redis(redis_client, "user:a", cost=1)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == (True, 0)
+    assert second[0] is False
+    assert 1 <= second[1] <= 6
+
+
+def _policy_app(policy, limit):
+    app = FastAPI()
+
+    @app.get("/healthz")
+    def healthz():  # pragma: no cover - executed via test client
+        return {"ok": True}
+
+    @app.get("/expensive")
+    def expensive():  # pragma: no cover - executed via test client
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, limit_per_minute=limit, policy=policy)
+    return TestClient(app)
+
+
+def test_route_costs_and_exempt_paths():
+    policy = RateLimitPolicy(route_costs={"/expensive": 5}, exempt_paths=frozenset({"/healthz"}))
+    client = _policy_app(policy, limit=10)
+
+    assert client.get("/expensive").status_code == 200
+    assert client.get("/expensive").status_code == 200
+    assert client.get("/expensive").status_code == 429
+    for _ in range(20):
+        assert client.get("/healthz").status_code == 200
+
+
+def test_queued_image_jobs_cost_the_same_as_direct_generation():
+    policy = RateLimitPolicy.from_settings(get_settings())
+
+    assert policy.resolve("/image/jobs", "POST").cost == policy.resolve("/image/generate", "POST").cost == 20
+    assert policy.resolve("/image/jobs", "POST").concurrency_limited
+    # Polling job status and results stays cheap.
+    assert policy.resolve("/image/jobs", "GET").cost == 1
+    assert not policy.resolve("/image/jobs/abc/result", "GET").concurrency_limited
+
+
+def test_authenticated_requests_are_keyed_per_user():
+    from backend.core.security import create_access_token
+
+    client = _policy_app(RateLimitPolicy(), limit=1)
+    alice = {"Authorization": f"Bearer {create_access_token('alice')}"}
+    bob = {"Authorization": f"Bearer {create_access_token('bob')}"}
+
+    assert client.get("/expensive", headers=alice).status_code == 200
+    assert client.get("/expensive", headers=alice).status_code == 429
+    assert client.get("/expensive", headers=bob).status_code == 200
+
+
+def test_in_flight_limiter_caps_concurrent_generations():
+    limiter = InFlightLimiter(limit=1)
+    assert limiter.acquire("user:a")
+    assert not limiter.acquire("user:a")
+    assert limiter.acquire("user:b")
+    limiter.release("user:a")
+    assert limiter.acquire("user:a")
@@ -21,4 +21,21 @@ def test_security_headers_applied_to_responses():
     assert response.headers["Strict-Transport-Security"].startswith("max-age=")
     assert "default-src 'self'" in response.headers["Content-Security-Policy"]
     assert response.headers["Permissions-Policy"] == "camera=(), microphone=(), geolocation=()"
-```
\ No newline at end of file
+
+
+def test_security_headers_do_not_override_handler_values():
+    app = FastAPI()
+
+    @app.get("/framed")
+    def framed():  # pragma: no cover - executed via client
+        from fastapi.responses import JSONResponse
+
+        return JSONResponse({"ok": True}, headers={"X-Frame-Options": "SAMEORIGIN"})
+
+    app.add_middleware(SecurityHeadersMiddleware)
+    client = TestClient(app)
+
+    response = client.get("/framed")
+
+    assert response.headers["X-Frame-Options"] == "SAMEORIGIN"
+    assert response.headers["Referrer-Policy"] == "no-referrer"
@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from backend.core.sse import HEARTBEAT, FlushPolicy, coalesce, format_event
+
+
+def _messages(frames):
+    return [frame for frame in frames if frame.startswith("event: message")]
+
+
+def test_format_event_keeps_newlines_inside_the_event():
+    assert format_event("message", "one\n\ntwo") == "event: message\ndata: one\ndata: \ndata: two\n\n"
+
+
+def test_first_token_is_sent_alone_and_the_rest_coalesced():
+    frames = list(coalesce(iter(["Hel", "lo", " wor", "ld"]), FlushPolicy(interval=10, max_bytes=1024, heartbeat=0)))
+
+    assert frames == [format_event("message", "Hel"), format_event("message", "lo world")]
+
+
+def test_byte_limit_forces_a_flush():
+    policy = FlushPolicy(interval=10, max_bytes=4, heartbeat=0)
+
+    frames = list(coalesce(iter(["a", "bb", "cc", "d", "e"]), policy))
+
+    assert frames == [format_event("message", "a"), format_event("message", "bbcc"), format_event("message", "de")]
+
+
+def test_interval_flushes_while_the_source_is_idle():
+    def slow():
+        yield "a"
+        yield "b"
+        time.sleep(0.3)
+        yield "c"
+
+    frames = list(coalesce(slow(), FlushPolicy(interval=0.05, max_bytes=1024, heartbeat=0)))
+
+    assert frames == [format_event("message", "a"), format_event("message", "b"), format_event("message", "c")]
+
+
+def test_idle_stream_gets_heartbeats():
+    def slow_start():
+        time.sleep(0.25)
+        yield "late"
+
+    frames = list(coalesce(slow_start(), FlushPolicy(interval=0.05, max_bytes=1024, heartbeat=0.05)))
+
+    assert HEARTBEAT in frames
+    assert frames[-1] == format_event("message", "late")
+
+
+def test_source_errors_surface_after_buffered_text():
+    def failing():
+        yield "a"
+        yield "b"
+        raise RuntimeError("boom")
+
+    frames = []
+    with pytest.raises(RuntimeError, match="boom"):
+        for frame in coalesce(failing(), FlushPolicy(interval=10, max_bytes=1024, heartbeat=0)):
+            frames.append(frame)
+
+    assert "".join(frames) == format_event("message", "a") + format_event("message", "b")
+
+
+def test_chat_stream_coalesces_chunks(client, monkeypatch):
+    from backend.api import chat
+
+    monkeypatch.setattr(chat, "stream_reply", lambda *_args, **_kwargs: iter(["one", " two", " three", " four"]))
+    with client.stream("POST", "/chat/stream", json={"message": "count"}) as response:
+        body = b"".join(response.iter_bytes()).decode()
+
+    assert _messages(body.split("\n\n")) == ["event: message\ndata: one", "event: message\ndata:  two three four"]
+    assert "event: done" in body
@@ -0,0 +1,51 @@
+import threading
+
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+
+from backend.core.observability import iterate_in_context
+
+tracer = trace.get_tracer(__name__)
+
+
+def test_iterate_in_context_parents_spans_on_other_threads(span_exporter):
+    def _steps():
+        for index in range(2):
+            with tracer.start_as_current_span(f"step{index}"):
+                pass
+            yield index
+
+    with tracer.start_as_current_span("request"):
+        iterator = iterate_in_context(_steps(), otel_context.get_current())
+    # Like Starlette's threadpool: each item is pulled on a fresh thread with an empty context.
+    for _ in range(2):
+        thread = threading.Thread(target=next, args=(iterator,))
+        thread.start()
+        thread.join()
+
+    spans = {span.name: span for span in span_exporter.get_finished_spans()}
+    for name in ("step0", "step1"):
+        assert spans[name].parent.span_id == spans["request"].context.span_id
+
+
+def test_chat_stream_stages_are_traced(client, span_exporter, monkeypatch):
+    from backend.api import chat
+
+    def _traced_stream(*_args, **_kwargs):
+        with tracer.start_as_current_span("model"):
+            pass
+        yield "stub reply"
+
+    monkeypatch.setattr(chat, "stream_reply", _traced_stream)
+
+    response = client.post("/chat/stream", json={"message": "Hello"})
+    assert "event: done" in response.text
+
+    spans = span_exporter.get_finished_spans()
+    names = [span.name for span in spans]
+    for name in ("chat.moderate_input", "chat.detect_language", "chat.load_history", "db.upsert_session"):
+        assert name in names
+    assert names.count("db.record_message") == 2
+    by_name = {span.name: span for span in spans}
+    assert by_name["model"].parent.span_id == by_name["chat.generate"].context.span_id
+    assert by_name["chat.moderate_input"].attributes["moderation.allowed"] is True
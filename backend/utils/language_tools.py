@@ -1,6 +1,9 @@
+import time
 from functools import lru_cache
 from typing import Any, Callable
 
+from backend.core.model_metrics import LANGUAGE_LATENCY, MODEL_LOAD_SECONDS, timed
+
 try:
     from transformers import pipeline  # type: ignore
 except ImportError:  # pragma: no cover - ensure graceful fallback
@@ -16,19 +19,29 @@ except ImportError:  # pragma: no cover
 def _lang_detect_pipeline() -> Callable[[str], Any]:
     if pipeline is None:
         raise RuntimeError("transformers is required for language detection")
-    return pipeline("text-classification", model="papluca/xlm-roberta-base-language-detection")
+    started = time.perf_counter()
+    detector = pipeline("text-classification", model="papluca/xlm-roberta-base-language-detection")
+    MODEL_LOAD_SECONDS.labels(model="detector").observe(time.perf_counter() - started)
+    return detector
 
 
 def detect_language(text: str) -> str:
     # Limit input length for speed
     try:
-        result = _lang_detect_pipeline()(text[:256])[0]
+        detector = _lang_detect_pipeline()  # first call loads the model; not counted as detection
+        with timed(LANGUAGE_LATENCY, operation="detect"):
+            result = detector(text[:256])[0]
         return result["label"]
     except Exception:
         return "en"
 
 
 def translate_text(text: str, from_lang: str, to_lang: str) -> str:
+    with timed(LANGUAGE_LATENCY, operation="translate"):
+        return _translate(text, from_lang, to_lang)
+
+
+def _translate(text: str, from_lang: str, to_lang: str) -> str:
     # Expect translations to be pre-installed in the container/image; if missing, return passthrough
     try:
         if argostranslate is None: